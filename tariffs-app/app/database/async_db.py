@@ -0,0 +1,132 @@
+"""Non-blocking query access for the async route handlers.
+
+``execute_query`` here has the same signature and return values as
+``app.database.config.execute_query`` but runs on an aiomysql pool, so a
+handler waiting on MySQL does not hold up the event loop. The pool is
+created lazily inside the running loop and closed on shutdown.
+
+When ``config.execute_query`` has been replaced (tests patch it), calls are
+routed to the replacement so existing mocks keep working. With
+``DB_ASYNC_MODE=threadpool``, without aiomysql, or on the SQLite backend,
+the blocking function runs on the database worker pool instead.
+
+aiomysql has no server-side prepared statements. ``execute_prepared`` is for
+the hot parameterized lookups: while prepared statements are enabled it
+always takes the worker-pool path, where ``config.statement_cursor`` reuses
+the connection's prepared statement.
+"""
+import asyncio
+import time
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+from app.database import config, threadpool
+from app.monitoring.logs import get_logger
+
+logger = get_logger("database")
+
+_sync_execute_query = config.execute_query
+
+_pool = None
+_pool_lock = None
+
+def _native():
+    """Whether queries go through the aiomysql pool"""
+    return aiomysql is not None and config.DB_ASYNC_MODE != "threadpool" and config.DB_BACKEND == "mysql"
+
+async def get_pool():
+    global _pool, _pool_lock
+    if _pool is not None:
+        return _pool
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await aiomysql.create_pool(
+                host=config.DB_HOST,
+                user=config.DB_USER,
+                password=config.DB_PASSWORD,
+                db=config.DB_NAME,
+                # Its own budget, separate from the blocking pool's; see config
+                minsize=min(config.DB_ASYNC_POOL_MIN_SIZE, config.DB_ASYNC_POOL_MAX_SIZE),
+                maxsize=config.DB_ASYNC_POOL_MAX_SIZE,
+                pool_recycle=config.DB_POOL_IDLE_TIMEOUT,
+                cursorclass=aiomysql.DictCursor,
+                # Each statement is its own transaction, as with execute_query;
+                # multi-statement work still goes through config.transaction()
+                autocommit=True
+            )
+    return _pool
+
+def get_pool_stats():
+    if _pool is None:
+        return {"enabled": _native(), "created": False}
+    return {
+        "enabled": True,
+        "created": True,
+        "min_size": _pool.minsize,
+        "max_size": _pool.maxsize,
+        "open_connections": _pool.size,
+        "idle_connections": _pool.freesize,
+        "checked_out": _pool.size - _pool.freesize
+    }
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+async def execute_prepared(query, params=None, fetch=True):
+    """``execute_query`` through the connection's prepared statement cache when it is enabled"""
+    if config.execute_query is not _sync_execute_query or not config.prepared_statements_enabled():
+        return await execute_query(query, params, fetch)
+    return await threadpool.run_sync(_sync_execute_query, query, params, fetch)
+
+async def execute_query(query, params=None, fetch=True):
+    """Awaitable ``config.execute_query``: rows for reads, counts for writes, None on error"""
+    if config.execute_query is not _sync_execute_query:
+        # Patched in tests; mocks are plain callables. Still counted, so
+        # tests can hold routes to a query budget.
+        config.notify_query(query, params, 0.0)
+        return config.execute_query(query, params, fetch=fetch)
+    if not _native():
+        return await threadpool.run_sync(_sync_execute_query, query, params, fetch)
+
+    start_time = time.time()
+    try:
+        pool = await get_pool()
+        checkout_start = time.time()
+        connection = await asyncio.wait_for(pool.acquire(), config.DB_POOL_TIMEOUT)
+        config.notify_checkout(time.time() - checkout_start, "async")
+    except (aiomysql.Error, OSError, asyncio.TimeoutError) as e:
+        logger.error(f"Error connecting to MySQL database: {e}")
+        return None
+
+    result = None
+    try:
+        async with connection.cursor() as cursor:
+            await cursor.execute(query, params or None)
+            if fetch:
+                result = list(await cursor.fetchall())
+                config.notify_query(query, params, time.time() - start_time, rows=len(result))
+                config.log_query(query, params, time.time() - start_time, result)
+            else:
+                last_id = None
+                if query.lower().strip().startswith("insert"):
+                    last_id = cursor.lastrowid or None
+                result = {"affected_rows": cursor.rowcount, "last_insert_id": last_id}
+                config.notify_query(query, params, time.time() - start_time, rows=cursor.rowcount)
+                config.log_query(query, params, time.time() - start_time, cursor.rowcount)
+    except aiomysql.Error as e:
+        config.notify_query(query, params, time.time() - start_time, e)
+        logger.error(f"Error executing query: {e}")
+        config.query_logger.debug("Failed query: %s params=%s", " ".join(query.split()), params)
+    finally:
+        pool.release(connection)
+
+    return result
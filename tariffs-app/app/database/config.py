@@ -3,7 +3,12 @@ import mysql.connector
 from mysql.connector import Error
 from dotenv import load_dotenv
 import time
-import datetime
+import logging
+from contextlib import contextmanager
+
+from app.database import sqlite_backend, statement_cache
+from app.database.pool import ConnectionPool, PoolTimeoutError
+from app.monitoring.logs import get_logger
 
 load_dotenv()
 
@@ -12,58 +17,209 @@ DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "")
 DB_NAME = os.getenv("DB_NAME", "tariffs_exemptions")
 
+# "mysql", or "sqlite" for an embedded database on machines without a MySQL
+# server (benchmarks, integration tests); see app.database.sqlite_backend
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+# SQLite database file, or ":memory:" for one shared by the pool's connections
+DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH", sqlite_backend.MEMORY)
+
+# Connection pool sizing - tune these against get_pool_stats() under load.
+# Each worker process can hold DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW
+# connections in this pool plus DB_ASYNC_POOL_MAX_SIZE in the aiomysql pool
+# (DB_ASYNC_MODE=aiomysql only); keep that total times the number of
+# processes under the server's max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+DB_ASYNC_POOL_MIN_SIZE = int(os.getenv("DB_ASYNC_POOL_MIN_SIZE", "1"))
+DB_ASYNC_POOL_MAX_SIZE = int(os.getenv("DB_ASYNC_POOL_MAX_SIZE", str(DB_POOL_SIZE)))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# How async handlers reach MySQL: "aiomysql" (native async pool) or
+# "threadpool" (blocking helpers on a bounded worker pool)
+DB_ASYNC_MODE = os.getenv("DB_ASYNC_MODE", "threadpool" if DB_BACKEND == "sqlite" else "aiomysql").lower()
+# Workers beyond the connection pool's limit would only wait for a checkout
+DB_THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", str(DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW)))
+
+# Server-side prepared statements for parameterized queries, cached per
+# pooled connection (MySQL only; see app.database.statement_cache)
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "true").lower() in ("1", "true", "yes")
+DB_PREPARED_CACHE_SIZE = int(os.getenv("DB_PREPARED_CACHE_SIZE", "64"))
+
 QUERY_LOGGING = True
 
+logger = get_logger("database")
+query_logger = get_logger("sql")
+
+# Callables (query, params, seconds, error, rows) run after every statement,
+# and (wait_seconds, pool) after every connection checkout; used for request
+# accounting and metrics. Observers must be cheap and must not raise.
+_query_observers = []
+_checkout_observers = []
+
+def add_query_observer(observer):
+    if observer not in _query_observers:
+        _query_observers.append(observer)
+
+def remove_query_observer(observer):
+    if observer in _query_observers:
+        _query_observers.remove(observer)
+
+def notify_query(query, params, time_taken, error=None, rows=None):
+    for observer in _query_observers:
+        observer(query, params, time_taken, error, rows)
+
+def add_checkout_observer(observer):
+    if observer not in _checkout_observers:
+        _checkout_observers.append(observer)
+
+def notify_checkout(wait_time, pool="sync"):
+    for observer in _checkout_observers:
+        observer(wait_time, pool)
+
+class InstrumentedCursor:
+    """Cursor proxy reporting every statement to the query observers"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None, *args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            if params is None:
+                result = self._cursor.execute(query, *args, **kwargs)
+            else:
+                result = self._cursor.execute(query, params, *args, **kwargs)
+        except Exception as e:
+            notify_query(query, params, time.perf_counter() - start_time, e)
+            raise
+        notify_query(query, params, time.perf_counter() - start_time, rows=self._cursor.rowcount)
+        return result
+
+    def executemany(self, query, seq_params, *args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            result = self._cursor.executemany(query, seq_params, *args, **kwargs)
+        except Exception as e:
+            notify_query(query, seq_params, time.perf_counter() - start_time, e)
+            raise
+        notify_query(query, seq_params, time.perf_counter() - start_time, rows=self._cursor.rowcount)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
 def log_query(query, params=None, time_taken=None, rows_affected=None):
-    if not QUERY_LOGGING:
+    """Record a finished query: timing and row count at INFO, SQL text and params at DEBUG"""
+    if not QUERY_LOGGING or not query_logger.isEnabledFor(logging.INFO):
         return
     
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"\n[{timestamp}] SQL QUERY:")
-    print("-" * 80)
-    print(f"QUERY: {query}")
-    
-    if params:
-        print(f"PARAMS: {params}")
-    
-    if time_taken is not None:
-        print(f"TIME: {time_taken:.4f} seconds")
-    
-    if rows_affected is not None:
-        if isinstance(rows_affected, int):
-            print(f"ROWS AFFECTED: {rows_affected}")
-        elif isinstance(rows_affected, list):
-            print(f"ROWS RETURNED: {len(rows_affected)}")
-    
-    print("-" * 80)
+    rows = len(rows_affected) if isinstance(rows_affected, list) else rows_affected
+    duration_ms = round(time_taken * 1000, 3) if time_taken is not None else None
+    extra = {"duration_ms": duration_ms, "rows": rows}
+    if query_logger.isEnabledFor(logging.DEBUG):
+        query_logger.debug("%s ms, %s rows: %s params=%s", duration_ms, rows, " ".join(query.split()), params, extra=extra)
+    else:
+        query_logger.info("%s ms, %s rows", duration_ms, rows, extra=extra)
 
-def get_db_connection():
-    try:
+def _open_connection():
+    if DB_BACKEND == "sqlite":
+        connection = sqlite_backend.connect(DB_SQLITE_PATH, name=DB_NAME, timeout=DB_POOL_TIMEOUT)
+    else:
         connection = mysql.connector.connect(
             host=DB_HOST,
             user=DB_USER,
             passwd=DB_PASSWORD,
             database=DB_NAME
         )
-        
-        if connection.is_connected():
-            if QUERY_LOGGING:
-                db_info = connection.get_server_info()
-                print(f"Connected to MySQL Server version {db_info}")
-            return connection
-            
-    except Error as e:
-        print(f"Error connecting to MySQL database: {e}")
+    
+    if connection.is_connected():
+        if QUERY_LOGGING:
+            db_info = connection.get_server_info()
+            logger.info(f"Connected to database server version {db_info}")
+        return connection
+    
+    return None
+
+_pool = None
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(
+            _open_connection,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_POOL_MAX_OVERFLOW,
+            timeout=DB_POOL_TIMEOUT,
+            idle_timeout=DB_POOL_IDLE_TIMEOUT,
+            pre_ping=DB_POOL_PRE_PING,
+            on_checkout=notify_checkout
+        )
+    return _pool
+
+def get_pool_stats():
+    return get_pool().stats()
+
+def dispose_pool():
+    global _pool
+    if _pool is not None:
+        _pool.dispose()
+        _pool = None
+
+def prepared_statements_enabled():
+    return DB_PREPARED_STATEMENTS and DB_BACKEND == "mysql"
+
+def statement_cursor(connection):
+    """Dictionary cursor, reusing prepared statements when they are enabled"""
+    if prepared_statements_enabled():
+        return statement_cache.StatementCursor(connection, DB_PREPARED_CACHE_SIZE)
+    return connection.cursor(dictionary=True)
+
+def get_db_connection():
+    try:
+        return get_pool().acquire()
+    except (Error, PoolTimeoutError) as e:
+        logger.error(f"Error connecting to MySQL database: {e}")
         return None
 
 def close_connection(connection):
-    if connection and connection.is_connected():
-        connection.close()
+    # Connections are handed back to the pool rather than closed
+    if connection:
+        get_pool().release(connection)
+
+@contextmanager
+def transaction():
+    """Run a block of statements on one pooled connection as a single transaction.
+
+    Yields a dictionary cursor; commits when the block exits cleanly and rolls
+    back (re-raising) otherwise.
+    """
+    connection = get_db_connection()
+    if not connection:
+        raise Error("Could not connect to database")
+    
+    cursor = statement_cursor(connection)
+    try:
+        yield InstrumentedCursor(cursor)
+        connection.commit()
+    except Exception:
+        try:
+            connection.rollback()
+        except Error as e:
+            logger.error(f"Error rolling back transaction: {e}")
+        raise
+    finally:
+        cursor.close()
+        close_connection(connection)
 
 def ensure_activity_log_table_exists():
     connection = get_db_connection()
     if not connection:
-        print("Error: Could not connect to database to create activity_log table")
+        logger.error("Could not connect to database to create activity_log table")
         return False
 
     cursor = None
@@ -83,11 +239,11 @@ def ensure_activity_log_table_exists():
         
         cursor.execute(create_table_query)
         connection.commit()
-        print("Activity log table created or already exists.")
+        logger.info("Activity log table created or already exists.")
         return True
         
     except Error as e:
-        print(f"Error creating activity_log table: {e}")
+        logger.error(f"Error creating activity_log table: {e}")
         return False
         
     finally:
@@ -103,7 +259,7 @@ def execute_query(query, params=None, fetch=True):
     
     try:
         if connection:
-            cursor = connection.cursor(dictionary=True)
+            cursor = statement_cursor(connection)
             
             if params:
                 cursor.execute(query, params)
@@ -112,6 +268,7 @@ def execute_query(query, params=None, fetch=True):
             
             if fetch:
                 result = cursor.fetchall()
+                notify_query(query, params, time.time() - start_time, rows=len(result))
                 log_query(query, params, time.time() - start_time, result)
             else:
                 connection.commit()
@@ -125,16 +282,16 @@ def execute_query(query, params=None, fetch=True):
                             if last_id_result and "LAST_INSERT_ID()" in last_id_result:
                                 last_id = last_id_result["LAST_INSERT_ID()"]
                         except Error as e:
-                            print(f"Error getting last insert ID: {e}")
+                            logger.error(f"Error getting last insert ID: {e}")
                 
                 result = {"affected_rows": cursor.rowcount, "last_insert_id": last_id}
+                notify_query(query, params, time.time() - start_time, rows=cursor.rowcount)
                 log_query(query, params, time.time() - start_time, cursor.rowcount)
                 
     except Error as e:
-        print(f"Error executing query: {e}")
-        print(f"Query: {query}")
-        if params:
-            print(f"Params: {params}")
+        notify_query(query, params, time.time() - start_time, e)
+        logger.error(f"Error executing query: {e}")
+        query_logger.debug("Failed query: %s params=%s", " ".join(query.split()), params)
             
     finally:
         if cursor:
@@ -143,6 +300,43 @@ def execute_query(query, params=None, fetch=True):
         
     return result
 
+def stream_query(query, params=None, batch_size=1000):
+    """Yield result rows one at a time without buffering the result set.
+
+    Uses an unbuffered cursor so the server streams rows as they are read;
+    only ``batch_size`` rows are held in memory at once. The connection stays
+    checked out until the generator is exhausted or closed. A stream closed
+    early (e.g. the client went away) discards its connection rather than
+    draining the remaining rows.
+    """
+    connection = get_db_connection()
+    if not connection:
+        raise Error("Could not connect to database")
+    
+    cursor = None
+    finished = False
+    rows = 0
+    start_time = time.time()
+    try:
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        cursor.execute(query, params or ())
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            rows += len(batch)
+            yield from batch
+        finished = True
+        notify_query(query, params, time.time() - start_time, rows=rows)
+        log_query(query, params, time.time() - start_time, rows)
+    except Error as e:
+        notify_query(query, params, time.time() - start_time, e)
+        raise
+    finally:
+        if finished:
+            cursor.close()
+        get_pool().release(connection, discard=not finished)
+
 def insert_record(table, data, returning_id=True):
     columns = ', '.join(data.keys())
     placeholders = ', '.join(['%s'] * len(data))
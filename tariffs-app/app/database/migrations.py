@@ -0,0 +1,208 @@
+"""Versioned schema migrations.
+
+Migrations are plain SQL files in ``tariffs-app/migrations`` named
+``NNN_description.sql``. Applied versions are recorded in the
+``schema_migrations`` table, so each file runs exactly once per database.
+
+    python -m app.database.migrations status
+    python -m app.database.migrations migrate [--target N]
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+from pathlib import Path
+
+from mysql.connector import Error
+
+from app.database.config import get_db_connection, close_connection
+from app.monitoring import logs
+from app.monitoring.logs import get_logger
+
+logger = get_logger("migrations")
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+
+# Apply pending migrations when the application starts
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version    INT          PRIMARY KEY,
+        name       VARCHAR(255) NOT NULL,
+        checksum   CHAR(64)     NOT NULL,
+        applied_at TIMESTAMP    DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    @property
+    def sql(self):
+        return self.path.read_text(encoding="utf-8")
+
+    @property
+    def checksum(self):
+        return hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+    def statements(self):
+        return split_sql_statements(self.sql)
+
+def split_sql_statements(sql):
+    """Split a script on semicolons, ignoring ``--`` comments and quoted text"""
+    statements = []
+    current = []
+    quote = None
+    i = 0
+    while i < len(sql):
+        char = sql[i]
+        if quote:
+            current.append(char)
+            if char == "\\" and i + 1 < len(sql):
+                current.append(sql[i + 1])
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in ("'", '"', "`"):
+            quote = char
+            current.append(char)
+        elif char == "-" and sql.startswith("--", i):
+            newline = sql.find("\n", i)
+            i = len(sql) if newline == -1 else newline
+            continue
+        elif char == ";":
+            statement = "".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        else:
+            current.append(char)
+        i += 1
+
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for path in sorted(Path(directory).glob("*.sql")):
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), path))
+    migrations.sort(key=lambda migration: migration.version)
+
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+def applied_migrations(cursor):
+    cursor.execute(MIGRATIONS_TABLE)
+    cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+    rows = cursor.fetchall()
+    # Works with both tuple and dictionary cursors
+    if rows and not isinstance(rows[0], dict):
+        rows = [dict(zip(("version", "name", "checksum", "applied_at"), row)) for row in rows]
+    return {row["version"]: row for row in rows}
+
+def migration_status(connection=None, directory=MIGRATIONS_DIR):
+    """List every known migration with whether (and when) it was applied"""
+    own_connection = connection is None
+    connection = connection or get_db_connection()
+    if not connection:
+        raise Error("Could not connect to database to read migration status")
+
+    cursor = connection.cursor(dictionary=True)
+    try:
+        applied = applied_migrations(cursor)
+        connection.commit()
+    finally:
+        cursor.close()
+        if own_connection:
+            close_connection(connection)
+
+    status = []
+    for migration in discover_migrations(directory):
+        record = applied.get(migration.version)
+        status.append({
+            "version": migration.version,
+            "name": migration.name,
+            "applied": record is not None,
+            "applied_at": record["applied_at"] if record else None,
+            "modified": bool(record) and record["checksum"] != migration.checksum
+        })
+    return status
+
+def apply_migrations(connection=None, target=None, directory=MIGRATIONS_DIR):
+    """Apply pending migrations in version order, up to ``target`` if given.
+
+    MySQL commits DDL implicitly, so a migration is recorded only after all
+    of its statements succeeded; a failure stops the run and leaves later
+    migrations pending. Returns the list of applied versions.
+    """
+    own_connection = connection is None
+    connection = connection or get_db_connection()
+    if not connection:
+        raise Error("Could not connect to database to apply migrations")
+
+    cursor = connection.cursor(dictionary=True)
+    applied_now = []
+    try:
+        applied = applied_migrations(cursor)
+        for migration in discover_migrations(directory):
+            if migration.version in applied:
+                if applied[migration.version]["checksum"] != migration.checksum:
+                    logger.warning(f"Migration {migration.version}_{migration.name} changed after it was applied")
+                continue
+            if target is not None and migration.version > target:
+                break
+
+            logger.info(f"Applying migration {migration.version}_{migration.name}")
+            for statement in migration.statements():
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (migration.version, migration.name, migration.checksum)
+            )
+            connection.commit()
+            applied_now.append(migration.version)
+    except Error as e:
+        connection.rollback()
+        logger.error(f"Migration failed: {e}")
+        raise
+    finally:
+        cursor.close()
+        if own_connection:
+            close_connection(connection)
+
+    return applied_now
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage database schema migrations")
+    parser.add_argument("command", choices=["status", "migrate"])
+    parser.add_argument("--target", type=int, default=None, help="Stop after this version")
+    args = parser.parse_args(argv)
+    logs.configure()
+
+    if args.command == "status":
+        for row in migration_status():
+            state = "applied" if row["applied"] else "pending"
+            if row["modified"]:
+                state += " (modified since applied)"
+            print(f"{row['version']:03d}  {row['name']:<40} {state}")
+        return 0
+
+    applied = apply_migrations(target=args.target)
+    print(f"Applied {len(applied)} migration(s)" + (f": {applied}" if applied else ""))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
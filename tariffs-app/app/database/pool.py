@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out within the pool timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of database connections.
+
+    Keeps up to ``pool_size`` idle connections around for reuse and allows up
+    to ``max_overflow`` extra connections under load, which are closed instead
+    of being returned to the idle set. Idle connections older than
+    ``idle_timeout`` seconds are discarded on checkout, and with ``pre_ping``
+    every reused connection is health-checked before it is handed out.
+    ``on_checkout`` is called with the wait time of every checkout.
+    """
+
+    def __init__(self, connect, pool_size=5, max_overflow=10, timeout=30.0,
+                 idle_timeout=300.0, pre_ping=True, on_checkout=None):
+        self._connect = connect
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self.on_checkout = on_checkout
+
+        self._lock = threading.Condition()
+        self._idle = deque()
+        self._checked_out = {}
+        self._open = 0
+        self._closed = False
+
+        self._stats = {
+            "connections_created": 0,
+            "connections_discarded": 0,
+            "checkouts": 0,
+            "checkout_waits": 0,
+            "checkout_timeouts": 0,
+            "health_check_failures": 0,
+            "idle_expired": 0,
+            "total_wait_time": 0.0,
+            "max_wait_time": 0.0,
+        }
+
+    def acquire(self):
+        """Check out a connection, opening a new one if the pool allows it"""
+        start_time = time.monotonic()
+        deadline = start_time + self.timeout
+        waited = False
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool has been disposed")
+
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    break
+
+                if self._open < self.pool_size + self.max_overflow:
+                    # Reserve the slot before connecting outside the lock
+                    self._open += 1
+                    connection, last_used = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["checkout_timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"Timed out after {self.timeout}s waiting for a database connection"
+                    )
+                waited = True
+                self._lock.wait(remaining)
+
+        if connection is not None:
+            connection = self._validate(connection, last_used)
+
+        if connection is None:
+            try:
+                connection = self._connect()
+            except Exception:
+                self._forget_slot()
+                raise
+            if connection is None:
+                self._forget_slot()
+                return None
+            with self._lock:
+                self._stats["connections_created"] += 1
+
+        wait_time = time.monotonic() - start_time
+        with self._lock:
+            self._checked_out[id(connection)] = connection
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["checkout_waits"] += 1
+            self._stats["total_wait_time"] += wait_time
+            self._stats["max_wait_time"] = max(self._stats["max_wait_time"], wait_time)
+
+        if self.on_checkout is not None:
+            self.on_checkout(wait_time)
+        return connection
+
+    def release(self, connection, discard=False):
+        """Return a checked-out connection to the pool.
+
+        ``discard`` closes it instead, e.g. when it still has unread rows
+        that would cost more to drain than a reconnect.
+        """
+        if connection is None:
+            return
+
+        with self._lock:
+            if self._checked_out.pop(id(connection), None) is None:
+                # Not ours (or released twice) - just make sure it is closed
+                owned = False
+            else:
+                owned = True
+
+        if not owned:
+            self._close_quietly(connection)
+            return
+
+        reusable = False
+        try:
+            if not discard and connection.is_connected():
+                # Never hand out a connection with a half-finished transaction
+                if getattr(connection, "in_transaction", False):
+                    connection.rollback()
+                reusable = True
+        except Exception:
+            reusable = False
+
+        with self._lock:
+            if reusable and not self._closed and len(self._idle) < self.pool_size:
+                self._idle.append((connection, time.monotonic()))
+                self._lock.notify()
+                return
+            self._open -= 1
+            self._stats["connections_discarded"] += 1
+            self._lock.notify()
+
+        self._close_quietly(connection)
+
+    def dispose(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._lock.notify_all()
+
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    def stats(self):
+        """Snapshot of pool sizing and usage counters"""
+        with self._lock:
+            checked_out = len(self._checked_out)
+            stats = dict(self._stats)
+            stats.update({
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "idle_timeout": self.idle_timeout,
+                "pre_ping": self.pre_ping,
+                "open_connections": self._open,
+                "idle_connections": len(self._idle),
+                "checked_out": checked_out,
+                "overflow_in_use": max(0, self._open - self.pool_size),
+            })
+        checkouts = stats["checkouts"]
+        stats["avg_wait_time"] = stats["total_wait_time"] / checkouts if checkouts else 0.0
+        return stats
+
+    def _validate(self, connection, last_used):
+        if self.idle_timeout and time.monotonic() - last_used > self.idle_timeout:
+            with self._lock:
+                self._stats["idle_expired"] += 1
+                self._stats["connections_discarded"] += 1
+            self._close_quietly(connection)
+            return None
+
+        if self.pre_ping:
+            try:
+                connection.ping(reconnect=False)
+            except Exception:
+                with self._lock:
+                    self._stats["health_check_failures"] += 1
+                    self._stats["connections_discarded"] += 1
+                self._close_quietly(connection)
+                return None
+
+        return connection
+
+    def _forget_slot(self):
+        with self._lock:
+            self._open -= 1
+            self._lock.notify()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
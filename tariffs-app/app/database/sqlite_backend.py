@@ -0,0 +1,302 @@
+"""Embedded SQLite stand-in for MySQL, for benchmarks and integration tests.
+
+Selected with ``DB_BACKEND=sqlite``; ``DB_SQLITE_PATH`` names a database file
+or ``:memory:``. Connections mimic the parts of the mysql.connector API the
+data layer uses (dictionary and unbuffered cursors, ``lastrowid``, ``ping``,
+``in_transaction``), so the pool, ``execute_query``, ``transaction()`` and
+the routers run unchanged on top of them.
+
+Statements are translated on the way in:
+
+- ``%s`` placeholders become ``?`` (and ``%%`` a literal ``%``);
+- ``CURDATE()``, ``NOW()``, ``DATEDIFF()``, ``YEAR()``, ``MONTH()`` and
+  ``LAST_INSERT_ID()`` are provided as SQL functions;
+- ``ON DUPLICATE KEY UPDATE ... VALUES(col)`` becomes an SQLite upsert,
+  ``INSERT IGNORE`` becomes ``INSERT OR IGNORE`` and ``FOR UPDATE`` is dropped;
+- ``GROUP_CONCAT(... ORDER BY ... SEPARATOR ...)`` loses its ordering;
+- in DDL, ``AUTO_INCREMENT`` keys, ``COMMENT`` clauses and table options are
+  rewritten or removed.
+
+SQLite errors are raised as the matching mysql.connector errors. DATE,
+DATETIME, TIMESTAMP and DECIMAL columns come back as date, datetime and
+Decimal values as they would from MySQL, and so do computed values that look
+like a date (``YYYY-MM-DD``); other computed values come back as SQLite
+returns them. The migrations are MySQL-only: ``load_schema`` builds the
+base ``schema.sql`` tables.
+"""
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+
+from mysql.connector import errors
+
+MEMORY = ":memory:"
+
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / "schema.sql"
+
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()[:10]))
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DECIMAL", lambda value: Decimal(value.decode()))
+
+def _as_date(value):
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value if not isinstance(value, datetime) else value.date()
+    return date.fromisoformat(str(value)[:10])
+
+def _datediff(end, start):
+    end, start = _as_date(end), _as_date(start)
+    if end is None or start is None:
+        return None
+    return (end - start).days
+
+def _year(value):
+    value = _as_date(value)
+    return value.year if value else None
+
+def _month(value):
+    value = _as_date(value)
+    return value.month if value else None
+
+_LITERAL = re.compile(r"('(?:[^'\\]|\\.|'')*')")
+_PLACEHOLDER = re.compile(r"%s|%%")
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE)
+_INSERT_IGNORE = re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE)
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALUES_FUNCTION = re.compile(r"\bVALUES\s*\(\s*`?(\w+)`?\s*\)", re.IGNORECASE)
+_GROUP_CONCAT = re.compile(
+    r"GROUP_CONCAT\(\s*(DISTINCT\s+)?(.+?)(?:\s+ORDER\s+BY\s+[^)]*?)?(?:\s+SEPARATOR\s+('[^']*'))?\s*\)",
+    re.IGNORECASE
+)
+_AUTO_INCREMENT_KEY = re.compile(
+    r"\bINT(?:EGER)?\s+(?:PRIMARY\s+KEY\s+AUTO_INCREMENT|AUTO_INCREMENT\s+PRIMARY\s+KEY)\b", re.IGNORECASE
+)
+_COMMENT = re.compile(r"\s+COMMENT\s*=?\s*'(?:[^'\\]|\\.|'')*'", re.IGNORECASE)
+_TABLE_OPTION = re.compile(r"\s+(?:ENGINE|DEFAULT\s+CHARSET|CHARSET|COLLATE)\s*=\s*\w+", re.IGNORECASE)
+_ON_UPDATE = re.compile(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b", re.IGNORECASE)
+
+def _group_concat(match):
+    distinct, expression, separator = match.groups()
+    if distinct:
+        # SQLite only allows DISTINCT with the default separator
+        return f"GROUP_CONCAT(DISTINCT {expression})"
+    return f"GROUP_CONCAT({expression}, {separator})" if separator else f"GROUP_CONCAT({expression})"
+
+@lru_cache(maxsize=1024)
+def translate(query, has_params=True):
+    """MySQL statement rewritten for SQLite (cached: the query set is fixed)"""
+    sql = query.strip().rstrip(";")
+    if re.match(r"(CREATE|ALTER)\s", sql, re.IGNORECASE):
+        sql = _AUTO_INCREMENT_KEY.sub("INTEGER PRIMARY KEY AUTOINCREMENT", sql)
+        sql = _COMMENT.sub("", sql)
+        sql = _TABLE_OPTION.sub("", sql)
+        sql = _ON_UPDATE.sub("", sql)
+    sql = _FOR_UPDATE.sub("", sql)
+    sql = _INSERT_IGNORE.sub("INSERT OR IGNORE", sql)
+    sql = _GROUP_CONCAT.sub(_group_concat, sql)
+    duplicate = _ON_DUPLICATE.search(sql)
+    if duplicate:
+        # The conflict target may be left out of the last ON CONFLICT clause
+        update = _VALUES_FUNCTION.sub(r"excluded.\1", sql[duplicate.end():])
+        sql = sql[:duplicate.start()] + "ON CONFLICT DO UPDATE SET" + update
+    if has_params:
+        parts = _LITERAL.split(sql)
+        for i in range(0, len(parts), 2):
+            parts[i] = _PLACEHOLDER.sub(lambda match: "?" if match.group() == "%s" else "%", parts[i])
+        sql = "".join(parts)
+    return sql
+
+def _database_error(error):
+    """mysql.connector error equivalent to a sqlite3 error"""
+    if isinstance(error, sqlite3.IntegrityError):
+        return errors.IntegrityError(msg=str(error))
+    if isinstance(error, sqlite3.ProgrammingError):
+        return errors.ProgrammingError(msg=str(error))
+    if isinstance(error, sqlite3.OperationalError):
+        return errors.OperationalError(msg=str(error))
+    return errors.DatabaseError(msg=str(error))
+
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+def _value(value):
+    # Declared DATE columns are converted already; this catches computed ones
+    if isinstance(value, str) and len(value) == 10 and _ISO_DATE.fullmatch(value):
+        return date.fromisoformat(value)
+    return value
+
+def _tuple_row(cursor, row):
+    return tuple(_value(value) for value in row)
+
+def _dict_row(cursor, row):
+    return {column[0]: _value(value) for column, value in zip(cursor.description, row)}
+
+class SQLiteCursor:
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self._cursor.row_factory = _dict_row if dictionary else _tuple_row
+        self._rows_read = 0
+
+    def execute(self, query, params=None, *args, **kwargs):
+        sql = translate(query, params is not None)
+        try:
+            self._cursor.execute(sql, () if params is None else params)
+        except sqlite3.Error as e:
+            raise _database_error(e) from e
+        self._rows_read = 0
+        if self._cursor.description is None and sql[:7].upper() in ("INSERT ", "REPLACE"):
+            self._connection.last_insert_id = self._cursor.lastrowid
+
+    def executemany(self, query, seq_params, *args, **kwargs):
+        try:
+            self._cursor.executemany(translate(query, True), seq_params)
+        except sqlite3.Error as e:
+            raise _database_error(e) from e
+
+    def _read(self, rows):
+        self._rows_read += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._rows_read += 1
+        return row
+
+    def fetchall(self):
+        return self._read(self._cursor.fetchall())
+
+    def fetchmany(self, size=1):
+        return self._read(self._cursor.fetchmany(size))
+
+    @property
+    def rowcount(self):
+        # Like a buffered MySQL cursor, SELECTs report the rows read so far
+        if self._cursor.description is not None:
+            return self._rows_read
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+class SQLiteConnection:
+    """sqlite3 connection behind the mysql.connector methods the app calls"""
+
+    def __init__(self, raw, database):
+        self.raw = raw
+        self.database = database
+        self.last_insert_id = 0
+        self._closed = False
+        raw.create_function("CURDATE", 0, lambda: date.today().isoformat())
+        raw.create_function("NOW", 0, lambda: datetime.now().isoformat(" ", timespec="seconds"))
+        raw.create_function("DATEDIFF", 2, _datediff, deterministic=True)
+        raw.create_function("YEAR", 1, _year, deterministic=True)
+        raw.create_function("MONTH", 1, _month, deterministic=True)
+        raw.create_function("LAST_INSERT_ID", 0, lambda: self.last_insert_id)
+        raw.execute("PRAGMA foreign_keys = ON")
+
+    def cursor(self, dictionary=False, buffered=None, **kwargs):
+        if self._closed:
+            raise errors.OperationalError(msg="Connection is closed")
+        return SQLiteCursor(self, dictionary=dictionary)
+
+    @property
+    def in_transaction(self):
+        return not self._closed and self.raw.in_transaction
+
+    def is_connected(self):
+        return not self._closed
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if self._closed:
+            raise errors.InterfaceError(msg="Connection is closed")
+        try:
+            self.raw.execute("SELECT 1").fetchone()
+        except sqlite3.Error as e:
+            raise _database_error(e) from e
+
+    def get_server_info(self):
+        return f"SQLite {sqlite3.sqlite_version}"
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.raw.close()
+
+# One connection held open per in-memory database so its contents outlive
+# the pool's connections (a shared in-memory database is freed with its last)
+_memory_anchors = {}
+
+def _memory_uri(name):
+    return f"file:{name}?mode=memory&cache=shared"
+
+def connect(path=MEMORY, name="tariffs_exemptions", timeout=30.0):
+    """Open a connection; every ``:memory:`` connection for ``name`` shares one database.
+
+    In-memory databases suit tests; concurrent writers should use a file,
+    which runs in WAL mode and waits up to ``timeout`` for locks.
+    """
+    if path == MEMORY:
+        if name not in _memory_anchors:
+            _memory_anchors[name] = sqlite3.connect(_memory_uri(name), uri=True, check_same_thread=False)
+        raw = sqlite3.connect(
+            _memory_uri(name), uri=True, timeout=timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False
+        )
+        # Shared-cache connections lock whole tables, with no busy wait; let
+        # reads skip those locks so a pending write does not fail them
+        raw.execute("PRAGMA read_uncommitted = 1")
+    else:
+        raw = sqlite3.connect(path, timeout=timeout, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        # Readers no longer block the writer (and the reverse)
+        raw.execute("PRAGMA journal_mode = WAL")
+    return SQLiteConnection(raw, name if path == MEMORY else path)
+
+def drop_memory_database(name="tariffs_exemptions"):
+    """Free an in-memory database once its pooled connections are closed"""
+    anchor = _memory_anchors.pop(name, None)
+    if anchor is not None:
+        anchor.close()
+
+def load_schema(connection, path=SCHEMA_PATH, sample_data=True):
+    """Create the schema.sql tables (and optionally its sample rows) on a connection"""
+    # Imported here: the migrations module depends on config, which imports this one
+    from app.database.migrations import split_sql_statements
+
+    script = Path(path).read_text(encoding="utf-8")
+    if not sample_data:
+        script = script.split("-- Insert sample data")[0]
+    cursor = connection.cursor()
+    try:
+        for statement in split_sql_statements(script):
+            if re.match(r"(DROP|CREATE)\s+DATABASE\b|USE\s", statement, re.IGNORECASE):
+                continue
+            cursor.execute(statement)
+        connection.commit()
+    finally:
+        cursor.close()
@@ -0,0 +1,186 @@
+"""Server-side prepared statements, cached per pooled connection.
+
+The routers and services run a fixed set of constant SQL strings. With
+``DB_PREPARED_STATEMENTS`` on, ``StatementCursor`` runs every parameterized
+statement through a prepared cursor kept with its connection and keyed by
+SQL text: the server parses and plans it once per connection, and later
+calls only send the parameters in the binary protocol.
+
+Each connection keeps up to ``capacity`` statements; the least recently
+used one is closed (deallocated on the server) to make room, which also
+keeps the total under MySQL's ``max_prepared_stmt_count``. Statements
+without parameters, ``executemany`` batches (the plain cursor rewrites
+INSERTs into one multi-row statement) and statements the server refuses to
+prepare go through an ordinary dictionary cursor.
+
+The aiomysql pool behind ``async_db.execute_query`` has no prepared
+statement support, so under the default ``DB_ASYNC_MODE=aiomysql`` only the
+blocking paths (services, ``transaction()``, ``run_sync`` work) and lookups
+made with ``async_db.execute_prepared`` use the cache. ``stats()`` counts hits
+and misses across all connections.
+"""
+import threading
+import weakref
+from collections import OrderedDict
+
+from mysql.connector import Error
+
+# Server error for statements the prepared protocol does not support
+ER_UNSUPPORTED_PS = 1295
+
+_caches = weakref.WeakKeyDictionary()
+_unpreparable = set()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "errors": 0, "unpreparable": 0}
+
+class StatementCache:
+    """Prepared cursors of one connection, least recently used first.
+
+    Holds no reference to the connection itself (the connector's cursors
+    only keep a weak proxy), so the cache goes away with its connection.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._cursors = OrderedDict()
+
+    def get(self, connection, query):
+        """Prepared cursor for ``query`` and the SQL object to execute on it.
+
+        The connector re-prepares unless it is handed the very string object
+        it prepared last, so hits return the cached key rather than ``query``.
+        """
+        entry = self._cursors.get(query)
+        if entry is not None:
+            self._cursors.move_to_end(query)
+            _count("hits")
+            return entry
+        _count("misses")
+        entry = (connection.cursor(prepared=True, dictionary=True), query)
+        self._cursors[query] = entry
+        if len(self._cursors) > self.capacity:
+            _, (evicted, _) = self._cursors.popitem(last=False)
+            _count("evictions")
+            _close_quietly(evicted)
+        return entry
+
+    def discard(self, query):
+        entry = self._cursors.pop(query, None)
+        if entry is not None:
+            _close_quietly(entry[0])
+
+    def __len__(self):
+        return len(self._cursors)
+
+def cache_for(connection, capacity):
+    cache = _caches.get(connection)
+    if cache is None:
+        cache = _caches[connection] = StatementCache(capacity)
+    return cache
+
+class StatementCursor:
+    """Dictionary cursor that prepares parameterized statements once per connection.
+
+    Results (``fetchall``, ``rowcount``, ``lastrowid`` ...) come from whichever
+    cursor ran the last statement. ``close`` drains unread rows and closes the
+    plain cursor; the prepared ones stay cached with the connection.
+    """
+
+    def __init__(self, connection, capacity):
+        self._connection = connection
+        self._cache = cache_for(connection, capacity)
+        self._plain = None
+        self._current = None
+
+    def _plain_cursor(self):
+        if self._plain is None:
+            self._plain = self._connection.cursor(dictionary=True)
+        return self._plain
+
+    def _drain(self):
+        # A prepared cursor left with unread rows would block the connection
+        if self._current is not None and self._current is not self._plain \
+                and getattr(self._connection, "unread_result", False) is True:
+            self._current.fetchall()
+
+    def execute(self, query, params=None, *args, **kwargs):
+        self._drain()
+        if not params or query in _unpreparable:
+            self._current = self._plain_cursor()
+            if params is None:
+                return self._current.execute(query)
+            return self._current.execute(query, params)
+
+        cursor, prepared_query = self._cache.get(self._connection, query)
+        self._current = cursor
+        try:
+            return cursor.execute(prepared_query, params)
+        except Error as e:
+            # Never reuse a cursor whose statement failed to prepare or run
+            self._cache.discard(query)
+            self._current = None
+            if getattr(e, "errno", None) != ER_UNSUPPORTED_PS:
+                _count("errors")
+                raise
+        with _lock:
+            _unpreparable.add(query)
+            _stats["unpreparable"] += 1
+        return self.execute(query, params)
+
+    def executemany(self, query, seq_params, *args, **kwargs):
+        self._drain()
+        self._current = self._plain_cursor()
+        return self._current.executemany(query, seq_params, *args, **kwargs)
+
+    def fetchone(self):
+        return self._current.fetchone()
+
+    def fetchall(self):
+        return self._current.fetchall()
+
+    def fetchmany(self, size=1):
+        return self._current.fetchmany(size)
+
+    @property
+    def rowcount(self):
+        return self._current.rowcount if self._current is not None else -1
+
+    @property
+    def lastrowid(self):
+        return self._current.lastrowid if self._current is not None else None
+
+    @property
+    def description(self):
+        return self._current.description if self._current is not None else None
+
+    def close(self):
+        try:
+            self._drain()
+        except Error:
+            pass
+        self._current = None
+        if self._plain is not None:
+            self._plain.close()
+            self._plain = None
+
+    def __iter__(self):
+        return iter(self._current)
+
+def _count(key):
+    with _lock:
+        _stats[key] += 1
+
+def _close_quietly(cursor):
+    try:
+        cursor.close()
+    except Exception:
+        pass
+
+def stats():
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    stats["connections"] = len(_caches)
+    stats["cached_statements"] = sum(len(cache) for cache in list(_caches.values()))
+    return stats
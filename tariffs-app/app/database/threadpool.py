@@ -0,0 +1,121 @@
+"""Bounded worker pool for blocking database code called from async handlers.
+
+``run_sync`` runs a blocking function (a query helper, a cursor transaction,
+a service call) on a dedicated pool of ``DB_THREADPOOL_SIZE`` threads and
+awaits the result, so the event loop keeps serving other requests while
+MySQL works. Calls beyond the pool size wait in the executor queue; its
+depth and wait times are reported by ``stats()``.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.database import config
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_queued = 0
+_active = 0
+_counters = {
+    "submitted": 0,
+    "completed": 0,
+    "failed": 0,
+    "cancelled": 0,
+    "max_queue_depth": 0,
+    "max_active": 0,
+    "total_wait": 0.0,
+    "max_wait": 0.0
+}
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=config.DB_THREADPOOL_SIZE, thread_name_prefix="db-worker")
+    return _executor
+
+def _submitted():
+    global _queued
+    with _stats_lock:
+        _queued += 1
+        _counters["submitted"] += 1
+        _counters["max_queue_depth"] = max(_counters["max_queue_depth"], _queued)
+
+def _started(wait):
+    global _queued, _active
+    with _stats_lock:
+        _queued -= 1
+        _active += 1
+        _counters["max_active"] = max(_counters["max_active"], _active)
+        _counters["total_wait"] += wait
+        _counters["max_wait"] = max(_counters["max_wait"], wait)
+
+def _finished(failed):
+    global _active
+    with _stats_lock:
+        _active -= 1
+        _counters["failed" if failed else "completed"] += 1
+
+def _cancelled(future):
+    # A call cancelled while still queued never reaches _started
+    global _queued
+    if future.cancelled():
+        with _stats_lock:
+            _queued -= 1
+            _counters["cancelled"] += 1
+
+async def run_sync(func, *args, **kwargs):
+    """Run a blocking call on the database worker pool and await its result.
+
+    The caller's context variables are visible inside the call, as with
+    ``asyncio.to_thread``.
+    """
+    submitted_at = time.perf_counter()
+
+    def call():
+        _started(time.perf_counter() - submitted_at)
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _finished(failed)
+
+    context = contextvars.copy_context()
+    _submitted()
+    future = get_executor().submit(context.run, call)
+    future.add_done_callback(_cancelled)
+    return await asyncio.wrap_future(future)
+
+def stats():
+    with _stats_lock:
+        counters = dict(_counters)
+        queued, active = _queued, _active
+    started = counters["completed"] + counters["failed"] + active
+    return {
+        "mode": config.DB_ASYNC_MODE,
+        "max_workers": config.DB_THREADPOOL_SIZE,
+        "active": active,
+        "queue_depth": queued,
+        "max_queue_depth": counters["max_queue_depth"],
+        "max_active": counters["max_active"],
+        "submitted": counters["submitted"],
+        "completed": counters["completed"],
+        "failed": counters["failed"],
+        "cancelled": counters["cancelled"],
+        "avg_wait_ms": round(counters["total_wait"] * 1000 / started, 3) if started else 0.0,
+        "max_wait_ms": round(counters["max_wait"] * 1000, 3)
+    }
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
@@ -1,14 +1,22 @@
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 import uvicorn
 from pathlib import Path
 
 from app.routers import passenger_router, ticketing_router, admin_router
-from app.database.config import ensure_activity_log_table_exists
+from app.database.config import ensure_activity_log_table_exists, dispose_pool
+from app.database import migrations, async_db, threadpool
+from app.services import tariff_cache, exemption_index
+from app.monitoring import logs, metrics
+from app.monitoring.query_budget import QueryBudgetMiddleware
+
+logs.configure()
 
 app = FastAPI(title="Tariffs & Exemptions Management System")
+app.add_middleware(QueryBudgetMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 templates = Jinja2Templates(directory="app/templates")
 
@@ -21,6 +29,17 @@ app.include_router(admin_router.router, prefix="/admin", tags=["Transport Admini
 @app.on_event("startup")
 async def startup_event():
     ensure_activity_log_table_exists()
+    if migrations.AUTO_MIGRATE:
+        migrations.apply_migrations()
+    tariff_cache.refresh()
+    exemption_index.refresh()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await async_db.close_pool()
+    threadpool.shutdown()
+    dispose_pool()
+    logs.shutdown()
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
@@ -29,5 +48,10 @@ async def root(request: Request):
         {"request": request, "title": "Tariffs & Exemptions System"}
     )
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Request, query, pool and ticketing metrics for Prometheus"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
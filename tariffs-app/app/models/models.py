@@ -60,6 +60,18 @@ class PaymentConfirmation(BaseModel):
     payment_method: str
     transaction_ref: Optional[str] = None
 
+# Batch ticket issuance
+class TicketBatchItem(BaseModel):
+    passenger_id: int
+    fare_type_id: int
+    base_fare: float
+    discount: float
+    final_fare: float
+    payment_method: str
+
+class TicketBatchRequest(BaseModel):
+    items: List[TicketBatchItem]
+
 # Custom response models
 class PassengerExemptionSummary(BaseModel):
     passenger_id: int
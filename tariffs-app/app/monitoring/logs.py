@@ -0,0 +1,133 @@
+"""Application logging: buffered, levelled and sampled.
+
+Records are put on an in-memory queue by the calling thread and written to
+stdout by a single background listener, so a slow terminal or log pipe
+never stalls a request. When the queue is full new records are dropped and
+counted instead of blocking.
+
+Settings (environment):
+
+- ``LOG_LEVEL``: threshold for the ``tariffs`` loggers (default INFO). SQL
+  text and parameters are logged at DEBUG; query timings at INFO.
+- ``LOG_FORMAT``: ``text`` (default) or ``json``, one object per line.
+- ``LOG_QUERY_SAMPLE_RATE``: fraction of query timing records kept (default
+  1.0). Queries slower than ``LOG_SLOW_QUERY_MS`` are always kept.
+- ``LOG_QUEUE_SIZE``: records buffered before dropping (default 10000).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_QUERY_SAMPLE_RATE = float(os.getenv("LOG_QUERY_SAMPLE_RATE", "1.0"))
+LOG_SLOW_QUERY_MS = float(os.getenv("LOG_SLOW_QUERY_MS", "500"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+ROOT_LOGGER = "tariffs"
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class QuerySampler(logging.Filter):
+    """Keep a fraction of query timing records; slow queries always pass"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.sampled_out = 0
+
+    def filter(self, record):
+        if self.rate >= 1.0 or getattr(record, "duration_ms", 0) >= LOG_SLOW_QUERY_MS:
+            return True
+        if random.random() < self.rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+query_sampler = QuerySampler(LOG_QUERY_SAMPLE_RATE)
+get_logger("sql").addFilter(query_sampler)
+
+def configure():
+    """Route the application's loggers through the background queue (idempotent)"""
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == "json":
+            stream.setFormatter(JsonFormatter())
+        else:
+            stream.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+
+        _handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(_handler.queue, stream, respect_handler_level=True)
+        _listener.start()
+        # The listener thread is a daemon; flush what is queued on exit
+        atexit.register(shutdown)
+
+def shutdown():
+    """Flush buffered records and stop the listener thread"""
+    global _listener, _handler
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger(ROOT_LOGGER).removeHandler(_handler)
+        _listener = None
+        _handler = None
+
+def stats():
+    return {
+        "level": logging.getLevelName(logging.getLogger(ROOT_LOGGER).getEffectiveLevel()),
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+        "query_sample_rate": query_sampler.rate,
+        "queries_sampled_out": query_sampler.sampled_out
+    }
@@ -0,0 +1,283 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+A small registry of counters, histograms and callback gauges, rendered by
+the ``/metrics`` endpoint. It covers:
+
+- HTTP latency and error counts per route, grouped by area (passenger,
+  ticketing, admin), recorded by ``MetricsMiddleware``;
+- query latency and errors per normalized SQL statement, through the query
+  observer hook in ``app.database.config``;
+- pool checkout wait for both the blocking and the async connection pools;
+- tickets issued and issuance failures;
+- current pool and worker queue occupancy.
+
+Every worker process keeps its own values; scrape each one.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from app.database import config, threadpool
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Longest statement label; longer statements are cut and marked
+MAX_STATEMENT_LENGTH = 300
+
+AREAS = ("passenger", "ticketing", "admin")
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def count(self, **labels):
+        series = self._values.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(series[0]), series[1])) for key, series in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Gauge(Metric):
+    """Gauge read from a callback at scrape time.
+
+    The callback returns a number, or a dict of label-value tuples to numbers.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, function, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def _samples(self):
+        try:
+            values = self.function()
+        except Exception:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("area", "method", "route", "status")
+))
+http_request_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("area", "method", "route")
+))
+http_request_errors = REGISTRY.register(Counter(
+    "http_request_errors_total", "HTTP requests answered with a 5xx status or an unhandled error", ("area", "route")
+))
+db_query_duration = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "Query latency by normalized SQL statement", ("statement",)
+))
+db_query_errors = REGISTRY.register(Counter(
+    "db_query_errors_total", "Failed queries by normalized SQL statement", ("statement",)
+))
+db_pool_checkout_wait = REGISTRY.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("pool",)
+))
+tickets_issued = REGISTRY.register(Counter(
+    "tickets_issued_total", "Tickets issued", ("channel",)
+))
+ticket_issuance_errors = REGISTRY.register(Counter(
+    "ticket_issuance_errors_total", "Ticket issuance requests or batch items that failed", ("channel",)
+))
+REGISTRY.register(Gauge(
+    "db_pool_connections", "Open connections in the blocking pool by state",
+    lambda: {
+        ("checked_out",): config.get_pool_stats()["checked_out"],
+        ("idle",): config.get_pool_stats()["idle_connections"]
+    },
+    ("state",)
+))
+REGISTRY.register(Gauge(
+    "db_threadpool_queue_depth", "Blocking database calls waiting for a worker",
+    lambda: threadpool.stats()["queue_depth"]
+))
+REGISTRY.register(Gauge(
+    "db_threadpool_active_workers", "Workers running a blocking database call",
+    lambda: threadpool.stats()["active"]
+))
+
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))+\s*\)")
+_ROW_LIST = re.compile(r"(\((?:[^()]|\([^()]*\))*\))(?:\s*,\s*\((?:[^()]|\([^()]*\))*\))+")
+
+def normalize_statement(query):
+    """SQL text reduced to its shape: literals, IN lists and multi-row VALUES collapsed"""
+    statement = " ".join(query.split())
+    statement = _LITERALS.sub("?", statement)
+    statement = _IN_LIST.sub("(...)", statement)
+    statement = _ROW_LIST.sub(r"\1, ...", statement)
+    if len(statement) > MAX_STATEMENT_LENGTH:
+        statement = statement[:MAX_STATEMENT_LENGTH - 3] + "..."
+    return statement
+
+def _observe_query(query, params, duration, error=None, rows=None):
+    statement = normalize_statement(query)
+    if error is not None:
+        db_query_errors.inc(statement=statement)
+    elif duration is not None:
+        db_query_duration.observe(duration, statement=statement)
+
+def _observe_checkout(wait_time, pool):
+    db_pool_checkout_wait.observe(wait_time, pool=pool)
+
+config.add_query_observer(_observe_query)
+config.add_checkout_observer(_observe_checkout)
+
+_route_paths = {}
+
+def route_label(scope):
+    """Route template for a handled request, e.g. ``/passenger/dashboard``"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        app = scope.get("app")
+        for route in getattr(app, "routes", ()):
+            if getattr(route, "endpoint", None) is endpoint:
+                path = route.path
+                break
+        else:
+            path = getattr(endpoint, "__name__", "unknown")
+        _route_paths[endpoint] = path
+    return path
+
+def area_label(route):
+    area = route.strip("/").split("/", 1)[0]
+    return area if area in AREAS else "other"
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and errors per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_label(scope)
+            area = area_label(route)
+            method = scope.get("method", "")
+            http_request_duration.observe(time.perf_counter() - started, area=area, method=method, route=route)
+            http_requests.inc(area=area, method=method, route=route, status=status)
+            if status >= 500:
+                http_request_errors.inc(area=area, route=route)
@@ -0,0 +1,138 @@
+"""Per-request query accounting: count, database time and repeated statements.
+
+``QueryBudgetMiddleware`` opens a ``QueryStats`` for every HTTP request and
+reports it in the ``X-DB-Query-Count``, ``X-DB-Time-Ms`` and
+``X-DB-Duplicate-Queries`` response headers. Queries are recorded through
+the observer hook in ``app.database.config``, so anything run through
+``execute_query``, ``stream_query``, ``transaction()`` or the async layer is
+counted, including work offloaded to the database thread pool.
+
+A statement counts as a duplicate when the same SQL text runs again within
+the request, whatever its parameters; a loop issuing one lookup per row
+(N+1) shows up as a high duplicate count.
+
+Tests can hold a route to a query budget with ``track_queries``:
+
+    with track_queries(max_queries=4):
+        asyncio.run(passenger_router.exemption_status_report(request, 1))
+"""
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.database import config
+from app.monitoring.logs import get_logger
+
+# Log a warning for requests issuing more queries than this; 0 disables
+REQUEST_QUERY_BUDGET = int(os.getenv("REQUEST_QUERY_BUDGET", "0"))
+# Completed requests kept for /admin/system/query-budget
+RECENT_REQUESTS = 50
+
+logger = get_logger("query_budget")
+
+_current = ContextVar("query_stats", default=None)
+_recent = deque(maxlen=RECENT_REQUESTS)
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+class QueryStats:
+    def __init__(self, route=None):
+        self.route = route
+        self.count = 0
+        self.total_time = 0.0
+        self.statements = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, query, duration):
+        key = " ".join(query.split())
+        with self._lock:
+            self.count += 1
+            self.total_time += duration or 0.0
+            self.statements[key] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+    def repeated(self, limit=5):
+        """Most repeated statements as (sql, times run)"""
+        return [(sql, count) for sql, count in self.statements.most_common(limit) if count > 1]
+
+    def as_dict(self):
+        return {
+            "queries": self.count,
+            "db_time_ms": round(self.total_time * 1000, 3),
+            "duplicate_queries": self.duplicates,
+            "repeated": [{"sql": sql, "count": count} for sql, count in self.repeated()]
+        }
+
+def current():
+    return _current.get()
+
+def _observe(query, params, duration, error=None, rows=None):
+    stats = _current.get()
+    if stats is not None:
+        stats.record(query, duration)
+
+config.add_query_observer(_observe)
+
+@contextmanager
+def track_queries(max_queries=None):
+    """Count the queries run inside the block; fail if more than ``max_queries``"""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+    if max_queries is not None and stats.count > max_queries:
+        repeated = "; ".join(f"{count}x {sql[:80]}" for sql, count in stats.repeated())
+        raise QueryBudgetExceeded(
+            f"{stats.count} queries run, budget is {max_queries}" + (f" (repeated: {repeated})" if repeated else "")
+        )
+
+def recent():
+    return list(_recent)
+
+class QueryBudgetMiddleware:
+    """ASGI middleware adding per-request query headers"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(f"{scope.get('method')} {scope.get('path')}")
+        token = _current.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.total_time * 1000:.3f}".encode()))
+                headers.append((b"x-db-duplicate-queries", str(stats.duplicates).encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            summary = stats.as_dict()
+            summary["path"] = scope.get("path")
+            summary["method"] = scope.get("method")
+            summary["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            _recent.append(summary)
+            if REQUEST_QUERY_BUDGET and stats.count > REQUEST_QUERY_BUDGET:
+                logger.warning(
+                    "%s %s ran %s queries (budget %s, %s duplicates)",
+                    summary["method"], summary["path"], stats.count, REQUEST_QUERY_BUDGET, stats.duplicates
+                )
@@ -0,0 +1,188 @@
+"""Capture of slow statements, with query plans gathered in the background.
+
+Every statement slower than ``SLOW_QUERY_MS`` (through ``execute_query``,
+``stream_query``, ``transaction()`` cursors or the async layer) is recorded
+in a ring buffer of the last ``SLOW_QUERY_BUFFER`` occurrences and
+aggregated per normalized statement. Records carry the route that issued
+the query, the duration, the row count and a fingerprint of the parameters;
+the parameter values themselves are not kept.
+
+The first time a SELECT shape is seen, its text and parameters are handed to
+a background thread that runs ``EXPLAIN FORMAT=JSON`` on its own pooled
+connection, so requests never wait for a plan. Plans are cached per
+statement. ``/admin/system/slow-queries`` lists the worst offenders.
+"""
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from mysql.connector import Error
+
+from app.database import config
+from app.monitoring import query_budget
+from app.monitoring.logs import get_logger
+from app.monitoring.metrics import normalize_statement
+
+# Statements at or above this duration are captured; 0 disables capture
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+# Plans waiting for the worker; further requests are dropped until it catches up
+EXPLAIN_QUEUE_SIZE = 50
+
+logger = get_logger("slow_queries")
+
+_lock = threading.Lock()
+_recent = deque(maxlen=SLOW_QUERY_BUFFER)
+_statements = {}
+_plans = {}
+_explain_queue = queue.Queue(EXPLAIN_QUEUE_SIZE)
+_worker = None
+_counters = {"captured": 0, "explained": 0, "explain_failures": 0, "explains_dropped": 0}
+
+def fingerprint(params):
+    """Short stable hash of the parameter values"""
+    if params is None:
+        return None
+    return hashlib.blake2b(repr(params).encode(), digest_size=8).hexdigest()
+
+def _explainable(query):
+    words = query.split(None, 1)
+    return bool(words) and words[0].upper() in ("SELECT", "WITH")
+
+def _observe(query, params, duration, error=None, rows=None):
+    if error is not None or duration is None or not SLOW_QUERY_MS or duration * 1000 < SLOW_QUERY_MS:
+        return
+    record(query, params, duration, rows)
+
+def record(query, params, duration, rows=None):
+    statement = normalize_statement(query)
+    stats = query_budget.current()
+    entry = {
+        "statement": statement,
+        "params_fingerprint": fingerprint(params),
+        "duration_ms": round(duration * 1000, 3),
+        "rows": rows if rows is None or rows >= 0 else None,
+        "route": stats.route if stats is not None else None,
+        "captured_at": time.time()
+    }
+    with _lock:
+        _counters["captured"] += 1
+        _recent.append(entry)
+        summary = _statements.get(statement)
+        if summary is None:
+            summary = _statements[statement] = {
+                "statement": statement, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "routes": set()
+            }
+            new_statement = True
+        else:
+            new_statement = False
+        summary["count"] += 1
+        summary["total_ms"] += entry["duration_ms"]
+        summary["max_ms"] = max(summary["max_ms"], entry["duration_ms"])
+        summary["last_seen"] = entry["captured_at"]
+        summary["last_rows"] = entry["rows"]
+        if entry["route"]:
+            summary["routes"].add(entry["route"])
+
+    logger.warning("Slow query (%s ms, route %s): %s", entry["duration_ms"], entry["route"], statement)
+    if new_statement and SLOW_QUERY_EXPLAIN and config.DB_BACKEND == "mysql" and _explainable(query):
+        _request_plan(statement, query, params)
+
+def _request_plan(statement, query, params):
+    _start_worker()
+    try:
+        _explain_queue.put_nowait((statement, query, params))
+    except queue.Full:
+        with _lock:
+            _counters["explains_dropped"] += 1
+
+def _start_worker():
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_explain_loop, name="slow-query-explain", daemon=True)
+            _worker.start()
+
+def _explain_loop():
+    while True:
+        statement, query, params = _explain_queue.get()
+        try:
+            plan = explain(query, params)
+        except Exception as e:
+            logger.error(f"Could not EXPLAIN slow query: {e}")
+            plan = None
+        with _lock:
+            if plan is None:
+                _counters["explain_failures"] += 1
+            else:
+                _counters["explained"] += 1
+                _plans[statement] = plan
+        _explain_queue.task_done()
+
+def explain(query, params=None):
+    """EXPLAIN FORMAT=JSON for a statement, as a dict (None if it failed).
+
+    Uses its own connection and cursor rather than execute_query so the plan
+    lookup is neither counted nor captured itself.
+    """
+    connection = config.get_db_connection()
+    if not connection:
+        return None
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute("EXPLAIN FORMAT=JSON " + query, params or ())
+        row = cursor.fetchone()
+        return json.loads(row[0]) if row else None
+    except Error as e:
+        logger.error(f"EXPLAIN failed: {e}")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+        config.close_connection(connection)
+
+def wait_for_plans(timeout=5.0):
+    """Block until queued EXPLAINs have run (for tests and the CLI)"""
+    deadline = time.monotonic() + timeout
+    while _explain_queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def top_statements(limit=20, order_by="total_ms"):
+    """Aggregated slow statements, worst first, each with its plan if known"""
+    with _lock:
+        summaries = [dict(summary, routes=sorted(summary["routes"])) for summary in _statements.values()]
+        plans = dict(_plans)
+    summaries.sort(key=lambda summary: summary[order_by], reverse=True)
+    for summary in summaries[:limit]:
+        summary["avg_ms"] = round(summary["total_ms"] / summary["count"], 3)
+        summary["total_ms"] = round(summary["total_ms"], 3)
+        summary["plan"] = plans.get(summary["statement"])
+    return summaries[:limit]
+
+def recent(limit=50):
+    with _lock:
+        return list(_recent)[-limit:][::-1]
+
+def clear():
+    with _lock:
+        _recent.clear()
+        _statements.clear()
+        _plans.clear()
+
+def stats():
+    with _lock:
+        return dict(
+            _counters,
+            threshold_ms=SLOW_QUERY_MS,
+            buffered=len(_recent),
+            statements=len(_statements),
+            explain_queue=_explain_queue.qsize()
+        )
+
+config.add_query_observer(_observe)
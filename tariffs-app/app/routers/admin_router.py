@@ -1,46 +1,77 @@
 from fastapi import APIRouter, Request, Form, HTTPException, Depends
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
-from datetime import date, datetime, timedelta
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from datetime import date, timedelta
 from typing import List, Optional
 
 from app.models.models import FareType, Tariff, ExemptionApplication, Exemption
-from app.database.config import execute_query, get_db_connection, close_connection
+from app.database.config import get_db_connection, close_connection, InstrumentedCursor, statement_cursor, get_pool_stats
+from app.database import async_db, threadpool, statement_cache
+from app.database.async_db import execute_query
+from app.database.threadpool import run_sync
+from app.services import tariff_cache, exemption_index, fare_usage_rollup, dashboard_metrics, report_export, revenue_forecast, passenger_activity, passenger_report, exemption_applications
+from app.monitoring import logs, query_budget, slow_queries
+from app.monitoring.logs import get_logger
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
+logger = get_logger("admin")
 
 # Admin dashboard
 @router.get("/", response_class=HTMLResponse)
 async def admin_dashboard(request: Request):
     """Admin dashboard with overview of system metrics"""
-    # Count of fare types
-    fare_types_count = execute_query("SELECT COUNT(*) as count FROM fare_type")[0]['count']
-    
-    # Count of exemption applications by status
-    exemption_stats = execute_query("""
-        SELECT status, COUNT(*) as count 
-        FROM exemption_application 
-        GROUP BY status
-    """)
-    
-    # Recent tickets
-    recent_tickets = execute_query("""
-        SELECT t.*, p.passenger_full_name, ft.type_name
-        FROM ticket t
-        JOIN passenger p ON t.passenger_id = p.passenger_id
-        JOIN fare_type ft ON t.fare_type_id = ft.fare_type_id
-        ORDER BY t.purchase_date DESC
-        LIMIT 5
-    """)
+    # Counters and recent tickets come from the in-memory metrics snapshot
+    metrics = await run_sync(dashboard_metrics.get_metrics)
+    if metrics:
+        context = metrics.as_context()
+    else:
+        context = {"fare_types_count": 0, "exemption_stats": [], "recent_tickets": []}
     
     return templates.TemplateResponse(
         "admin/dashboard.html",
+        {"request": request, **context}
+    )
+
+# Database connection pool statistics, used for sizing the pool under load
+@router.get("/system/db-stats")
+async def database_stats():
+    """Expose connection pool counters as JSON"""
+    return JSONResponse({
+        "pool": get_pool_stats(),
+        "async_pool": async_db.get_pool_stats(),
+        "threadpool": threadpool.stats(),
+        "prepared_statements": statement_cache.stats(),
+        "logging": logs.stats(),
+        "slow_queries": slow_queries.stats(),
+        "tariff_cache": tariff_cache.stats(),
+        "exemption_index": exemption_index.stats(),
+        "dashboard_metrics": dashboard_metrics.stats(),
+        "revenue_forecast": revenue_forecast.stats()
+    })
+
+@router.get("/system/query-budget")
+async def query_budget_stats():
+    """Query counts, database time and repeated statements for recent requests"""
+    return JSONResponse({
+        "budget": query_budget.REQUEST_QUERY_BUDGET,
+        "requests": query_budget.recent()
+    })
+
+@router.get("/system/slow-queries", response_class=HTMLResponse)
+async def slow_query_report(request: Request, order_by: str = "total_ms"):
+    """Slowest statements with their captured query plans"""
+    if order_by not in ("total_ms", "max_ms", "count"):
+        order_by = "total_ms"
+    return templates.TemplateResponse(
+        "admin/slow_queries.html",
         {
             "request": request,
-            "fare_types_count": fare_types_count,
-            "exemption_stats": exemption_stats,
-            "recent_tickets": recent_tickets
+            "statements": slow_queries.top_statements(order_by=order_by),
+            "recent": slow_queries.recent(20),
+            "stats": slow_queries.stats(),
+            "order_by": order_by
         }
     )
 
@@ -50,6 +81,68 @@ async def create_fare_type_form(request: Request):
     """Form for creating a new fare type"""
     return templates.TemplateResponse("admin/create_fare_type.html", {"request": request})
 
+def _insert_fare_type(type_name, description, validity, base_price, discount_rate):
+    """Fare type, tariff and activity log rows in one transaction; returns the new id"""
+    # Start transaction
+    conn = get_db_connection()
+    cursor = InstrumentedCursor(statement_cursor(conn))
+    try:
+        # First, create the fare type
+        fare_query = """
+            INSERT INTO fare_type (type_name, description, validity)
+            VALUES (%s, %s, %s)
+        """
+        fare_params = (type_name, description, validity)
+        
+        # Log the fare type creation query with its parameters
+        logger.debug("Fare type creation: %s params=%s", fare_query.strip(), fare_params)
+        
+        cursor.execute(fare_query, fare_params)
+        
+        # Get the new fare type ID
+        fare_type_id = cursor.lastrowid
+        logger.debug("Generated fare type ID: %s", fare_type_id)
+        
+        # Create the tariff
+        tariff_query = """
+            INSERT INTO tariff (base_price, discount_rate, fare_type_id)
+            VALUES (%s, %s, %s)
+        """
+        tariff_params = (base_price, discount_rate, fare_type_id)
+        
+        # Log the tariff creation query with its parameters
+        logger.debug("Tariff creation: %s params=%s", tariff_query.strip(), tariff_params)
+        
+        cursor.execute(tariff_query, tariff_params)
+        
+        # Log the creation in activity_log table
+        log_query = """
+            INSERT INTO activity_log (activity_type, description, entity_id, entity_type, created_at)
+            VALUES (%s, %s, %s, %s, NOW())
+        """
+        log_description = f"New fare type '{type_name}' created with base price {base_price} and discount rate {discount_rate}%"
+        log_params = ("fare_type_creation", log_description, fare_type_id, "fare_type")
+        
+        # Log the activity log insertion
+        logger.debug("Activity log entry: %s params=%s", log_query.strip(), log_params)
+        
+        cursor.execute(log_query, log_params)
+        
+        # Commit the transaction
+        conn.commit()
+        logger.info(f"New fare type created: ID {fare_type_id}, Name '{type_name}', Base Price {base_price}")
+        return fare_type_id
+        
+    except Exception:
+        # Rollback in case of error to maintain data consistency
+        if conn.is_connected():
+            conn.rollback()
+        raise
+    
+    finally:
+        cursor.close()
+        close_connection(conn)
+
 @router.post("/fare-types/create")
 async def create_fare_type(
     request: Request,
@@ -68,7 +161,7 @@ async def create_fare_type(
         errors.append("Type name must be between 2 and 50 characters")
     
     # Check if fare type name already exists
-    existing_fare_type = execute_query("SELECT fare_type_id FROM fare_type WHERE type_name = %s", (type_name,))
+    existing_fare_type = await execute_query("SELECT fare_type_id FROM fare_type WHERE type_name = %s", (type_name,))
     if existing_fare_type:
         errors.append(f"A fare type with name '{type_name}' already exists")
     
@@ -99,79 +192,9 @@ async def create_fare_type(
         )
     
     try:
-        # Start transaction
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # First, create the fare type
-        fare_query = """
-            INSERT INTO fare_type (type_name, description, validity)
-            VALUES (%s, %s, %s)
-        """
-        fare_params = (type_name, description, validity)
-        
-        # Log the fare type creation query with its parameters
-        print(f"\n[FARE TYPE CREATION - {datetime.now()}]")
-        print("-" * 80)
-        print(f"SQL QUERY: {fare_query}")
-        print(f"PARAMETERS: {fare_params}")
-        print("-" * 80)
-        
-        cursor.execute(fare_query, fare_params)
-        
-        # Get the new fare type ID
-        fare_type_id = cursor.lastrowid
-        print(f"GENERATED FARE TYPE ID: {fare_type_id}")
-        
-        # Create the tariff
-        tariff_query = """
-            INSERT INTO tariff (base_price, discount_rate, fare_type_id)
-            VALUES (%s, %s, %s)
-        """
-        tariff_params = (base_price, discount_rate, fare_type_id)
-        
-        # Log the tariff creation query with its parameters
-        print(f"\n[TARIFF CREATION - {datetime.now()}]")
-        print("-" * 80)
-        print(f"SQL QUERY: {tariff_query}")
-        print(f"PARAMETERS: {tariff_params}")
-        print("-" * 80)
-        
-        cursor.execute(tariff_query, tariff_params)
-        
-        # Log the creation in activity_log table
-        log_query = """
-            INSERT INTO activity_log (activity_type, description, entity_id, entity_type, created_at)
-            VALUES (%s, %s, %s, %s, NOW())
-        """
-        log_description = f"New fare type '{type_name}' created with base price {base_price} and discount rate {discount_rate}%"
-        log_params = ("fare_type_creation", log_description, fare_type_id, "fare_type")
-        
-        # Log the activity log insertion
-        print(f"\n[ACTIVITY LOG ENTRY - {datetime.now()}]")
-        print("-" * 80)
-        print(f"SQL QUERY: {log_query}")
-        print(f"PARAMETERS: {log_params}")
-        print("-" * 80)
-        
-        cursor.execute(log_query, log_params)
-        
-        # Commit the transaction
-        conn.commit()
-        print(f"[INFO] New fare type created: ID {fare_type_id}, Name '{type_name}', Base Price {base_price}")
-        cursor.close()
-        close_connection(conn)
-        
-        return RedirectResponse(url="/admin/fare-types", status_code=303)
-    
+        await run_sync(_insert_fare_type, type_name, description, validity, base_price, discount_rate)
     except Exception as e:
-        # Rollback in case of error to maintain data consistency
-        if 'conn' in locals() and conn.is_connected():
-            conn.rollback()
-            cursor.close()
-            close_connection(conn)
-        
-        print(f"[ERROR] Failed to create fare type: {str(e)}")
+        logger.error(f"Failed to create fare type: {str(e)}")
         return templates.TemplateResponse(
             "admin/create_fare_type.html", 
             {
@@ -184,12 +207,18 @@ async def create_fare_type(
                 "discount_rate": discount_rate
             }
         )
+    
+    # Publish the change to the in-memory tariff snapshot
+    await run_sync(tariff_cache.refresh)
+    dashboard_metrics.fare_type_created()
+    
+    return RedirectResponse(url="/admin/fare-types", status_code=303)
 
 # 1.2 Update Fare Type
 @router.get("/fare-types", response_class=HTMLResponse)
 async def list_fare_types(request: Request):
     """List all fare types for management"""
-    fare_types = execute_query("""
+    fare_types = await execute_query("""
         SELECT ft.*, t.base_price, t.discount_rate
         FROM fare_type ft
         JOIN tariff t ON ft.fare_type_id = t.fare_type_id
@@ -203,7 +232,7 @@ async def list_fare_types(request: Request):
 @router.get("/fare-types/{fare_type_id}/edit", response_class=HTMLResponse)
 async def edit_fare_type_form(request: Request, fare_type_id: int):
     """Form for editing an existing fare type"""
-    fare_type = execute_query("""
+    fare_type = await execute_query("""
         SELECT ft.*, t.base_price, t.discount_rate, t.tariff_id
         FROM fare_type ft
         JOIN tariff t ON ft.fare_type_id = t.fare_type_id
@@ -218,23 +247,12 @@ async def edit_fare_type_form(request: Request, fare_type_id: int):
         {"request": request, "fare_type": fare_type[0]}
     )
 
-@router.post("/fare-types/{fare_type_id}/edit")
-async def update_fare_type(
-    request: Request,
-    fare_type_id: int,
-    type_name: str = Form(...),
-    description: str = Form(...),
-    validity: str = Form(...),
-    base_price: float = Form(...),
-    discount_rate: float = Form(...),
-    tariff_id: int = Form(...)
-):
-    """Process fare type update form"""
+def _update_fare_type(fare_type_id, type_name, description, validity, base_price, discount_rate, tariff_id):
+    """Fare type, tariff and activity log changes in one transaction"""
+    # Start transaction
+    conn = get_db_connection()
+    cursor = InstrumentedCursor(statement_cursor(conn))
     try:
-        # Start transaction
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         # Update fare type
         fare_query = """
             UPDATE fare_type 
@@ -244,11 +262,7 @@ async def update_fare_type(
         fare_params = (type_name, description, validity, fare_type_id)
         
         # Log the fare type update query with its parameters
-        print(f"\n[FARE TYPE UPDATE - {datetime.now()}]")
-        print("-" * 80)
-        print(f"SQL QUERY: {fare_query}")
-        print(f"PARAMETERS: {fare_params}")
-        print("-" * 80)
+        logger.debug("Fare type update: %s params=%s", fare_query.strip(), fare_params)
         
         cursor.execute(fare_query, fare_params)
         
@@ -261,11 +275,7 @@ async def update_fare_type(
         tariff_params = (base_price, discount_rate, tariff_id)
         
         # Log the tariff update query with its parameters
-        print(f"\n[TARIFF UPDATE - {datetime.now()}]")
-        print("-" * 80)
-        print(f"SQL QUERY: {tariff_query}")
-        print(f"PARAMETERS: {tariff_params}")
-        print("-" * 80)
+        logger.debug("Tariff update: %s params=%s", tariff_query.strip(), tariff_params)
         
         cursor.execute(tariff_query, tariff_params)
         
@@ -278,37 +288,54 @@ async def update_fare_type(
         log_params = ("fare_type_update", log_description, fare_type_id, "fare_type")
         
         # Log the activity log insertion
-        print(f"\n[ACTIVITY LOG ENTRY - {datetime.now()}]")
-        print("-" * 80)
-        print(f"SQL QUERY: {log_query}")
-        print(f"PARAMETERS: {log_params}")
-        print("-" * 80)
+        logger.debug("Activity log entry: %s params=%s", log_query.strip(), log_params)
         
         cursor.execute(log_query, log_params)
         
         # Commit the transaction
         conn.commit()
-        print(f"[INFO] Fare type updated: ID {fare_type_id}, Name '{type_name}'")
-        cursor.close()
-        close_connection(conn)
+        logger.info(f"Fare type updated: ID {fare_type_id}, Name '{type_name}'")
         
-        return RedirectResponse(url="/admin/fare-types", status_code=303)
-    
-    except Exception as e:
+    except Exception:
         # Rollback in case of error to maintain data consistency
-        if 'conn' in locals() and conn.is_connected():
+        if conn.is_connected():
             conn.rollback()
-            cursor.close()
-            close_connection(conn)
-        
-        print(f"[ERROR] Failed to update fare type: {str(e)}")
+        raise
+    
+    finally:
+        cursor.close()
+        close_connection(conn)
+
+@router.post("/fare-types/{fare_type_id}/edit")
+async def update_fare_type(
+    request: Request,
+    fare_type_id: int,
+    type_name: str = Form(...),
+    description: str = Form(...),
+    validity: str = Form(...),
+    base_price: float = Form(...),
+    discount_rate: float = Form(...),
+    tariff_id: int = Form(...)
+):
+    """Process fare type update form"""
+    try:
+        await run_sync(
+            _update_fare_type, fare_type_id, type_name, description, validity, base_price, discount_rate, tariff_id
+        )
+    except Exception as e:
+        logger.error(f"Failed to update fare type: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to update fare type: {str(e)}")
+    
+    await run_sync(tariff_cache.refresh)
+    dashboard_metrics.invalidate()
+    
+    return RedirectResponse(url="/admin/fare-types", status_code=303)
 
 # 1.3 Delete Fare Type
 @router.get("/fare-types/{fare_type_id}/delete", response_class=HTMLResponse)
 async def delete_fare_type_form(request: Request, fare_type_id: int):
     """Confirmation page for deleting a fare type"""
-    fare_type = execute_query("""
+    fare_type = await execute_query("""
         SELECT ft.*, t.base_price, t.discount_rate
         FROM fare_type ft
         JOIN tariff t ON ft.fare_type_id = t.fare_type_id
@@ -319,7 +346,7 @@ async def delete_fare_type_form(request: Request, fare_type_id: int):
         raise HTTPException(status_code=404, detail="Fare type not found")
     
     # Check for dependencies (tickets using this fare type)
-    tickets = execute_query("""
+    tickets = await execute_query("""
         SELECT COUNT(*) as count FROM ticket
         WHERE fare_type_id = %s
     """, (fare_type_id,))
@@ -335,40 +362,17 @@ async def delete_fare_type_form(request: Request, fare_type_id: int):
         }
     )
 
-@router.post("/fare-types/{fare_type_id}/delete")
-async def delete_fare_type(
-    request: Request,
-    fare_type_id: int,
-    confirm: bool = Form(...)
-):
-    """Process fare type deletion"""
-    if not confirm:
-        return RedirectResponse(url="/admin/fare-types", status_code=303)
-    
+def _delete_fare_type(fare_type_id, fare_type_name):
+    """Delete a fare type and log it in one transaction"""
+    # Start transaction
+    conn = get_db_connection()
+    cursor = InstrumentedCursor(statement_cursor(conn))
     try:
-        # Start transaction
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get fare type details before deletion for logging
-        fare_type_info = execute_query("""
-            SELECT ft.*, t.base_price, t.discount_rate
-            FROM fare_type ft
-            JOIN tariff t ON ft.fare_type_id = t.fare_type_id
-            WHERE ft.fare_type_id = %s
-        """, (fare_type_id,))
-        
-        fare_type_name = fare_type_info[0]['type_name'] if fare_type_info else "Unknown"
-        
         # Delete the fare type (and related tariff due to CASCADE)
         query = "DELETE FROM fare_type WHERE fare_type_id = %s"
         
         # Log the deletion query with its parameters
-        print(f"\n[FARE TYPE DELETION - {datetime.now()}]")
-        print("-" * 80)
-        print(f"SQL QUERY: {query}")
-        print(f"PARAMETERS: ({fare_type_id},)")
-        print("-" * 80)
+        logger.debug("Fare type deletion: %s params=%s", query.strip(), (fare_type_id,))
         
         cursor.execute(query, (fare_type_id,))
         
@@ -381,60 +385,84 @@ async def delete_fare_type(
         log_params = ("fare_type_deletion", log_description, fare_type_id, "fare_type")
         
         # Log the activity log insertion
-        print(f"\n[ACTIVITY LOG ENTRY - {datetime.now()}]")
-        print("-" * 80)
-        print(f"SQL QUERY: {log_query}")
-        print(f"PARAMETERS: {log_params}")
-        print("-" * 80)
+        logger.debug("Activity log entry: %s params=%s", log_query.strip(), log_params)
         
         cursor.execute(log_query, log_params)
         
         # Commit the transaction
         conn.commit()
-        print(f"[INFO] Fare type deleted: ID {fare_type_id}, Name '{fare_type_name}'")
+        logger.info(f"Fare type deleted: ID {fare_type_id}, Name '{fare_type_name}'")
+        
+    except Exception:
+        # Rollback in case of error to maintain data consistency
+        if conn.is_connected():
+            conn.rollback()
+        raise
+    
+    finally:
         cursor.close()
         close_connection(conn)
-        
+
+@router.post("/fare-types/{fare_type_id}/delete")
+async def delete_fare_type(
+    request: Request,
+    fare_type_id: int,
+    confirm: bool = Form(...)
+):
+    """Process fare type deletion"""
+    if not confirm:
         return RedirectResponse(url="/admin/fare-types", status_code=303)
     
+    # Get fare type details before deletion for logging
+    fare_type_info = await execute_query("""
+        SELECT ft.*, t.base_price, t.discount_rate
+        FROM fare_type ft
+        JOIN tariff t ON ft.fare_type_id = t.fare_type_id
+        WHERE ft.fare_type_id = %s
+    """, (fare_type_id,))
+    
+    fare_type_name = fare_type_info[0]['type_name'] if fare_type_info else "Unknown"
+    
+    try:
+        await run_sync(_delete_fare_type, fare_type_id, fare_type_name)
     except Exception as e:
-        # Rollback in case of error to maintain data consistency
-        if 'conn' in locals() and conn.is_connected():
-            conn.rollback()
-            cursor.close()
-            close_connection(conn)
-        
-        print(f"[ERROR] Failed to delete fare type: {str(e)}")
+        logger.error(f"Failed to delete fare type: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to delete fare type: {str(e)}")
+    
+    await run_sync(tariff_cache.refresh)
+    # Exemptions for this fare type were removed by ON DELETE CASCADE
+    exemption_index.invalidate()
+    dashboard_metrics.invalidate()
+    
+    return RedirectResponse(url="/admin/fare-types", status_code=303)
 
 # 2.2 Validate Documents and 2.3 Approve/Reject Request
 @router.get("/exemption-applications", response_class=HTMLResponse)
-async def list_exemption_applications(request: Request, status: Optional[str] = None):
-    """List all exemption applications with optional filtering by status"""
-    query = """
-        SELECT ea.*, p.passenger_full_name
-        FROM exemption_application ea
-        JOIN passenger p ON ea.passenger_id = p.passenger_id
-    """
-    
-    params = ()
-    if status:
-        query += " WHERE ea.status = %s"
-        params = (status,)
-        
-    query += " ORDER BY ea.submitted_date DESC"
+async def list_exemption_applications(request: Request, status: Optional[str] = None, after: Optional[str] = None):
+    """List exemption applications page by page with optional filtering by status"""
+    applications, next_cursor = await run_sync(exemption_applications.list_applications, status, after)
     
-    applications = execute_query(query, params)
+    # Tab counts come from the cached dashboard counters, not a table scan
+    metrics = await run_sync(dashboard_metrics.get_metrics)
+    status_counts = dict(metrics.status_counts) if metrics else {}
     
     return templates.TemplateResponse(
         "admin/exemption_applications.html",
-        {"request": request, "applications": applications, "current_status": status}
+        {
+            "request": request,
+            "applications": applications,
+            "current_status": status,
+            "after": after,
+            "next_cursor": next_cursor,
+            "status_counts": status_counts,
+            "total_count": sum(status_counts.values())
+        }
     )
 
 @router.get("/exemption-applications/{application_id}", response_class=HTMLResponse)
 async def view_exemption_application(request: Request, application_id: int):
     """View details of a specific exemption application with documents"""
-    application = execute_query("""
+    application = await execute_query("""
         SELECT ea.*, p.passenger_full_name, p.email
         FROM exemption_application ea
         JOIN passenger p ON ea.passenger_id = p.passenger_id
@@ -445,13 +473,13 @@ async def view_exemption_application(request: Request, application_id: int):
         raise HTTPException(status_code=404, detail="Application not found")
     
     # Get uploaded documents
-    documents = execute_query("""
+    documents = await execute_query("""
         SELECT * FROM document_record
         WHERE application_id = %s
     """, (application_id,))
     
     # Get available fare types for exemptions
-    fare_types = execute_query("SELECT * FROM fare_type")
+    fare_types = await execute_query("SELECT * FROM fare_type")
     
     return templates.TemplateResponse(
         "admin/view_application.html",
@@ -472,43 +500,21 @@ async def process_exemption_application(
     exemption_category: Optional[str] = Form(None)
 ):
     """Process an exemption application (approve or reject)"""
-    # Update application status
-    status_query = """
-        UPDATE exemption_application
-        SET status = %s
-        WHERE application_id = %s
-    """
-    status_params = (decision, application_id)
-    execute_query(status_query, status_params, fetch=False)
-    
-    # If approved, create an exemption record
-    if decision == "Approved" and fare_type_id and exemption_category:
-        # Get passenger ID from application
-        application = execute_query("""
-            SELECT passenger_id FROM exemption_application
-            WHERE application_id = %s
-        """, (application_id,))
-        
-        if application:
-            passenger_id = application[0]["passenger_id"]
-            
-            # Create exemption valid for 1 year
-            today = date.today()
-            valid_to = today + timedelta(days=365)
-            
-            exemption_query = """
-                INSERT INTO exemption 
-                (exemption_category, passenger_id, fare_type_id, valid_from, valid_to)
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            exemption_params = (
-                exemption_category, 
-                passenger_id, 
-                fare_type_id, 
-                today, 
-                valid_to
-            )
-            execute_query(exemption_query, exemption_params, fetch=False)
+    # Status change, counters and the new exemption commit together
+    try:
+        result = await run_sync(
+            exemption_applications.process_application, application_id, decision, fare_type_id, exemption_category
+        )
+    except Exception as e:
+        logger.error(f"Failed to process exemption application {application_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing application: {str(e)}")
+    
+    if not result:
+        raise HTTPException(status_code=404, detail="Application not found")
+    
+    dashboard_metrics.application_status_changed(result["old_status"], decision)
+    if result["exemption"]:
+        exemption_index.add_exemption(result["exemption"])
     
     return RedirectResponse(
         url="/admin/exemption-applications",
@@ -526,20 +532,8 @@ async def fare_usage_report(request: Request, start_date: Optional[str] = None,
     if not end_date:
         end_date = today.strftime("%Y-%m-%d")
     
-    query = """
-        SELECT 
-            t.purchase_date as date,
-            ft.type_name as fare_type,
-            COUNT(t.ticket_id) as tickets_sold,
-            SUM(t.price) as total_revenue
-        FROM ticket t
-        JOIN fare_type ft ON t.fare_type_id = ft.fare_type_id
-        WHERE t.purchase_date BETWEEN %s AND %s
-        GROUP BY t.purchase_date, ft.type_name
-        ORDER BY t.purchase_date DESC
-    """
-    
-    report_data = execute_query(query, (start_date, end_date))
+    # Read from the daily rollup instead of aggregating raw tickets
+    report_data = await run_sync(fare_usage_rollup.fare_usage_report, start_date, end_date)
     
     # Calculate totals
     total_tickets = sum(row["tickets_sold"] for row in report_data) if report_data else 0
@@ -557,6 +551,37 @@ async def fare_usage_report(request: Request, start_date: Optional[str] = None,
         }
     )
 
+def _export_slot():
+    # Each export streams from its own pooled connection; see report_export
+    try:
+        return report_export.acquire_slot()
+    except report_export.ExportBusyError:
+        raise HTTPException(status_code=503, detail="Too many exports in progress, please retry shortly")
+
+# 5.1.1 Export fare usage as a stream (CSV or NDJSON), for ranges too large to render
+@router.get("/reports/fare-usage/export")
+async def export_fare_usage_report(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                                   format: str = "csv", level: str = "daily"):
+    """Stream fare usage rows per day and fare type, or per ticket with level=ticket"""
+    if format not in report_export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be csv or ndjson")
+    if level not in ("daily", "ticket"):
+        raise HTTPException(status_code=400, detail="Level must be daily or ticket")
+    
+    today = date.today()
+    if not start_date:
+        start_date = (today - timedelta(days=30)).strftime("%Y-%m-%d")
+    if not end_date:
+        end_date = today.strftime("%Y-%m-%d")
+    
+    slot = _export_slot()
+    return StreamingResponse(
+        report_export.iterate(report_export.fare_usage_export(start_date, end_date, format, level), slot),
+        media_type=report_export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="fare_usage_{level}_{start_date}_{end_date}.{format}"'},
+        background=BackgroundTask(slot.release)
+    )
+
 # 5.2 Generate Exemption Statistics
 @router.get("/reports/exemption-stats", response_class=HTMLResponse)
 async def exemption_statistics_report(request: Request, period: Optional[str] = None):
@@ -574,25 +599,8 @@ async def exemption_statistics_report(request: Request, period: Optional[str] =
         # Default to all-time
         period = "all"
     
-    # Base query for exemption applications
-    query = """
-        SELECT 
-            exemption_category,
-            COUNT(a.application_id) as total_applications,
-            SUM(CASE WHEN a.status = 'Approved' THEN 1 ELSE 0 END) as approved,
-            (SUM(CASE WHEN a.status = 'Approved' THEN 1 ELSE 0 END) / COUNT(a.application_id)) * 100 as approval_rate
-        FROM exemption e
-        JOIN exemption_application a ON e.passenger_id = a.passenger_id
-    """
-    
-    params = ()
-    if start_date:
-        query += " WHERE a.submitted_date >= %s"
-        params = (start_date,)
-    
-    query += " GROUP BY exemption_category ORDER BY total_applications DESC"
-    
-    stats = execute_query(query, params if params else None)
+    # Aggregated from the per-category counters, not from the raw tables
+    stats = await run_sync(exemption_applications.category_statistics, start_date)
     
     return templates.TemplateResponse(
         "admin/exemption_statistics.html",
@@ -601,4 +609,138 @@ async def exemption_statistics_report(request: Request, period: Optional[str] =
             "stats": stats,
             "period": period
         }
-    )
\ No newline at end of file
+    )
+
+# 5.2.1 Export exemption applications as a stream (CSV or NDJSON)
+@router.get("/reports/exemption-stats/export")
+async def export_exemption_applications(period: Optional[str] = None, format: str = "csv"):
+    """Stream every exemption application submitted in the period"""
+    if format not in report_export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be csv or ndjson")
+    
+    today = date.today()
+    if period == "week":
+        start_date = today - timedelta(days=7)
+    elif period == "month":
+        start_date = today - timedelta(days=30)
+    elif period == "year":
+        start_date = today - timedelta(days=365)
+    else:
+        period = "all"
+        start_date = date(1000, 1, 1)
+    
+    slot = _export_slot()
+    return StreamingResponse(
+        report_export.iterate(report_export.exemption_applications_export(start_date, format), slot),
+        media_type=report_export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="exemption_applications_{period}.{format}"'},
+        background=BackgroundTask(slot.release)
+    )
+
+# 5.3 Revenue Forecast
+@router.get("/reports/revenue-forecast", response_class=HTMLResponse)
+async def revenue_forecast_report(request: Request, months: int = 6, growth_rate: Optional[str] = None,
+                                  seasonal_factor: str = "none"):
+    """Project monthly revenue per fare type from historical sales"""
+    # The report form submits an empty growth_rate when the field is left blank
+    if growth_rate is not None and growth_rate.strip():
+        try:
+            growth_rate = float(growth_rate)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="growth_rate must be a number")
+    else:
+        growth_rate = None
+    if months not in (3, 6, 12):
+        months = 6
+    if seasonal_factor not in revenue_forecast.SEASONAL_STRENGTH:
+        seasonal_factor = "none"
+    
+    # Leaving growth_rate empty fits it from the history
+    forecast = await run_sync(revenue_forecast.forecast, months, growth_rate, seasonal_factor)
+    if not forecast:
+        forecast = {
+            "forecast_data": [],
+            "fare_projections": [],
+            "total_tickets": 0,
+            "total_revenue": 0,
+            "average_growth": 0,
+            "growth_rate": growth_rate if growth_rate is not None else 0,
+            "base_period": "N/A",
+            "historical_start": "N/A",
+            "historical_end": "N/A"
+        }
+    
+    return templates.TemplateResponse(
+        "admin/revenue_forecast_report.html",
+        {
+            "request": request,
+            "months": months,
+            "seasonal_factor": seasonal_factor,
+            **forecast
+        }
+    )
+
+# 5.4 Passenger Activity
+@router.get("/reports/passenger-activity", response_class=HTMLResponse)
+async def passenger_activity_report(request: Request, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                                    passenger_type: str = "all"):
+    """Daily registrations, tickets and distinct passengers with per-type trends"""
+    today = date.today()
+    if not start_date:
+        # Default to last 30 days
+        start_date = (today - timedelta(days=30)).strftime("%Y-%m-%d")
+    if not end_date:
+        end_date = today.strftime("%Y-%m-%d")
+    
+    # Served from the daily rollups; distinct counts are approximate
+    report = await run_sync(
+        passenger_activity.activity_report, start_date, end_date, None if passenger_type == "all" else passenger_type
+    )
+    
+    return templates.TemplateResponse(
+        "admin/passenger_activity_report.html",
+        {
+            "request": request,
+            "start_date": start_date,
+            "end_date": end_date,
+            "passenger_type": passenger_type,
+            **report
+        }
+    )
+
+# 5.5 Passenger Exemption Status
+@router.get("/reports/passenger-exemptions", response_class=HTMLResponse)
+async def passenger_exemptions_report(request: Request, passenger_id: int):
+    """Exemptions, applications and ticket statistics for one passenger"""
+    # One round trip for every section of the report
+    report = await run_sync(passenger_report.passenger_report, passenger_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Passenger not found")
+    
+    return templates.TemplateResponse(
+        "admin/passenger_exemptions_report.html",
+        {
+            "request": request,
+            "today": date.today(),
+            **report
+        }
+    )
+
+# 5.5.1 Bulk passenger exemption reports (NDJSON, one passenger per line) for audits
+@router.get("/reports/passenger-exemptions/bulk")
+async def bulk_passenger_exemptions_report(passenger_ids: Optional[str] = None):
+    """Stream the passenger exemption report for a list of passengers, or all of them"""
+    ids = None
+    if passenger_ids:
+        try:
+            ids = [int(value) for value in passenger_ids.split(",") if value.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="passenger_ids must be a comma-separated list of integers")
+    
+    return StreamingResponse(
+        report_export.encode_ndjson(
+            passenger_report.bulk_reports(ids), ["passenger", "exemptions", "applications", "ticket_stats"]
+        ),
+        media_type=report_export.EXPORT_FORMATS["ndjson"],
+        headers={"Content-Disposition": 'attachment; filename="passenger_exemptions.ndjson"'}
+    )
@@ -1,17 +1,22 @@
 from fastapi import APIRouter, Request, Form, File, UploadFile, HTTPException, Depends
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse
-from datetime import date, datetime
+from datetime import date
 from typing import List, Optional
 import os
 import re
 from mysql.connector import IntegrityError
 
 from app.models.models import Passenger, ExemptionApplication, DocumentRecord, PassengerExemptionSummary
-from app.database.config import execute_query, get_db_connection, close_connection
+from app.database.config import get_db_connection, close_connection, InstrumentedCursor, statement_cursor
+from app.database.async_db import execute_query
+from app.database.threadpool import run_sync
+from app.services import dashboard_metrics, exemption_applications, passenger_directory
+from app.monitoring.logs import get_logger
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
+logger = get_logger("passenger")
 
 @router.get("/register", response_class=HTMLResponse)
 async def register_form(request: Request):
@@ -32,7 +37,7 @@ async def create_passenger(
     if not re.match(email_pattern, email):
         errors.append("Please provide a valid email address")
         
-    existing_email = execute_query("SELECT passenger_id FROM passenger WHERE email = %s", (email,))
+    existing_email = await execute_query("SELECT passenger_id FROM passenger WHERE email = %s", (email,))
     if existing_email:
         errors.append("This email address is already registered")
     
@@ -44,11 +49,11 @@ async def create_passenger(
     
     try:
         query = """
-            INSERT INTO passenger (passenger_full_name, email) 
-            VALUES (%s, %s)
+            INSERT INTO passenger (passenger_full_name, email, registered_at) 
+            VALUES (%s, %s, CURDATE())
         """
         params = (passenger_full_name, email)
-        result = execute_query(query, params, fetch=False)
+        result = await execute_query(query, params, fetch=False)
         
         if result and result.get("affected_rows", 0) > 0:
             passenger_id = result.get("last_insert_id")
@@ -67,19 +72,20 @@ async def create_passenger(
         )
 
 @router.get("/dashboard", response_class=HTMLResponse)
-async def passenger_dashboard(request: Request, passenger_id: Optional[int] = None):
+async def passenger_dashboard(request: Request, passenger_id: Optional[int] = None,
+                              q: Optional[str] = None, after: Optional[str] = None):
     if not passenger_id:
-        passengers = execute_query("SELECT * FROM passenger")
+        passengers, next_cursor = await run_sync(passenger_directory.search_passengers, q, after)
         return templates.TemplateResponse(
             "passenger/select_passenger.html", 
-            {"request": request, "passengers": passengers}
+            {"request": request, "passengers": passengers, "q": q or "", "after": after, "next_cursor": next_cursor}
         )
     
-    passenger = execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (passenger_id,))
+    passenger = await execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (passenger_id,))
     if not passenger:
         raise HTTPException(status_code=404, detail="Passenger not found")
     
-    exemptions = execute_query("""
+    exemptions = await execute_query("""
         SELECT e.*, ft.type_name
         FROM exemption e
         JOIN fare_type ft ON e.fare_type_id = ft.fare_type_id
@@ -93,17 +99,76 @@ async def passenger_dashboard(request: Request, passenger_id: Optional[int] = No
 
 @router.get("/exemption/apply", response_class=HTMLResponse)
 async def exemption_application_form(request: Request, passenger_id: int):
-    passenger = execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (passenger_id,))
+    passenger = await execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (passenger_id,))
     if not passenger:
         raise HTTPException(status_code=404, detail="Passenger not found")
     
-    fare_types = execute_query("SELECT * FROM fare_type")
+    fare_types = await execute_query("SELECT * FROM fare_type")
     
     return templates.TemplateResponse(
         "passenger/exemption_application.html", 
         {"request": request, "passenger": passenger[0], "fare_types": fare_types}
     )
 
+def _insert_application(passenger_id, exemption_category, document_description, filename, file_content,
+                        passenger_name, fare_type_name):
+    """Application, document and activity log rows in one transaction; returns the new id"""
+    conn = get_db_connection()
+    cursor = InstrumentedCursor(statement_cursor(conn))
+    try:
+        today = date.today()
+        app_query = """
+            INSERT INTO exemption_application (submitted_date, passenger_id, status, exemption_category) 
+            VALUES (%s, %s, %s, %s)
+        """
+        app_params = (today, passenger_id, "Submitted", exemption_category)
+        
+        logger.debug("Exemption application creation: %s params=%s", app_query.strip(), app_params)
+        
+        cursor.execute(app_query, app_params)
+        
+        application_id = cursor.lastrowid
+        logger.debug("Generated application ID: %s", application_id)
+        
+        import uuid
+        file_extension = os.path.splitext(filename)[1]
+        unique_filename = f"{uuid.uuid4()}{file_extension}"
+        file_location = f"uploads/{unique_filename}"
+        
+        os.makedirs("uploads", exist_ok=True)
+        
+        with open(file_location, "wb") as file_object:
+            file_object.write(file_content)
+        
+        doc_query = """
+            INSERT INTO document_record (application_id, document_type, document_value) 
+            VALUES (%s, %s, %s)
+        """
+        doc_params = (application_id, document_description, file_location)
+        cursor.execute(doc_query, doc_params)
+        
+        log_query = """
+            INSERT INTO activity_log (activity_type, description, entity_id, entity_type, created_at)
+            VALUES (%s, %s, %s, %s, NOW())
+        """
+        log_description = f"New exemption application ({exemption_category}) submitted by {passenger_name} for {fare_type_name}"
+        log_params = ("application_creation", log_description, application_id, "exemption_application")
+        cursor.execute(log_query, log_params)
+        exemption_applications.record_submission(cursor, exemption_category, today)
+        
+        conn.commit()
+        logger.info(f"New exemption application created: ID {application_id}, Passenger ID {passenger_id}, Category {exemption_category}")
+        return application_id
+        
+    except Exception:
+        if conn.is_connected():
+            conn.rollback()
+        raise
+    
+    finally:
+        cursor.close()
+        close_connection(conn)
+
 @router.post("/exemption/apply")
 async def submit_exemption_application(
     request: Request,
@@ -116,11 +181,11 @@ async def submit_exemption_application(
 ):
     errors = []
     
-    passenger = execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (passenger_id,))
+    passenger = await execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (passenger_id,))
     if not passenger:
         errors.append("Invalid passenger ID")
     
-    fare_type = execute_query("SELECT * FROM fare_type WHERE fare_type_id = %s", (fare_type_id,))
+    fare_type = await execute_query("SELECT * FROM fare_type WHERE fare_type_id = %s", (fare_type_id,))
     if not fare_type:
         errors.append("Invalid fare type selected")
     
@@ -136,7 +201,7 @@ async def submit_exemption_application(
     if len(file_content) > 5 * 1024 * 1024:
         errors.append("Document size exceeds the 5MB limit")
     
-    existing_app = execute_query("""
+    existing_app = await execute_query("""
         SELECT * FROM exemption_application 
         WHERE passenger_id = %s AND status IN ('Submitted', 'Pending')
     """, (passenger_id,))
@@ -145,7 +210,7 @@ async def submit_exemption_application(
         errors.append("You already have a pending exemption application")
     
     if errors:
-        fare_types = execute_query("SELECT * FROM fare_type")
+        fare_types = await execute_query("SELECT * FROM fare_type")
         return templates.TemplateResponse(
             "passenger/exemption_application.html", 
             {
@@ -158,73 +223,17 @@ async def submit_exemption_application(
     
     await document.seek(0)
     
+    passenger_name = passenger[0]["passenger_full_name"] if passenger else f"Passenger ID: {passenger_id}"
+    fare_type_name = fare_type[0]["type_name"] if fare_type else f"Fare Type ID: {fare_type_id}"
+    
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        today = date.today()
-        app_query = """
-            INSERT INTO exemption_application (submitted_date, passenger_id, status) 
-            VALUES (%s, %s, %s)
-        """
-        app_params = (today, passenger_id, "Submitted")
-        
-        print(f"\n[EXEMPTION APPLICATION CREATION - {datetime.now()}]")
-        print("-" * 80)
-        print(f"SQL QUERY: {app_query}")
-        print(f"PARAMETERS: {app_params}")
-        print("-" * 80)
-        
-        cursor.execute(app_query, app_params)
-        
-        application_id = cursor.lastrowid
-        print(f"GENERATED APPLICATION ID: {application_id}")
-        
-        import uuid
-        file_extension = os.path.splitext(document.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_location = f"uploads/{unique_filename}"
-        
-        os.makedirs("uploads", exist_ok=True)
-        
-        with open(file_location, "wb") as file_object:
-            file_object.write(file_content)
-        
-        doc_query = """
-            INSERT INTO document_record (application_id, document_type, document_value) 
-            VALUES (%s, %s, %s)
-        """
-        doc_params = (application_id, document_description, file_location)
-        cursor.execute(doc_query, doc_params)
-        
-        log_query = """
-            INSERT INTO activity_log (activity_type, description, entity_id, entity_type, created_at)
-            VALUES (%s, %s, %s, %s, NOW())
-        """
-        passenger_name = passenger[0]["passenger_full_name"] if passenger else f"Passenger ID: {passenger_id}"
-        fare_type_name = fare_type[0]["type_name"] if fare_type else f"Fare Type ID: {fare_type_id}"
-        log_description = f"New exemption application ({exemption_category}) submitted by {passenger_name} for {fare_type_name}"
-        log_params = ("application_creation", log_description, application_id, "exemption_application")
-        cursor.execute(log_query, log_params)
-        
-        conn.commit()
-        print(f"[INFO] New exemption application created: ID {application_id}, Passenger ID {passenger_id}, Category {exemption_category}")
-        cursor.close()
-        close_connection(conn)
-        
-        return RedirectResponse(
-            url=f"/passenger/dashboard?passenger_id={passenger_id}",
-            status_code=303
+        await run_sync(
+            _insert_application, passenger_id, exemption_category, document_description, document.filename,
+            file_content, passenger_name, fare_type_name
         )
-        
     except Exception as e:
-        if 'conn' in locals() and conn.is_connected():
-            conn.rollback()
-            cursor.close()
-            close_connection(conn)
-        
-        print(f"[ERROR] Failed to create exemption application: {str(e)}")
-        fare_types = execute_query("SELECT * FROM fare_type")
+        logger.error(f"Failed to create exemption application: {str(e)}")
+        fare_types = await execute_query("SELECT * FROM fare_type")
         return templates.TemplateResponse(
             "passenger/exemption_application.html", 
             {
@@ -234,14 +243,21 @@ async def submit_exemption_application(
                 "fare_types": fare_types
             }
         )
+    
+    dashboard_metrics.application_submitted()
+    
+    return RedirectResponse(
+        url=f"/passenger/dashboard?passenger_id={passenger_id}",
+        status_code=303
+    )
 
 @router.get("/exemptions", response_class=HTMLResponse)
 async def view_exemptions(request: Request, passenger_id: int):
-    passenger = execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (passenger_id,))
+    passenger = await execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (passenger_id,))
     if not passenger:
         raise HTTPException(status_code=404, detail="Passenger not found")
     
-    exemptions = execute_query("""
+    exemptions = await execute_query("""
         SELECT e.*, ft.type_name, ea.status
         FROM exemption e
         JOIN fare_type ft ON e.fare_type_id = ft.fare_type_id
@@ -257,11 +273,11 @@ async def view_exemptions(request: Request, passenger_id: int):
 @router.get("/exemption/status-report", response_class=HTMLResponse)
 async def exemption_status_report(request: Request, passenger_id: int):
     try:
-        passenger = execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (passenger_id,))
+        passenger = await execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (passenger_id,))
         if not passenger:
             raise HTTPException(status_code=404, detail="Passenger not found")
         
-        applications = execute_query("""
+        applications = await execute_query("""
             SELECT ea.*, dr.document_type
             FROM exemption_application ea
             LEFT JOIN document_record dr ON ea.application_id = dr.application_id
@@ -269,7 +285,7 @@ async def exemption_status_report(request: Request, passenger_id: int):
             ORDER BY ea.submitted_date DESC
         """, (passenger_id,))
         
-        approved_applications = execute_query("""
+        approved_applications = await execute_query("""
             SELECT ea.application_id, ft.type_name, ft.description, e.exemption_id
             FROM exemption_application ea
             LEFT JOIN exemption e ON (
@@ -298,7 +314,7 @@ async def exemption_status_report(request: Request, passenger_id: int):
                 app['description'] = None
         
         today = date.today()
-        exemptions = execute_query("""
+        exemptions = await execute_query("""
             SELECT e.*, ft.type_name, 
                 DATEDIFF(e.valid_to, CURDATE()) as days_remaining
             FROM exemption e
@@ -318,7 +334,7 @@ async def exemption_status_report(request: Request, passenger_id: int):
             }
         )
     except Exception as e:
-        print(f"[ERROR] Error generating exemption status report: {str(e)}")
+        logger.error(f"Error generating exemption status report: {str(e)}")
         return templates.TemplateResponse(
             "passenger/error.html",
             {
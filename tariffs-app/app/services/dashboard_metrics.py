@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+
+from app.database.config import execute_query
+
+# Seconds a snapshot is trusted before it is recomputed from the tables.
+# Local write paths keep it current in between; the TTL covers writes made
+# by other worker processes or outside the application.
+DASHBOARD_METRICS_TTL = float(os.getenv("DASHBOARD_METRICS_TTL", "60"))
+
+RECENT_TICKETS_LIMIT = 5
+
+RECENT_TICKETS_QUERY = f"""
+    SELECT t.*, p.passenger_full_name, ft.type_name
+    FROM ticket t
+    JOIN passenger p ON t.passenger_id = p.passenger_id
+    JOIN fare_type ft ON t.fare_type_id = ft.fare_type_id
+    ORDER BY t.purchase_date DESC, t.ticket_id DESC
+    LIMIT {RECENT_TICKETS_LIMIT}
+"""
+
+class DashboardMetrics:
+    """Admin dashboard counters kept in memory between reloads"""
+
+    def __init__(self, fare_types_count, status_counts, recent_tickets):
+        self.loaded_at = time.monotonic()
+        self.fare_types_count = fare_types_count
+        self.status_counts = dict(status_counts)
+        self.recent_tickets = list(recent_tickets)
+
+    def age(self):
+        return time.monotonic() - self.loaded_at
+
+    def as_context(self):
+        """Values in the shape admin/dashboard.html expects"""
+        return {
+            "fare_types_count": self.fare_types_count,
+            "exemption_stats": [
+                {"status": status, "count": count}
+                for status, count in self.status_counts.items() if count > 0
+            ],
+            "recent_tickets": list(self.recent_tickets)
+        }
+
+_lock = threading.Lock()
+_metrics = None
+_stale = True
+_invalidations = 0
+# Reloads in flight, and ticket writes made while any of them runs: a reload
+# may have read the tables before such a write committed
+_loading = 0
+_replay = []
+
+def _load():
+    fare_types = execute_query("SELECT COUNT(*) as count FROM fare_type")
+    statuses = execute_query("""
+        SELECT status, COUNT(*) as count
+        FROM exemption_application
+        GROUP BY status
+    """)
+    recent_tickets = execute_query(RECENT_TICKETS_QUERY)
+    if fare_types is None or statuses is None or recent_tickets is None:
+        return None
+    return DashboardMetrics(
+        fare_types[0]["count"],
+        {row["status"]: row["count"] for row in statuses},
+        recent_tickets
+    )
+
+def get_metrics():
+    """Current counters, reloaded from the tables when stale or expired.
+
+    The queries run outside ``_lock``, so sales recording a ticket never wait
+    on a reload; while one reload runs, other readers get the previous snapshot.
+    """
+    global _metrics, _stale, _loading
+    with _lock:
+        metrics = _metrics
+        due = metrics is None or _stale or (DASHBOARD_METRICS_TTL and metrics.age() > DASHBOARD_METRICS_TTL)
+        if not due or (_loading and metrics is not None):
+            return metrics
+        _loading += 1
+        seen = _invalidations
+
+    loaded = None
+    try:
+        loaded = _load()
+    finally:
+        with _lock:
+            _loading -= 1
+            if loaded is not None:
+                for apply in _replay:
+                    apply(loaded)
+                _metrics = loaded
+                # An invalidation that raced with the load must trigger another one
+                _stale = _invalidations != seen
+            if not _loading:
+                _replay.clear()
+            metrics = _metrics
+    return metrics
+
+def invalidate():
+    global _stale, _invalidations
+    with _lock:
+        _invalidations += 1
+        _stale = True
+
+def _update(apply, replayable=False):
+    """Adjust a live snapshot; a missing one is loaded fresh on next read.
+
+    A write racing a reload is replayed on the new snapshot when ``apply``
+    is idempotent; otherwise the new snapshot is reloaded again.
+    """
+    global _stale, _invalidations
+    with _lock:
+        if _loading:
+            if replayable:
+                _replay.append(apply)
+            else:
+                _invalidations += 1
+                _stale = True
+        if _metrics is not None and not _stale:
+            apply(_metrics)
+
+def fare_type_created():
+    def apply(metrics):
+        metrics.fare_types_count += 1
+    _update(apply)
+
+def application_submitted(status="Submitted"):
+    def apply(metrics):
+        metrics.status_counts[status] = metrics.status_counts.get(status, 0) + 1
+    _update(apply)
+
+def application_status_changed(old_status, new_status):
+    if old_status == new_status:
+        return
+    def apply(metrics):
+        metrics.status_counts[old_status] = max(0, metrics.status_counts.get(old_status, 0) - 1)
+        metrics.status_counts[new_status] = metrics.status_counts.get(new_status, 0) + 1
+    _update(apply)
+
+def ticket_issued(ticket):
+    """Push a freshly issued ticket (a receipt dict) onto the recent list"""
+    def apply(metrics):
+        # Idempotent, so it can be replayed on a reload that already saw the ticket
+        if any(recent["ticket_id"] == ticket["ticket_id"] for recent in metrics.recent_tickets):
+            return
+        metrics.recent_tickets.insert(0, ticket)
+        del metrics.recent_tickets[RECENT_TICKETS_LIMIT:]
+    _update(apply, replayable=True)
+
+def stats():
+    metrics = _metrics
+    return {
+        "loaded": metrics is not None,
+        "stale": _stale,
+        "age_seconds": metrics.age() if metrics else None,
+        "ttl_seconds": DASHBOARD_METRICS_TTL
+    }
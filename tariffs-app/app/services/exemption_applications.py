@@ -0,0 +1,196 @@
+"""Exemption application decisions and the per-category counters behind the
+exemption statistics report.
+
+``exemption_category_stats`` is kept current by submissions and decisions
+inside their own transactions. Rebuild it from ``exemption_application``
+with:
+
+    python -m app.services.exemption_applications rebuild
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+from app.database.config import execute_query, transaction
+from app.services.passenger_directory import encode_cursor, decode_cursor
+from app.monitoring import logs
+from app.monitoring.logs import get_logger
+
+logger = get_logger("exemption_applications")
+
+# Counter bucket for applications submitted before categories were recorded
+UNCATEGORIZED = "Uncategorized"
+
+QUEUE_PAGE_SIZE = 25
+
+COUNTER_UPSERT_PREFIX = """
+    INSERT INTO exemption_category_stats (submitted_date, exemption_category, total_applications, approved)
+    VALUES """
+COUNTER_UPSERT_SUFFIX = """
+    ON DUPLICATE KEY UPDATE
+        total_applications = total_applications + VALUES(total_applications),
+        approved = approved + VALUES(approved)
+"""
+
+EXEMPTION_INSERT = """
+    INSERT INTO exemption
+    (exemption_category, passenger_id, fare_type_id, valid_from, valid_to, application_id)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+STATISTICS_QUERY = """
+    SELECT
+        exemption_category,
+        SUM(total_applications) as total_applications,
+        SUM(approved) as approved,
+        (SUM(approved) / SUM(total_applications)) * 100 as approval_rate
+    FROM exemption_category_stats
+    {where}
+    GROUP BY exemption_category
+    HAVING SUM(total_applications) > 0
+    ORDER BY total_applications DESC
+"""
+
+def _apply_counter_deltas(cursor, deltas):
+    """Add {(submitted_date, category): (total, approved)} deltas to the counters"""
+    deltas = {key: value for key, value in deltas.items() if value != (0, 0)}
+    if not deltas:
+        return
+    # Sorted keys give every transaction the same lock order
+    keys = sorted(deltas)
+    params = []
+    for key in keys:
+        params.extend((key[0], key[1]) + deltas[key])
+    cursor.execute(
+        COUNTER_UPSERT_PREFIX + ", ".join(["(%s, %s, %s, %s)"] * len(keys)) + COUNTER_UPSERT_SUFFIX,
+        tuple(params)
+    )
+
+def record_submission(cursor, exemption_category, submitted_date):
+    """Count a new application using the caller's transaction"""
+    _apply_counter_deltas(cursor, {(submitted_date, exemption_category or UNCATEGORIZED): (1, 0)})
+
+def process_application(application_id, decision, fare_type_id=None, exemption_category=None):
+    """Record an admin decision on an application in a single transaction.
+
+    Locks the application, updates its status, moves it between the counters
+    and, on approval, creates the exemption linked back to it. Applications
+    submitted before categories were recorded take the category chosen at
+    approval. Returns the passenger id, previous status and the created
+    exemption (or None), or None when the application does not exist.
+    """
+    with transaction() as cursor:
+        cursor.execute("""
+            SELECT passenger_id, status, submitted_date, exemption_category
+            FROM exemption_application
+            WHERE application_id = %s
+            FOR UPDATE
+        """, (application_id,))
+        application = cursor.fetchone()
+        if not application:
+            return None
+
+        old_status = application["status"]
+        old_category = application["exemption_category"]
+        category = old_category or exemption_category
+        cursor.execute("""
+            UPDATE exemption_application
+            SET status = %s, exemption_category = %s
+            WHERE application_id = %s
+        """, (decision, category, application_id))
+
+        submitted_date = application["submitted_date"]
+        old_key = (submitted_date, old_category or UNCATEGORIZED)
+        new_key = (submitted_date, category or UNCATEGORIZED)
+        deltas = {old_key: (-1, -int(old_status == "Approved"))}
+        total, approved = deltas.get(new_key, (0, 0))
+        deltas[new_key] = (total + 1, approved + int(decision == "Approved"))
+        _apply_counter_deltas(cursor, deltas)
+
+        exemption = None
+        if decision == "Approved" and fare_type_id and exemption_category:
+            # Create exemption valid for 1 year
+            today = date.today()
+            valid_to = today + timedelta(days=365)
+            cursor.execute(EXEMPTION_INSERT, (
+                exemption_category, application["passenger_id"], fare_type_id, today, valid_to, application_id
+            ))
+            exemption = {
+                "exemption_id": cursor.lastrowid,
+                "exemption_category": exemption_category,
+                "passenger_id": application["passenger_id"],
+                "fare_type_id": fare_type_id,
+                "valid_from": today,
+                "valid_to": valid_to,
+                "application_id": application_id
+            }
+
+    return {"passenger_id": application["passenger_id"], "old_status": old_status, "exemption": exemption}
+
+def list_applications(status=None, cursor=None, limit=QUEUE_PAGE_SIZE):
+    """One page of the review queue, newest first.
+
+    Pages are keyed on (submitted_date, application_id) rather than OFFSET;
+    with a status filter the (status, submitted_date) index serves both the
+    filter and the order. Returns the rows and the next page cursor (None on
+    the last page).
+    """
+    query = """
+        SELECT ea.*, p.passenger_full_name
+        FROM exemption_application ea
+        JOIN passenger p ON ea.passenger_id = p.passenger_id
+    """
+    conditions = []
+    params = ()
+    if status:
+        conditions.append("ea.status = %s")
+        params += (status,)
+    after = decode_cursor(cursor)
+    if after and len(after) == 2:
+        conditions.append("(ea.submitted_date < %s OR (ea.submitted_date = %s AND ea.application_id < %s))")
+        params += (after[0], after[0], after[1])
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY ea.submitted_date DESC, ea.application_id DESC LIMIT %s"
+
+    # One extra row tells whether there is a next page
+    rows = execute_query(query, params + (limit + 1,)) or []
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([str(last["submitted_date"]), last["application_id"]])
+    return rows, next_cursor
+
+def category_statistics(start_date=None):
+    """Applications, approvals and approval rate per category, from the counters"""
+    if start_date:
+        return execute_query(STATISTICS_QUERY.format(where="WHERE submitted_date >= %s"), (start_date,))
+    return execute_query(STATISTICS_QUERY.format(where=""))
+
+def rebuild():
+    """Recompute every counter from the exemption_application table"""
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM exemption_category_stats")
+        cursor.execute(f"""
+            INSERT INTO exemption_category_stats (submitted_date, exemption_category, total_applications, approved)
+            SELECT submitted_date, COALESCE(exemption_category, '{UNCATEGORIZED}'), COUNT(*), SUM(status = 'Approved')
+            FROM exemption_application
+            GROUP BY submitted_date, COALESCE(exemption_category, '{UNCATEGORIZED}')
+        """)
+        rows = cursor.rowcount
+    logger.info(f"Rebuilt exemption_category_stats: {rows} rows")
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the exemption_category_stats counters")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild", help="Recompute all counters from exemption_application")
+    parser.parse_args(argv)
+    logs.configure()
+
+    rebuild()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import date
+
+from app.database import threadpool
+from app.database.config import execute_query
+from app.services import tariff_cache
+from app.monitoring.logs import get_logger
+
+logger = get_logger("exemption_index")
+
+# Seconds before the index is rebuilt from MySQL even without local writes;
+# bounds how long other worker processes can miss a new exemption. 0 disables.
+# Rebuilds run in the background; lookups keep using the previous index.
+EXEMPTION_INDEX_TTL = float(os.getenv("EXEMPTION_INDEX_TTL", "300"))
+
+EXEMPTION_QUERY = """
+    SELECT exemption_id, exemption_category, passenger_id, fare_type_id, valid_from, valid_to
+    FROM exemption
+"""
+
+class _PassengerIntervals:
+    """One passenger's exemptions sorted by valid_from.
+
+    ``max_end[i]`` is the latest valid_to among entries ``0..i``, so a scan
+    backwards from the last interval starting on or before a date can stop as
+    soon as no earlier interval can still cover it.
+    """
+
+    __slots__ = ("starts", "entries", "max_end")
+
+    def __init__(self):
+        self.starts = []
+        self.entries = []
+        self.max_end = []
+
+    def add(self, row):
+        if any(entry["exemption_id"] == row["exemption_id"] for entry in self.entries):
+            return False
+        position = bisect_right(self.starts, row["valid_from"])
+        self.starts.insert(position, row["valid_from"])
+        self.entries.insert(position, row)
+        self.max_end.insert(position, row["valid_to"])
+        running = self.max_end[position - 1] if position else None
+        for i in range(position, len(self.entries)):
+            end = self.entries[i]["valid_to"]
+            running = end if running is None or end > running else running
+            self.max_end[i] = running
+        return True
+
+    def active_on(self, on_date):
+        active = []
+        i = bisect_right(self.starts, on_date) - 1
+        while i >= 0 and self.max_end[i] >= on_date:
+            if self.entries[i]["valid_to"] >= on_date:
+                active.append(self.entries[i])
+            i -= 1
+        active.reverse()
+        return active
+
+class ExemptionIndex:
+    """Interval index answering "active exemptions for passenger P on date D".
+
+    Lookups are a dict hit plus a binary search over that passenger's
+    intervals, so they never touch MySQL.
+    """
+
+    def __init__(self, rows=()):
+        self.loaded_at = time.monotonic()
+        self._passengers = {}
+        self._lock = threading.Lock()
+        self.size = 0
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        row = dict(row)
+        with self._lock:
+            intervals = self._passengers.get(row["passenger_id"])
+            if intervals is None:
+                intervals = self._passengers[row["passenger_id"]] = _PassengerIntervals()
+            if intervals.add(row):
+                self.size += 1
+
+    def active_for(self, passenger_id, on_date):
+        intervals = self._passengers.get(passenger_id)
+        if intervals is None:
+            return []
+        with self._lock:
+            return intervals.active_on(on_date)
+
+    def exemptions_for(self, passenger_id):
+        intervals = self._passengers.get(passenger_id)
+        if intervals is None:
+            return []
+        with self._lock:
+            return list(intervals.entries)
+
+    def passenger_count(self):
+        return len(self._passengers)
+
+    def age(self):
+        return time.monotonic() - self.loaded_at
+
+_lock = threading.Lock()
+_index = None
+_stale = True
+_invalidations = 0
+_loads = 0
+_published_load = 0
+# Rebuilds in flight, and exemptions added while any of them runs: a rebuild
+# may have read the table before such a row was inserted
+_loading = 0
+_added = []
+_pending = None
+
+def refresh():
+    """Rebuild the index from the exemption table and swap it in.
+
+    Lookups keep using the previous index while the table is read; exemptions
+    added in the meantime are carried over into the new one.
+    """
+    global _index, _stale, _loads, _published_load, _loading
+    with _lock:
+        _loads += 1
+        load = _loads
+        seen = _invalidations
+        _loading += 1
+    index = None
+    try:
+        rows = execute_query(EXEMPTION_QUERY)
+        if rows is not None:
+            index = ExemptionIndex(rows)
+    finally:
+        with _lock:
+            _loading -= 1
+            # A load that started later may already have been published
+            if index is not None and load > _published_load:
+                for row in _added:
+                    index.add(row)
+                _index = index
+                _published_load = load
+                _stale = _invalidations != seen
+            if not _loading:
+                _added.clear()
+            published = _index
+    if index is None:
+        logger.error("Could not load exemptions; keeping previous index")
+    return published
+
+def _refresh_quietly():
+    try:
+        refresh()
+    except Exception as e:
+        logger.error(f"Background exemption index rebuild failed: {e}")
+
+def refresh_in_background():
+    """Start a rebuild on the database worker pool unless one is already running"""
+    global _pending
+    with _lock:
+        if _pending is None or _pending.done():
+            _pending = threadpool.get_executor().submit(_refresh_quietly)
+        return _pending
+
+def wait_for_refresh(timeout=5.0):
+    """Block until a background rebuild has finished (for tests)"""
+    pending = _pending
+    if pending is not None:
+        pending.result(timeout)
+
+def invalidate():
+    """Force a rebuild on next use, e.g. after exemptions were removed by a cascade"""
+    global _stale, _invalidations
+    _invalidations += 1
+    _stale = True
+
+def get_index():
+    """Current index; a stale or expired one is served while a background rebuild replaces it"""
+    index = _index
+    if index is None:
+        # Nothing to serve yet (the startup load failed), so load in the caller
+        return refresh()
+    if _stale or (EXEMPTION_INDEX_TTL and index.age() > EXEMPTION_INDEX_TTL):
+        refresh_in_background()
+    return index
+
+def add_exemption(row):
+    """Record a newly inserted exemption so lookups see it immediately"""
+    with _lock:
+        if _loading:
+            _added.append(dict(row))
+        index = _index
+    # Duplicates of rows a rebuild already loaded are ignored
+    if index is not None:
+        index.add(row)
+
+def _with_type_name(row):
+    fare_type = tariff_cache.get_fare_type(row["fare_type_id"])
+    row = dict(row)
+    row["type_name"] = fare_type["type_name"] if fare_type else None
+    return row
+
+def active_exemptions(passenger_id, on_date=None):
+    """Exemptions valid for the passenger on ``on_date`` (default today), with type_name"""
+    index = get_index()
+    if index is None:
+        return []
+    return [_with_type_name(row) for row in index.active_for(passenger_id, on_date or date.today())]
+
+def passenger_exemptions(passenger_id):
+    """All of a passenger's exemptions, active or not"""
+    index = get_index()
+    return index.exemptions_for(passenger_id) if index else []
+
+def stats():
+    index = _index
+    return {
+        "exemptions": index.size if index else 0,
+        "passengers": index.passenger_count() if index else 0,
+        "age_seconds": index.age() if index else None,
+        "stale": _stale,
+        "rebuilding": _pending is not None and not _pending.done(),
+        "ttl": EXEMPTION_INDEX_TTL
+    }
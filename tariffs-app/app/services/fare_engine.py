@@ -0,0 +1,192 @@
+from datetime import date
+
+import numpy as np
+
+from app.database.config import execute_query
+from app.services import tariff_cache
+
+# exemption_id values at or below this mean "no exemption requested"
+NO_EXEMPTION = 0
+
+# (snapshot version, TariffTable) built from the tariff cache
+_cache_table = None
+
+class TariffTable:
+    """Tariffs as parallel arrays sorted by fare_type_id"""
+
+    def __init__(self, fare_type_ids, base_prices, discount_rates):
+        order = np.argsort(np.asarray(fare_type_ids, dtype=np.int64), kind="stable")
+        self.fare_type_ids = np.asarray(fare_type_ids, dtype=np.int64)[order]
+        self.base_prices = np.asarray(base_prices, dtype=np.float64)[order]
+        self.discount_rates = np.asarray(discount_rates, dtype=np.float64)[order]
+
+    @classmethod
+    def from_rows(cls, rows):
+        # Fare types without a tariff cannot be priced, so they are left out
+        rows = [row for row in rows if row.get("base_price") is not None]
+        return cls(
+            [row["fare_type_id"] for row in rows],
+            [float(row["base_price"]) for row in rows],
+            [float(row["discount_rate"] or 0) for row in rows]
+        )
+
+    @classmethod
+    def from_cache(cls):
+        """Table for the current tariff snapshot, rebuilt only when its version changes"""
+        global _cache_table
+        snapshot = tariff_cache.get_snapshot()
+        version = snapshot.version if snapshot else 0
+        if _cache_table is None or _cache_table[0] != version:
+            _cache_table = (version, cls.from_rows(snapshot.all() if snapshot else []))
+        return _cache_table[1]
+
+    def with_overrides(self, overrides):
+        """Copy of the table with some tariffs replaced, for what-if pricing.
+
+        ``overrides`` maps fare_type_id to a dict with ``base_price`` and/or
+        ``discount_rate``; unknown fare types are added.
+        """
+        prices = dict(zip(self.fare_type_ids.tolist(), zip(self.base_prices.tolist(), self.discount_rates.tolist())))
+        for fare_type_id, override in overrides.items():
+            base_price, discount_rate = prices.get(fare_type_id, (0.0, 0.0))
+            prices[fare_type_id] = (
+                float(override.get("base_price", base_price)),
+                float(override.get("discount_rate", discount_rate))
+            )
+        ids = list(prices)
+        return TariffTable(ids, [prices[i][0] for i in ids], [prices[i][1] for i in ids])
+
+    def lookup(self, fare_type_ids):
+        """Row positions for ``fare_type_ids`` and a mask of which were found"""
+        return _sorted_lookup(self.fare_type_ids, fare_type_ids)
+
+class ExemptionTable:
+    """Granted exemptions as parallel arrays sorted by exemption_id"""
+
+    def __init__(self, exemption_ids, passenger_ids, fare_type_ids, valid_from, valid_to):
+        exemption_ids = np.asarray(exemption_ids, dtype=np.int64)
+        order = np.argsort(exemption_ids, kind="stable")
+        self.exemption_ids = exemption_ids[order]
+        self.passenger_ids = np.asarray(passenger_ids, dtype=np.int64)[order]
+        self.fare_type_ids = np.asarray(fare_type_ids, dtype=np.int64)[order]
+        self.valid_from = np.asarray(valid_from, dtype="datetime64[D]")[order]
+        self.valid_to = np.asarray(valid_to, dtype="datetime64[D]")[order]
+
+    @classmethod
+    def from_rows(cls, rows):
+        return cls(
+            [row["exemption_id"] for row in rows],
+            [row["passenger_id"] for row in rows],
+            [row["fare_type_id"] for row in rows],
+            [row["valid_from"] for row in rows],
+            [row["valid_to"] for row in rows]
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [], [], [])
+
+    def lookup(self, exemption_ids):
+        return _sorted_lookup(self.exemption_ids, exemption_ids)
+
+def load_exemption_table(exemption_ids=None):
+    """Load exemptions from the database, optionally only the given ids"""
+    query = """
+        SELECT exemption_id, passenger_id, fare_type_id, valid_from, valid_to
+        FROM exemption
+    """
+    params = None
+    if exemption_ids is not None:
+        exemption_ids = sorted({int(i) for i in exemption_ids if i and int(i) > NO_EXEMPTION})
+        if not exemption_ids:
+            return ExemptionTable.empty()
+        query += f" WHERE exemption_id IN ({', '.join(['%s'] * len(exemption_ids))})"
+        params = tuple(exemption_ids)
+
+    rows = execute_query(query, params)
+    return ExemptionTable.from_rows(rows or [])
+
+class FareQuotes:
+    """Result arrays of a bulk quote, one position per input row"""
+
+    def __init__(self, base_fare, discount_rate, discount, final_fare, priced, exemption_applied):
+        self.base_fare = base_fare
+        self.discount_rate = discount_rate
+        self.discount = discount
+        self.final_fare = final_fare
+        self.priced = priced
+        self.exemption_applied = exemption_applied
+
+    def __len__(self):
+        return len(self.final_fare)
+
+    def row(self, index):
+        return {
+            "base_fare": float(self.base_fare[index]),
+            "discount_rate": float(self.discount_rate[index]),
+            "discount": float(self.discount[index]),
+            "final_fare": float(self.final_fare[index]),
+            "priced": bool(self.priced[index]),
+            "exemption_applied": bool(self.exemption_applied[index])
+        }
+
+def quote_fares(passenger_ids, fare_type_ids, exemption_ids=None, dates=None, tariffs=None, exemptions=None):
+    """Price many (passenger, fare type, exemption, date) rows at once.
+
+    An exemption applies when it belongs to the passenger and ``date`` falls
+    within its validity; it grants the discount rate of the exemption's own
+    fare type, as the single-ticket calculation always has. Rows whose fare
+    type has no tariff come back with ``priced`` False and zero fares.
+    ``dates`` may be a single date or one per row and defaults to today.
+    """
+    passenger_ids = np.asarray(passenger_ids, dtype=np.int64)
+    fare_type_ids = np.asarray(fare_type_ids, dtype=np.int64)
+    count = len(passenger_ids)
+
+    if exemption_ids is None:
+        exemption_ids = np.full(count, NO_EXEMPTION, dtype=np.int64)
+    elif isinstance(exemption_ids, np.ndarray):
+        exemption_ids = exemption_ids.astype(np.int64, copy=False)
+    else:
+        exemption_ids = np.asarray([NO_EXEMPTION if e is None else e for e in exemption_ids], dtype=np.int64)
+    dates = np.broadcast_to(np.asarray(date.today() if dates is None else dates, dtype="datetime64[D]"), (count,))
+
+    if tariffs is None:
+        tariffs = TariffTable.from_cache()
+    if exemptions is None:
+        exemptions = ExemptionTable.empty()
+
+    # Base fare from the ticket's own fare type
+    tariff_pos, priced = tariffs.lookup(fare_type_ids)
+    base_fare = _gather(tariffs.base_prices, tariff_pos, priced)
+
+    # Exemption must exist, belong to the passenger and be active on the date
+    exemption_pos, found = exemptions.lookup(exemption_ids)
+    found &= exemption_ids > NO_EXEMPTION
+    if len(exemptions.exemption_ids):
+        found &= exemptions.passenger_ids[exemption_pos] == passenger_ids
+        found &= (exemptions.valid_from[exemption_pos] <= dates) & (dates <= exemptions.valid_to[exemption_pos])
+    exemption_fare_types = _gather(exemptions.fare_type_ids, exemption_pos, found).astype(np.int64)
+
+    discount_pos, has_discount = tariffs.lookup(exemption_fare_types)
+    exemption_applied = found & has_discount & priced
+    discount_rate = _gather(tariffs.discount_rates, discount_pos, exemption_applied)
+
+    discount = base_fare * (discount_rate / 100)
+    final_fare = base_fare - discount
+
+    return FareQuotes(base_fare, discount_rate, discount, final_fare, priced, exemption_applied)
+
+def _sorted_lookup(sorted_keys, keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=bool)
+    positions = np.searchsorted(sorted_keys, keys)
+    positions = np.minimum(positions, len(sorted_keys) - 1)
+    return positions, sorted_keys[positions] == keys
+
+def _gather(values, positions, mask):
+    """values[positions] where mask is set, zero elsewhere (safe on empty tables)"""
+    if len(values) == 0:
+        return np.zeros(len(positions), dtype=values.dtype)
+    return np.where(mask, values[positions], 0)
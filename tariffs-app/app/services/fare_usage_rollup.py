@@ -0,0 +1,133 @@
+"""Incrementally maintained ``daily_fare_usage`` rollup.
+
+Ticket issuance adds to the rollup inside its own transaction. Tickets
+written any other way (imports, manual fixes) are picked up by the
+catch-up job once their day has closed, and any date range can be rebuilt
+from ``ticket``:
+
+    python -m app.services.fare_usage_rollup rebuild --start 2024-01-01 --end 2024-12-31
+    python -m app.services.fare_usage_rollup catch-up --days 2
+"""
+import argparse
+import sys
+from collections import defaultdict
+from datetime import date, timedelta
+
+from app.database.config import execute_query, transaction
+from app.monitoring import logs
+from app.monitoring.logs import get_logger
+
+logger = get_logger("fare_usage_rollup")
+
+UPSERT_PREFIX = "INSERT INTO daily_fare_usage (usage_date, fare_type_id, tickets_sold, revenue) VALUES "
+UPSERT_SUFFIX = """
+    ON DUPLICATE KEY UPDATE
+        tickets_sold = tickets_sold + VALUES(tickets_sold),
+        revenue = revenue + VALUES(revenue)
+"""
+
+REPORT_QUERY = """
+    SELECT
+        u.usage_date as date,
+        ft.type_name as fare_type,
+        SUM(u.tickets_sold) as tickets_sold,
+        SUM(u.revenue) as total_revenue
+    FROM daily_fare_usage u
+    JOIN fare_type ft ON u.fare_type_id = ft.fare_type_id
+    WHERE u.usage_date BETWEEN %s AND %s
+    GROUP BY u.usage_date, ft.type_name
+    ORDER BY u.usage_date DESC
+"""
+
+def record_tickets(cursor, tickets):
+    """Add issued tickets to the rollup using the caller's transaction.
+
+    ``tickets`` is an iterable of (purchase_date, fare_type_id, price). Rows
+    are pre-aggregated so a batch costs one upsert statement. Call it last
+    before commit: the (date, fare type) rows are shared by every sale of
+    that fare today, so their locks should be held as briefly as possible.
+    """
+    totals = defaultdict(lambda: [0, 0.0])
+    for purchase_date, fare_type_id, price in tickets:
+        total = totals[(purchase_date, fare_type_id)]
+        total[0] += 1
+        total[1] += float(price)
+    if not totals:
+        return
+
+    # Sorted keys give every transaction the same lock order
+    keys = sorted(totals)
+    params = []
+    for key in keys:
+        params.extend((key[0], key[1], totals[key][0], totals[key][1]))
+    cursor.execute(
+        UPSERT_PREFIX + ", ".join(["(%s, %s, %s, %s)"] * len(keys)) + UPSERT_SUFFIX,
+        tuple(params)
+    )
+
+def rebuild(start_date, end_date):
+    """Recompute the rollup for [start_date, end_date] from the ticket table.
+
+    Locks the rollup rows before reading ``ticket``, the reverse of issuance,
+    and replaces whatever issuance added meanwhile; only run it over days
+    that are no longer selling tickets (see ``catch_up``).
+    """
+    with transaction() as cursor:
+        cursor.execute(
+            "DELETE FROM daily_fare_usage WHERE usage_date BETWEEN %s AND %s",
+            (start_date, end_date)
+        )
+        cursor.execute("""
+            INSERT INTO daily_fare_usage (usage_date, fare_type_id, tickets_sold, revenue)
+            SELECT purchase_date, fare_type_id, COUNT(*), SUM(price)
+            FROM ticket
+            WHERE purchase_date BETWEEN %s AND %s
+            GROUP BY purchase_date, fare_type_id
+        """, (start_date, end_date))
+        rows = cursor.rowcount
+    logger.info(f"Rebuilt daily_fare_usage from {start_date} to {end_date}: {rows} rows")
+    return rows
+
+def catch_up(days=2):
+    """Rebuild the last ``days`` closed days, picking up tickets written outside issuance"""
+    today = date.today()
+    return rebuild(today - timedelta(days=days), today - timedelta(days=1))
+
+def rebuild_all():
+    """Recompute every date that has tickets; includes today, so run it while sales are stopped"""
+    bounds = execute_query("SELECT MIN(purchase_date) AS first_day, MAX(purchase_date) AS last_day FROM ticket")
+    if not bounds or bounds[0]["first_day"] is None:
+        return 0
+    with transaction() as cursor:
+        # Drop rows for dates that no longer have tickets at all
+        cursor.execute(
+            "DELETE FROM daily_fare_usage WHERE usage_date < %s OR usage_date > %s",
+            (bounds[0]["first_day"], bounds[0]["last_day"])
+        )
+    return rebuild(bounds[0]["first_day"], bounds[0]["last_day"])
+
+def fare_usage_report(start_date, end_date):
+    """Rows for the fare usage report, read from the rollup"""
+    return execute_query(REPORT_QUERY, (start_date, end_date))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the daily_fare_usage rollup")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="Recompute a date range (default: all tickets)")
+    rebuild_parser.add_argument("--start", type=date.fromisoformat)
+    rebuild_parser.add_argument("--end", type=date.fromisoformat)
+    catch_up_parser = subparsers.add_parser("catch-up", help="Recompute the last few closed days")
+    catch_up_parser.add_argument("--days", type=int, default=2)
+    args = parser.parse_args(argv)
+    logs.configure()
+
+    if args.command == "catch-up":
+        catch_up(args.days)
+    elif args.start or args.end:
+        rebuild(args.start or date(1000, 1, 1), args.end or date.today())
+    else:
+        rebuild_all()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
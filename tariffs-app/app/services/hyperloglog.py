@@ -0,0 +1,67 @@
+import hashlib
+
+import numpy as np
+
+# 2^11 one-byte registers: 2 KB per sketch, about 2.3% standard error
+PRECISION = 11
+REGISTERS = 1 << PRECISION
+
+_HASH_BITS = 64
+_RANK_BITS = _HASH_BITS - PRECISION
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+def _hash(value):
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+class HyperLogLog:
+    """Approximate distinct counter whose sketches merge by register-wise max.
+
+    Sketches serialize to a fixed ``REGISTERS``-byte string, so per-day
+    sketches can be stored in a table and unioned over any date range.
+    """
+
+    def __init__(self, registers=None):
+        if registers is None:
+            registers = np.zeros(REGISTERS, dtype=np.uint8)
+        self.registers = registers
+
+    @classmethod
+    def from_bytes(cls, data):
+        if not data:
+            return cls()
+        return cls(np.frombuffer(bytes(data), dtype=np.uint8).copy())
+
+    @classmethod
+    def union(cls, sketches):
+        """One sketch counting every value seen by any of ``sketches``"""
+        arrays = [sketch.registers for sketch in sketches]
+        if not arrays:
+            return cls()
+        return cls(np.maximum.reduce(arrays))
+
+    def to_bytes(self):
+        return self.registers.tobytes()
+
+    def add(self, value):
+        hashed = _hash(value)
+        index = hashed >> _RANK_BITS
+        remainder = hashed & ((1 << _RANK_BITS) - 1)
+        rank = _RANK_BITS - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        estimate = _ALPHA * REGISTERS * REGISTERS / np.ldexp(1.0, -self.registers.astype(np.int32)).sum()
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is far more accurate while many registers are empty
+        if estimate <= 2.5 * REGISTERS and zeros:
+            estimate = REGISTERS * np.log(REGISTERS / zeros)
+        return int(round(estimate))
@@ -0,0 +1,226 @@
+"""Daily passenger activity rollup behind the passenger activity report.
+
+``daily_passenger_activity`` holds, per day and fare type, how many
+passengers rode for the first time and a HyperLogLog sketch of the distinct
+passengers. Ticket and sale totals come from ``daily_fare_usage``.
+
+Ticket issuance does not touch this rollup: the sketch rows are shared by
+every sale of a fare on a day, and locking them would serialize checkout.
+Instead the catch-up job builds each day from ``ticket`` once it has closed
+(schedule it shortly after midnight), so the report's distinct-passenger
+figures cover days up to yesterday. Any range can also be rebuilt:
+
+    python -m app.services.passenger_activity catch-up --days 2
+    python -m app.services.passenger_activity rebuild --start 2024-01-01 --end 2024-12-31
+"""
+import argparse
+import sys
+from collections import defaultdict
+from datetime import date, timedelta
+
+from app.database.config import execute_query, stream_query, transaction
+from app.services.hyperloglog import HyperLogLog
+from app.monitoring import logs
+from app.monitoring.logs import get_logger
+
+logger = get_logger("passenger_activity")
+
+# Rows per multi-row INSERT when rebuilding; each row carries a 2 KB sketch
+REBUILD_CHUNK_SIZE = 200
+# Passengers per first_ticket_date UPDATE
+UPDATE_CHUNK_SIZE = 1000
+
+UPSERT_PREFIX = """
+    INSERT INTO daily_passenger_activity (activity_date, fare_type_id, first_time_passengers, passenger_sketch)
+    VALUES """
+
+USAGE_QUERY = """
+    SELECT u.usage_date as date, ft.type_name, u.tickets_sold, u.revenue
+    FROM daily_fare_usage u
+    JOIN fare_type ft ON u.fare_type_id = ft.fare_type_id
+    WHERE u.usage_date BETWEEN %s AND %s
+"""
+
+ACTIVITY_QUERY = """
+    SELECT a.activity_date as date, ft.type_name, a.first_time_passengers, a.passenger_sketch
+    FROM daily_passenger_activity a
+    JOIN fare_type ft ON a.fare_type_id = ft.fare_type_id
+    WHERE a.activity_date BETWEEN %s AND %s
+"""
+
+REGISTRATIONS_QUERY = """
+    SELECT registered_at as date, COUNT(*) as registrations
+    FROM passenger
+    WHERE registered_at BETWEEN %s AND %s
+    GROUP BY registered_at
+"""
+
+def _in_list(count):
+    return ", ".join(["%s"] * count)
+
+def rebuild(start_date, end_date):
+    """Recompute the rollup for [start_date, end_date] from the ticket table.
+
+    Also sets ``first_ticket_date`` for passengers whose first ticket falls in
+    the range, which issuance leaves to this job.
+    """
+    first_time = defaultdict(int)
+    sketches = defaultdict(HyperLogLog)
+    seen = set()
+    first_rides = defaultdict(list)
+    for row in stream_query("""
+        SELECT t.purchase_date, t.fare_type_id, t.passenger_id, p.first_ticket_date
+        FROM ticket t
+        JOIN passenger p ON t.passenger_id = p.passenger_id
+        WHERE t.purchase_date BETWEEN %s AND %s
+        ORDER BY t.purchase_date, t.ticket_id
+    """, (start_date, end_date)):
+        passenger_id = row["passenger_id"]
+        key = (row["purchase_date"], row["fare_type_id"])
+        sketches[key].add(passenger_id)
+        if passenger_id in seen:
+            continue
+        seen.add(passenger_id)
+        # A first ride counts once, under the fare type of its first ticket
+        first_day = row["first_ticket_date"]
+        if first_day is None or first_day > row["purchase_date"]:
+            first_day = row["purchase_date"]
+            first_rides[first_day].append(passenger_id)
+        if first_day == row["purchase_date"]:
+            first_time[key] += 1
+
+    keys = sorted(sketches)
+    with transaction() as cursor:
+        for first_day, riders in sorted(first_rides.items()):
+            for start in range(0, len(riders), UPDATE_CHUNK_SIZE):
+                chunk = riders[start:start + UPDATE_CHUNK_SIZE]
+                cursor.execute(
+                    f"UPDATE passenger SET first_ticket_date = %s WHERE passenger_id IN ({_in_list(len(chunk))}) "
+                    "AND (first_ticket_date IS NULL OR first_ticket_date > %s)",
+                    (first_day,) + tuple(chunk) + (first_day,)
+                )
+        cursor.execute(
+            "DELETE FROM daily_passenger_activity WHERE activity_date BETWEEN %s AND %s",
+            (start_date, end_date)
+        )
+        for start in range(0, len(keys), REBUILD_CHUNK_SIZE):
+            chunk = keys[start:start + REBUILD_CHUNK_SIZE]
+            params = []
+            for key in chunk:
+                params.extend((key[0], key[1], first_time[key], sketches[key].to_bytes()))
+            cursor.execute(UPSERT_PREFIX + ", ".join(["(%s, %s, %s, %s)"] * len(chunk)), tuple(params))
+    logger.info(f"Rebuilt daily_passenger_activity from {start_date} to {end_date}: {len(keys)} rows")
+    return len(keys)
+
+def catch_up(days=2):
+    """Rebuild the last ``days`` closed days; today's tickets are added tomorrow"""
+    today = date.today()
+    return rebuild(today - timedelta(days=days), today - timedelta(days=1))
+
+def rebuild_all():
+    bounds = execute_query("SELECT MIN(purchase_date) AS first_day, MAX(purchase_date) AS last_day FROM ticket")
+    if not bounds or bounds[0]["first_day"] is None:
+        return 0
+    return rebuild(bounds[0]["first_day"], bounds[0]["last_day"])
+
+def _type_filter(query, params, passenger_type):
+    if passenger_type:
+        return query + " AND LOWER(ft.type_name) = %s", params + (passenger_type.lower(),)
+    return query, params
+
+def activity_report(start_date, end_date, passenger_type=None):
+    """Report values for [start_date, end_date], optionally for one fare type.
+
+    Reads only the two daily rollups and the registration index; distinct
+    passenger counts over the range are unions of the daily sketches.
+    """
+    usage = execute_query(*_type_filter(USAGE_QUERY, (start_date, end_date), passenger_type)) or []
+    activity = execute_query(*_type_filter(ACTIVITY_QUERY, (start_date, end_date), passenger_type)) or []
+    registrations = execute_query(REGISTRATIONS_QUERY, (start_date, end_date)) or []
+
+    days = defaultdict(lambda: {"new_registrations": 0, "tickets_purchased": 0, "sketches": []})
+    types = defaultdict(lambda: {"tickets": 0, "revenue": 0.0, "first_time": 0, "sketches": []})
+    for row in registrations:
+        days[row["date"]]["new_registrations"] = row["registrations"]
+    for row in usage:
+        days[row["date"]]["tickets_purchased"] += int(row["tickets_sold"])
+        types[row["type_name"]]["tickets"] += int(row["tickets_sold"])
+        types[row["type_name"]]["revenue"] += float(row["revenue"])
+    for row in activity:
+        sketch = HyperLogLog.from_bytes(row["passenger_sketch"])
+        days[row["date"]]["sketches"].append(sketch)
+        types[row["type_name"]]["sketches"].append(sketch)
+        types[row["type_name"]]["first_time"] += row["first_time_passengers"]
+
+    activity_data = [
+        {
+            "date": day,
+            "new_registrations": days[day]["new_registrations"],
+            "tickets_purchased": days[day]["tickets_purchased"],
+            "unique_passengers": HyperLogLog.union(days[day]["sketches"]).count()
+        }
+        for day in sorted(days, reverse=True)
+    ]
+
+    trend_data = []
+    for type_name in sorted(types):
+        totals = types[type_name]
+        unique = HyperLogLog.union(totals["sketches"]).count()
+        trend_data.append({
+            "passenger_type": type_name,
+            "unique": unique,
+            "first_time": totals["first_time"],
+            "returning": max(0, unique - totals["first_time"]),
+            "avg_tickets": totals["tickets"] / unique if unique else 0.0,
+            "avg_fare": totals["revenue"] / totals["tickets"] if totals["tickets"] else 0.0
+        })
+    type_total = sum(trend["unique"] for trend in trend_data)
+    passenger_types = [
+        {
+            "name": trend["passenger_type"],
+            "count": trend["unique"],
+            "percentage": round(trend["unique"] * 100 / type_total, 1) if type_total else 0
+        }
+        for trend in trend_data
+    ]
+
+    day_count = len(activity_data)
+    total_registrations = sum(entry["new_registrations"] for entry in activity_data)
+    total_tickets = sum(entry["tickets_purchased"] for entry in activity_data)
+    by_tickets = sorted(activity_data, key=lambda entry: entry["tickets_purchased"])
+    return {
+        "activity_data": activity_data,
+        "total_registrations": total_registrations,
+        "total_tickets": total_tickets,
+        "total_unique_passengers": HyperLogLog.union(
+            [sketch for totals in types.values() for sketch in totals["sketches"]]
+        ).count(),
+        "avg_daily_registrations": round(total_registrations / day_count, 1) if day_count else 0,
+        "avg_daily_tickets": round(total_tickets / day_count, 1) if day_count else 0,
+        "most_active_day": by_tickets[-1]["date"] if by_tickets else "N/A",
+        "least_active_day": by_tickets[0]["date"] if by_tickets else "N/A",
+        "passenger_types": passenger_types,
+        "trend_data": trend_data
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the daily_passenger_activity rollup")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="Recompute a date range (default: all tickets)")
+    rebuild_parser.add_argument("--start", type=date.fromisoformat)
+    rebuild_parser.add_argument("--end", type=date.fromisoformat)
+    catch_up_parser = subparsers.add_parser("catch-up", help="Recompute the last few closed days")
+    catch_up_parser.add_argument("--days", type=int, default=2)
+    args = parser.parse_args(argv)
+    logs.configure()
+
+    if args.command == "catch-up":
+        catch_up(args.days)
+    elif args.start or args.end:
+        rebuild(args.start or date(1000, 1, 1), args.end or date.today())
+    else:
+        rebuild_all()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import base64
+import json
+
+from app.database.config import execute_query
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+COLUMNS = "passenger_id, passenger_full_name, email"
+
+def encode_cursor(values):
+    """Opaque page token for the last row of a page"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+def escape_like(term):
+    """Escape LIKE wildcards so the term only ever matches as a literal prefix"""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+NAME_SEARCH = f"SELECT {COLUMNS} FROM passenger WHERE passenger_full_name LIKE %s"
+# Passengers whose name also matches were already listed by the name pass
+EMAIL_SEARCH = f"SELECT {COLUMNS} FROM passenger WHERE email LIKE %s AND passenger_full_name NOT LIKE %s"
+
+def _search_names(prefix, after, count):
+    sql = NAME_SEARCH
+    params = (prefix,)
+    if after:
+        sql += " AND (passenger_full_name > %s OR (passenger_full_name = %s AND passenger_id > %s))"
+        params += (after[0], after[0], after[1])
+    sql += " ORDER BY passenger_full_name, passenger_id LIMIT %s"
+    return execute_query(sql, params + (count,)) or []
+
+def _search_emails(prefix, after, count):
+    sql = EMAIL_SEARCH
+    params = (prefix, prefix)
+    if after:
+        # Email is unique, so it is a complete key on its own
+        sql += " AND email > %s"
+        params += (after[0],)
+    sql += " ORDER BY email LIMIT %s"
+    return execute_query(sql, params + (count,)) or []
+
+def search_passengers(query=None, cursor=None, limit=PAGE_SIZE):
+    """One page of the passenger directory, optionally filtered by a prefix.
+
+    Without a query, pages walk the primary key. A query matches name
+    prefixes first, then email prefixes of passengers whose name did not
+    match (a query containing ``@`` skips the name pass); each pass is one
+    index range scan in its own column's order, and a page that finishes
+    the name pass is filled from the email pass. Every page is fetched by
+    keyset (``WHERE key > last key``), never OFFSET, so deep pages cost the
+    same as the first. Returns the rows and the cursor for the next page
+    (None on the last page).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = decode_cursor(cursor)
+    query = (query or "").strip()
+
+    if not query:
+        sql = f"SELECT {COLUMNS} FROM passenger"
+        params = ()
+        if after:
+            sql += " WHERE passenger_id > %s"
+            params = (after[-1],)
+        sql += " ORDER BY passenger_id LIMIT %s"
+        # One extra row tells whether there is a next page
+        rows = execute_query(sql, params + (limit + 1,)) or []
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1]["passenger_id"]])
+        return rows, next_cursor
+
+    prefix = escape_like(query) + "%"
+    # Search cursors are ["name", name, passenger_id] or ["email", email]
+    phase, key = "name", None
+    if after and after[0] in ("name", "email") and len(after) == (3 if after[0] == "name" else 2):
+        phase, key = after[0], after[1:]
+
+    matches = []
+    if phase == "name" and "@" not in query:
+        matches = [("name", row) for row in _search_names(prefix, key, limit + 1)]
+    if len(matches) <= limit:
+        email_after = key if phase == "email" else None
+        matches += [("email", row) for row in _search_emails(prefix, email_after, limit + 1 - len(matches))]
+
+    next_cursor = None
+    if len(matches) > limit:
+        matches = matches[:limit]
+        last_phase, last = matches[-1]
+        if last_phase == "name":
+            next_cursor = encode_cursor(["name", last["passenger_full_name"], last["passenger_id"]])
+        else:
+            next_cursor = encode_cursor(["email", last["email"]])
+    return [row for _, row in matches], next_cursor
@@ -0,0 +1,124 @@
+from app.database.config import execute_query, stream_query
+
+# Passengers per round trip when a bulk report is given an explicit id list
+BULK_CHUNK_SIZE = 1000
+
+# Every section of the report in one UNION ALL. Each part fills the generic
+# columns it needs; SECTION_COLUMNS maps them back to named fields.
+REPORT_QUERY = """
+    SELECT 0 AS section_order, 'passenger' AS section, p.passenger_id, NULL AS item_id,
+           p.passenger_full_name AS text_a, p.email AS text_b,
+           NULL AS date_a, NULL AS date_b,
+           NULL AS num_a, NULL AS num_b, NULL AS num_c, NULL AS num_d, NULL AS num_e
+    FROM passenger p
+    WHERE p.passenger_id {condition}
+    UNION ALL
+    SELECT 1, 'exemption', e.passenger_id, e.exemption_id,
+           e.exemption_category, ft.type_name,
+           e.valid_from, e.valid_to,
+           NULL, NULL, NULL, NULL, NULL
+    FROM exemption e
+    JOIN fare_type ft ON e.fare_type_id = ft.fare_type_id
+    WHERE e.passenger_id {condition}
+    UNION ALL
+    SELECT 2, 'application', a.passenger_id, a.application_id,
+           a.status, GROUP_CONCAT(DISTINCT d.document_type ORDER BY d.document_type SEPARATOR ', '),
+           a.submitted_date, NULL,
+           NULL, NULL, NULL, NULL, NULL
+    FROM exemption_application a
+    LEFT JOIN document_record d ON d.application_id = a.application_id
+    WHERE a.passenger_id {condition}
+    GROUP BY a.application_id
+    UNION ALL
+    SELECT 3, 'ticket_stats', s.passenger_id, NULL,
+           NULL, NULL,
+           NULL, NULL,
+           COUNT(*), SUM(s.price), SUM(s.exempt),
+           AVG(CASE WHEN s.exempt = 1 THEN s.price END),
+           AVG(CASE WHEN s.exempt = 0 THEN s.price END)
+    FROM (
+        SELECT t.passenger_id, t.price,
+               EXISTS(
+                   SELECT 1 FROM exemption e
+                   WHERE e.passenger_id = t.passenger_id
+                     AND e.fare_type_id = t.fare_type_id
+                     AND t.purchase_date BETWEEN e.valid_from AND e.valid_to
+               ) AS exempt
+        FROM ticket t
+        WHERE t.passenger_id {condition}
+    ) s
+    GROUP BY s.passenger_id
+    ORDER BY passenger_id, section_order, date_a DESC, item_id
+"""
+
+SECTION_COLUMNS = {
+    "passenger": {"text_a": "passenger_full_name", "text_b": "email"},
+    "exemption": {"item_id": "exemption_id", "text_a": "exemption_category", "text_b": "type_name",
+                  "date_a": "valid_from", "date_b": "valid_to"},
+    "application": {"item_id": "application_id", "text_a": "status", "text_b": "document_type",
+                    "date_a": "submitted_date"},
+    "ticket_stats": {"num_a": "total_tickets", "num_b": "total_spent", "num_c": "exemption_tickets",
+                     "num_d": "avg_exemption_price", "num_e": "avg_regular_price"}
+}
+
+def _report_query(condition):
+    return REPORT_QUERY.format(condition=condition)
+
+def _section_row(row):
+    values = {"passenger_id": row["passenger_id"]}
+    for column, name in SECTION_COLUMNS[row["section"]].items():
+        values[name] = row[column]
+    if row["section"] == "ticket_stats":
+        values["total_tickets"] = int(values["total_tickets"])
+        values["exemption_tickets"] = int(values["exemption_tickets"] or 0)
+        for name in ("total_spent", "avg_exemption_price", "avg_regular_price"):
+            if values[name] is not None:
+                values[name] = float(values[name])
+    return values
+
+def build_reports(rows):
+    """Group report rows (ordered by passenger) into one report per passenger"""
+    report = None
+    for row in rows:
+        if report is None or report["passenger"]["passenger_id"] != row["passenger_id"]:
+            if report is not None:
+                yield report
+            report = None
+            if row["section"] != "passenger":
+                # Rows for a passenger id that no longer exists
+                continue
+            report = {"passenger": _section_row(row), "exemptions": [], "applications": [], "ticket_stats": None}
+            continue
+        section = _section_row(row)
+        if row["section"] == "exemption":
+            report["exemptions"].append(section)
+        elif row["section"] == "application":
+            report["applications"].append(section)
+        elif row["section"] == "ticket_stats":
+            report["ticket_stats"] = section
+    if report is not None:
+        yield report
+
+def passenger_report(passenger_id):
+    """Passenger, exemptions, applications and ticket stats in one round trip"""
+    rows = execute_query(_report_query("= %s"), (passenger_id,) * 4)
+    if not rows:
+        return None
+    return next(build_reports(rows), None)
+
+def bulk_reports(passenger_ids=None):
+    """Reports for many passengers, yielded one passenger at a time.
+
+    With ``passenger_ids`` the ids are fetched ``BULK_CHUNK_SIZE`` at a time;
+    without, every passenger is read in a single streamed pass.
+    """
+    if passenger_ids is None:
+        yield from build_reports(stream_query(_report_query("IS NOT NULL")))
+        return
+
+    passenger_ids = sorted(set(passenger_ids))
+    for start in range(0, len(passenger_ids), BULK_CHUNK_SIZE):
+        chunk = passenger_ids[start:start + BULK_CHUNK_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        rows = execute_query(_report_query(f"IN ({placeholders})"), tuple(chunk) * 4)
+        yield from build_reports(rows or [])
@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import os
+import threading
+
+from app.database import config
+from app.database.config import stream_query
+from app.database.threadpool import run_sync
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+# An export holds one pooled connection (config.stream_query) until its last
+# row is sent, so a slow client keeps it checked out for the whole download.
+# Concurrent exports are capped well below the pool size so ticketing always
+# finds a free connection; requests beyond the cap get a 503.
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", str(max(1, config.DB_POOL_SIZE // 2))))
+
+# Rows are encoded in chunks of this many so each write to the socket
+# carries a useful amount of data without holding much in memory
+ROWS_PER_CHUNK = 500
+
+FARE_USAGE_DAILY_COLUMNS = ["date", "fare_type", "tickets_sold", "total_revenue"]
+FARE_USAGE_DAILY_QUERY = """
+    SELECT
+        u.usage_date as date,
+        ft.type_name as fare_type,
+        u.tickets_sold,
+        u.revenue as total_revenue
+    FROM daily_fare_usage u
+    JOIN fare_type ft ON u.fare_type_id = ft.fare_type_id
+    WHERE u.usage_date BETWEEN %s AND %s
+    ORDER BY u.usage_date, ft.type_name
+"""
+
+FARE_USAGE_TICKET_COLUMNS = ["ticket_id", "purchase_date", "fare_type", "price", "passenger_id"]
+FARE_USAGE_TICKET_QUERY = """
+    SELECT
+        t.ticket_id,
+        t.purchase_date,
+        ft.type_name as fare_type,
+        t.price,
+        t.passenger_id
+    FROM ticket t
+    JOIN fare_type ft ON t.fare_type_id = ft.fare_type_id
+    WHERE t.purchase_date BETWEEN %s AND %s
+    ORDER BY t.purchase_date, t.ticket_id
+"""
+
+EXEMPTION_APPLICATION_COLUMNS = ["application_id", "submitted_date", "passenger_id", "passenger_full_name", "status"]
+EXEMPTION_APPLICATION_QUERY = """
+    SELECT
+        a.application_id,
+        a.submitted_date,
+        a.passenger_id,
+        p.passenger_full_name,
+        a.status
+    FROM exemption_application a
+    JOIN passenger p ON a.passenger_id = p.passenger_id
+    WHERE a.submitted_date >= %s
+    ORDER BY a.submitted_date, a.application_id
+"""
+
+def encode_csv(rows, columns):
+    """Encode an iterable of dict rows as CSV text chunks, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= ROWS_PER_CHUNK:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+def encode_ndjson(rows, columns):
+    """Encode an iterable of dict rows as newline-delimited JSON chunks"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({column: row.get(column) for column in columns}, default=str))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+ENCODERS = {
+    "csv": encode_csv,
+    "ndjson": encode_ndjson
+}
+
+_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+_DONE = object()
+
+class ExportBusyError(Exception):
+    """Every export slot is taken"""
+
+class ExportSlot:
+    """One of the EXPORT_MAX_CONCURRENT export slots; release() is idempotent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._held = True
+
+    def release(self):
+        with self._lock:
+            if not self._held:
+                return
+            self._held = False
+        _slots.release()
+
+def acquire_slot():
+    if not _slots.acquire(blocking=False):
+        raise ExportBusyError(f"{EXPORT_MAX_CONCURRENT} exports already in progress")
+    return ExportSlot()
+
+async def iterate(chunks, slot):
+    """Async iterator over a blocking export, each chunk read on the database worker pool.
+
+    Releases ``slot`` when the export finishes or the client goes away.
+    """
+    try:
+        while True:
+            chunk = await run_sync(next, chunks, _DONE)
+            if chunk is _DONE:
+                break
+            yield chunk
+    finally:
+        try:
+            # Gives the connection back (discarded if rows were left unread)
+            chunks.close()
+        except ValueError:
+            # Still running on a worker; the generator closes when it is collected
+            pass
+        slot.release()
+
+def export(query, params, columns, export_format):
+    """Stream a query's rows encoded as ``export_format``"""
+    return ENCODERS[export_format](stream_query(query, params), columns)
+
+def fare_usage_export(start_date, end_date, export_format, level="daily"):
+    """Fare usage rows, per day and fare type from the rollup or per ticket"""
+    if level == "ticket":
+        return export(FARE_USAGE_TICKET_QUERY, (start_date, end_date), FARE_USAGE_TICKET_COLUMNS, export_format)
+    return export(FARE_USAGE_DAILY_QUERY, (start_date, end_date), FARE_USAGE_DAILY_COLUMNS, export_format)
+
+def exemption_applications_export(start_date, export_format):
+    """Every exemption application submitted on or after ``start_date``"""
+    return export(EXEMPTION_APPLICATION_QUERY, (start_date,), EXEMPTION_APPLICATION_COLUMNS, export_format)
@@ -0,0 +1,254 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+
+from app.database.config import execute_query
+
+# Seconds the monthly history is kept before it is reloaded. Only complete
+# months are used, so the history rarely changes within a month.
+REVENUE_FORECAST_TTL = float(os.getenv("REVENUE_FORECAST_TTL", "3600"))
+
+# Forecasts kept per history load, keyed by the report parameters
+MAX_CACHED_FORECASTS = 64
+
+# How much of the historical seasonal swing is applied to projections
+SEASONAL_STRENGTH = {
+    "none": 0.0,
+    "light": 0.25,
+    "moderate": 0.5,
+    "strong": 1.0
+}
+
+# Months averaged to get the starting level of each fare type
+BASE_MONTHS = 3
+
+# One aggregate over the daily rollup: (year, month, fare type) totals for
+# every complete month
+MONTHLY_REVENUE_QUERY = """
+    SELECT
+        YEAR(u.usage_date) as year,
+        MONTH(u.usage_date) as month,
+        u.fare_type_id,
+        ft.type_name,
+        SUM(u.tickets_sold) as tickets_sold,
+        SUM(u.revenue) as revenue
+    FROM daily_fare_usage u
+    JOIN fare_type ft ON u.fare_type_id = ft.fare_type_id
+    WHERE u.usage_date < %s
+    GROUP BY YEAR(u.usage_date), MONTH(u.usage_date), u.fare_type_id, ft.type_name
+    ORDER BY year, month
+"""
+
+def _month_index(year, month):
+    return year * 12 + month - 1
+
+def _month_label(index):
+    return date(index // 12, index % 12 + 1, 1).strftime("%B %Y")
+
+class MonthlyHistory:
+    """Monthly revenue and ticket counts as (fare type x month) arrays"""
+
+    def __init__(self, first_month, fare_type_ids, type_names, revenue, tickets):
+        self.loaded_at = time.monotonic()
+        self.first_month = first_month
+        self.fare_type_ids = fare_type_ids
+        self.type_names = type_names
+        self.revenue = revenue
+        self.tickets = tickets
+
+    @classmethod
+    def from_rows(cls, rows):
+        if not rows:
+            return None
+        months = np.array([_month_index(row["year"], row["month"]) for row in rows])
+        fare_type_ids, fare_positions = np.unique(
+            np.array([row["fare_type_id"] for row in rows]), return_inverse=True
+        )
+        names = {row["fare_type_id"]: row["type_name"] for row in rows}
+        first_month = int(months.min())
+        shape = (len(fare_type_ids), int(months.max()) - first_month + 1)
+
+        # Months without sales stay at zero
+        revenue = np.zeros(shape)
+        tickets = np.zeros(shape)
+        np.add.at(revenue, (fare_positions, months - first_month),
+                  np.array([float(row["revenue"]) for row in rows]))
+        np.add.at(tickets, (fare_positions, months - first_month),
+                  np.array([float(row["tickets_sold"]) for row in rows]))
+        return cls(first_month, fare_type_ids.tolist(), [names[i] for i in fare_type_ids.tolist()],
+                   revenue, tickets)
+
+    @property
+    def month_count(self):
+        return self.revenue.shape[1]
+
+    @property
+    def last_month(self):
+        return self.first_month + self.month_count - 1
+
+    def age(self):
+        return time.monotonic() - self.loaded_at
+
+def fit_trend(totals, first_month):
+    """Monthly growth rate and calendar-month seasonal indices (mean 1).
+
+    Least squares on log revenue with a linear trend, plus one dummy per
+    calendar month once a full year of history is available, so seasonal
+    swings do not bias the growth estimate. Months without revenue are left
+    out of the fit.
+    """
+    indices = np.ones(12)
+    positive = totals > 0
+    if positive.sum() < 2:
+        return 0.0, indices
+    t = np.arange(len(totals))[positive]
+    calendar = (first_month + t) % 12
+    seasonal = positive.sum() >= 12 and len(np.unique(calendar)) == 12
+    columns = [np.ones(len(t)), t]
+    if seasonal:
+        # January is the reference month
+        columns.extend((calendar == month).astype(float) for month in range(1, 12))
+    coefficients, _, _, _ = np.linalg.lstsq(np.column_stack(columns), np.log(totals[positive]), rcond=None)
+    growth = float(np.expm1(coefficients[1]))
+    if seasonal:
+        indices = np.exp(np.concatenate(([0.0], coefficients[2:])))
+        indices /= indices.mean()
+    return growth, indices
+
+def project(history, months, growth_rate=None, seasonal_factor="none"):
+    """Project revenue and tickets per fare type for the next ``months`` months.
+
+    ``growth_rate`` is a monthly percentage; when omitted it is fitted from
+    the history. Returns the values the revenue forecast template renders.
+    """
+    fitted_growth, fitted_indices = fit_trend(history.revenue.sum(axis=0), history.first_month)
+    growth = fitted_growth if growth_rate is None else growth_rate / 100.0
+    strength = SEASONAL_STRENGTH.get(seasonal_factor, 0.0)
+    indices = 1 + strength * (fitted_indices - 1)
+
+    # Deseasonalized starting level per fare type from the last few months
+    base = slice(max(0, history.month_count - BASE_MONTHS), history.month_count)
+    base_calendar = (history.first_month + np.arange(history.month_count)[base]) % 12
+    base_revenue = (history.revenue[:, base] / indices[base_calendar]).mean(axis=1)
+    base_tickets = (history.tickets[:, base] / indices[base_calendar]).mean(axis=1)
+
+    # Every fare type and horizon at once: level x growth x season
+    steps = np.arange(1, months + 1)
+    future = history.last_month + steps
+    factor = (1 + growth) ** steps * indices[future % 12]
+    revenue = np.outer(base_revenue, factor)
+    tickets = np.outer(base_tickets, factor)
+
+    current_revenue = history.revenue[:, -1]
+    current_total = current_revenue.sum()
+    month_revenue = revenue.sum(axis=0)
+    month_tickets = tickets.sum(axis=0)
+    if current_total > 0:
+        month_growth = (month_revenue / current_total - 1) * 100
+    else:
+        month_growth = np.zeros(months)
+
+    forecast_data = [
+        {
+            "month": _month_label(int(future[i])),
+            "tickets": int(round(month_tickets[i])),
+            "revenue": float(month_revenue[i]),
+            "growth": float(month_growth[i])
+        }
+        for i in range(months)
+    ]
+    fare_projections = [
+        {
+            "fare_type_id": history.fare_type_ids[i],
+            "type_name": history.type_names[i],
+            "current_revenue": float(current_revenue[i]),
+            "projected_revenue": float(revenue[i].mean())
+        }
+        for i in range(len(history.fare_type_ids))
+    ]
+    return {
+        "forecast_data": forecast_data,
+        "fare_projections": fare_projections,
+        "total_tickets": sum(row["tickets"] for row in forecast_data),
+        "total_revenue": float(month_revenue.sum()),
+        "average_growth": float(month_growth.mean()) if months else 0.0,
+        "growth_rate": round(growth * 100, 2),
+        "base_period": _month_label(history.last_month),
+        "historical_start": _month_label(history.first_month),
+        "historical_end": _month_label(history.last_month)
+    }
+
+_lock = threading.Lock()
+_history = None
+_history_month = None
+# When the history was last read, even if it came back empty; None forces a load
+_history_loaded_at = None
+_forecasts = OrderedDict()
+
+def load_history():
+    """Monthly history up to the last complete month.
+
+    Returns (loaded, history): history is None when there are no sales, and
+    loaded is False when the database could not be read.
+    """
+    first_of_month = date.today().replace(day=1)
+    rows = execute_query(MONTHLY_REVENUE_QUERY, (first_of_month,))
+    return rows is not None, MonthlyHistory.from_rows(rows)
+
+def get_history():
+    global _history, _history_month, _history_loaded_at
+    this_month = date.today().replace(day=1)
+    loaded_at = _history_loaded_at
+    if (loaded_at is None or _history_month != this_month
+            or (REVENUE_FORECAST_TTL and time.monotonic() - loaded_at > REVENUE_FORECAST_TTL)):
+        with _lock:
+            if _history_loaded_at == loaded_at:
+                loaded, history = load_history()
+                # An empty history is cached too; a database error is retried next read
+                if loaded:
+                    _history = history
+                    _history_month = this_month
+                    _history_loaded_at = time.monotonic()
+                    _forecasts.clear()
+    return _history
+
+def invalidate():
+    global _history, _history_loaded_at
+    with _lock:
+        _history = None
+        _history_loaded_at = None
+        _forecasts.clear()
+
+def forecast(months, growth_rate=None, seasonal_factor="none"):
+    """Cached forecast for the given parameters, or None without history"""
+    history = get_history()
+    if history is None:
+        return None
+    key = (months, growth_rate, seasonal_factor)
+    with _lock:
+        if history is _history and key in _forecasts:
+            _forecasts.move_to_end(key)
+            return _forecasts[key]
+
+    result = project(history, months, growth_rate, seasonal_factor)
+
+    with _lock:
+        if history is _history:
+            _forecasts[key] = result
+            while len(_forecasts) > MAX_CACHED_FORECASTS:
+                _forecasts.popitem(last=False)
+    return result
+
+def stats():
+    history = _history
+    return {
+        "loaded": history is not None,
+        "months": history.month_count if history else 0,
+        "fare_types": len(history.fare_type_ids) if history else 0,
+        "cached_forecasts": len(_forecasts),
+        "age_seconds": history.age() if history else None
+    }
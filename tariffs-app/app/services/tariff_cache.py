@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+
+from app.database import threadpool
+from app.database.config import execute_query
+from app.monitoring.logs import get_logger
+
+logger = get_logger("tariff_cache")
+
+# Seconds before a snapshot is reloaded even without an invalidation.
+# Admin writes refresh this process immediately; the TTL bounds how stale
+# other worker processes can get. 0 disables expiry. Reloads triggered by a
+# read run in the background; the read gets the current snapshot.
+TARIFF_CACHE_TTL = float(os.getenv("TARIFF_CACHE_TTL", "300"))
+
+TARIFF_QUERY = """
+    SELECT ft.*, t.tariff_id, t.base_price, t.discount_rate
+    FROM fare_type ft
+    LEFT JOIN tariff t ON ft.fare_type_id = t.fare_type_id
+    ORDER BY ft.fare_type_id, t.tariff_id
+"""
+
+class TariffSnapshot:
+    """Immutable view of fare_type joined to its tariff, keyed by fare_type_id"""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.fare_types = {}
+        for row in rows:
+            # A fare type normally has one tariff; keep the first like the old queries did
+            self.fare_types.setdefault(row["fare_type_id"], dict(row))
+
+    def get(self, fare_type_id):
+        return self.fare_types.get(fare_type_id)
+
+    def all(self):
+        return list(self.fare_types.values())
+
+    def age(self):
+        return time.monotonic() - self.loaded_at
+
+_lock = threading.Lock()
+_snapshot = None
+_stale = True
+_version = 0
+_invalidations = 0
+_loads = 0
+_published_load = 0
+_pending = None
+
+def refresh():
+    """Reload tariffs from the database and publish them as a new snapshot version.
+
+    The query runs outside ``_lock``; only the swap is done under it, so
+    readers never wait for the database.
+    """
+    global _snapshot, _stale, _version, _loads, _published_load
+    with _lock:
+        _loads += 1
+        load = _loads
+        seen = _invalidations
+    rows = execute_query(TARIFF_QUERY)
+    with _lock:
+        if rows is None:
+            # Keep serving the previous snapshot if the database is unavailable
+            logger.error("Could not load tariffs; keeping previous snapshot")
+            return _snapshot
+        if load < _published_load:
+            # A load that started later has already been published
+            return _snapshot
+        _version += 1
+        _published_load = load
+        _snapshot = TariffSnapshot(_version, rows)
+        # An invalidation that raced with the load must trigger another one
+        _stale = _invalidations != seen
+        return _snapshot
+
+def _refresh_quietly():
+    try:
+        refresh()
+    except Exception as e:
+        logger.error(f"Background tariff refresh failed: {e}")
+
+def refresh_in_background():
+    """Start a refresh on the database worker pool unless one is already running"""
+    global _pending
+    with _lock:
+        if _pending is None or _pending.done():
+            _pending = threadpool.get_executor().submit(_refresh_quietly)
+        return _pending
+
+def wait_for_refresh(timeout=5.0):
+    """Block until a background refresh has finished (for tests)"""
+    pending = _pending
+    if pending is not None:
+        pending.result(timeout)
+
+def invalidate():
+    """Mark the current snapshot stale so the next read reloads it"""
+    global _stale, _invalidations
+    _invalidations += 1
+    _stale = True
+
+def get_snapshot():
+    """Current snapshot; a stale or expired one is served while a background refresh replaces it"""
+    snapshot = _snapshot
+    if snapshot is None:
+        # Nothing to serve yet (the startup load failed), so load in the caller
+        return refresh()
+    if _stale or (TARIFF_CACHE_TTL and snapshot.age() > TARIFF_CACHE_TTL):
+        refresh_in_background()
+    return snapshot
+
+def get_fare_type(fare_type_id):
+    """Fare type row with base_price/discount_rate, or None if unknown"""
+    snapshot = get_snapshot()
+    return snapshot.get(fare_type_id) if snapshot else None
+
+def list_fare_types():
+    snapshot = get_snapshot()
+    return snapshot.all() if snapshot else []
+
+def stats():
+    snapshot = _snapshot
+    return {
+        "version": snapshot.version if snapshot else 0,
+        "fare_types": len(snapshot.fare_types) if snapshot else 0,
+        "age_seconds": snapshot.age() if snapshot else None,
+        "stale": _stale,
+        "refreshing": _pending is not None and not _pending.done(),
+        "ttl": TARIFF_CACHE_TTL
+    }
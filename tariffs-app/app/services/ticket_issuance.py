@@ -0,0 +1,179 @@
+from datetime import date
+
+from app.database.config import transaction
+from app.services import fare_usage_rollup, dashboard_metrics
+
+# Both lookups in one round trip; each column is NULL when the row is missing
+LOOKUP_QUERY = """
+    SELECT
+        (SELECT passenger_full_name FROM passenger WHERE passenger_id = %s) AS passenger_full_name,
+        (SELECT type_name FROM fare_type WHERE fare_type_id = %s) AS type_name
+"""
+
+TICKET_INSERT = """
+    INSERT INTO ticket (purchase_date, price, passenger_id, fare_type_id)
+    VALUES (%s, %s, %s, %s)
+"""
+
+FARE_CALCULATION_INSERT = """
+    INSERT INTO fare_calculation (ticket_id, base_fare, discount, final_fare)
+    VALUES (%s, %s, %s, %s)
+"""
+
+PAYMENT_INSERT = """
+    INSERT INTO payment_confirmation (ticket_id, status, payment_method, transaction_ref)
+    VALUES (%s, %s, %s, %s)
+"""
+
+# Largest batch accepted in one request; keeps the transaction and its INSERTs bounded
+MAX_BATCH_SIZE = 500
+
+class TicketIssuanceError(Exception):
+    """A ticket could not be issued; carries the HTTP status to report"""
+
+    def __init__(self, detail, status_code=500):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+def make_transaction_ref(purchase_date, ticket_id):
+    return f"TXN{purchase_date.strftime('%Y%m%d')}-{ticket_id}"
+
+def issue_ticket(passenger_id, fare_type_id, base_fare, discount, final_fare, payment_method):
+    """Issue one ticket in a single transaction on a single connection.
+
+    Writes the ticket, its fare calculation and the payment confirmation and
+    returns the receipt built from the values already in hand, so nothing is
+    read back after the inserts.
+    """
+    purchase_date = date.today()
+
+    with transaction() as cursor:
+        cursor.execute(LOOKUP_QUERY, (passenger_id, fare_type_id))
+        names = cursor.fetchone()
+
+        if not names or names["passenger_full_name"] is None:
+            raise TicketIssuanceError("Passenger not found", status_code=404)
+        if names["type_name"] is None:
+            raise TicketIssuanceError("Fare type not found", status_code=404)
+
+        cursor.execute(TICKET_INSERT, (purchase_date, final_fare, passenger_id, fare_type_id))
+        ticket_id = cursor.lastrowid
+        if not ticket_id:
+            raise TicketIssuanceError("Could not retrieve ticket ID")
+
+        transaction_ref = make_transaction_ref(purchase_date, ticket_id)
+        cursor.execute(FARE_CALCULATION_INSERT, (ticket_id, base_fare, discount, final_fare))
+        cursor.execute(PAYMENT_INSERT, (ticket_id, "Confirmed", payment_method, transaction_ref))
+        fare_usage_rollup.record_tickets(cursor, [(purchase_date, fare_type_id, final_fare)])
+
+    ticket = {
+        "ticket_id": ticket_id,
+        "purchase_date": purchase_date,
+        "price": final_fare,
+        "passenger_id": passenger_id,
+        "fare_type_id": fare_type_id,
+        "passenger_full_name": names["passenger_full_name"],
+        "type_name": names["type_name"],
+        "base_fare": base_fare,
+        "discount": discount,
+        "final_fare": final_fare,
+        "payment_method": payment_method,
+        "transaction_ref": transaction_ref
+    }
+    dashboard_metrics.ticket_issued(ticket)
+    return ticket
+
+def issue_ticket_batch(items):
+    """Issue many tickets in one transaction.
+
+    ``items`` are dicts (or models) with passenger_id, fare_type_id, base_fare,
+    discount, final_fare and payment_method. Items referencing an unknown
+    passenger or fare type are reported as errors and skipped; the rest are
+    written one ticket INSERT each (for their ids) and one batched INSERT for
+    the fare calculations and payments. Returns one result dict per item, in
+    input order.
+    """
+    items = [item if isinstance(item, dict) else item.model_dump() for item in items]
+    if len(items) > MAX_BATCH_SIZE:
+        raise TicketIssuanceError(
+            f"Batch too large: {len(items)} items (maximum {MAX_BATCH_SIZE})", status_code=413
+        )
+
+    results = [{"index": index, "status": "pending"} for index in range(len(items))]
+    if not items:
+        return results
+
+    purchase_date = date.today()
+    passenger_ids = sorted({item["passenger_id"] for item in items})
+    fare_type_ids = sorted({item["fare_type_id"] for item in items})
+
+    with transaction() as cursor:
+        # Passenger and fare type names for the whole batch in one round trip
+        cursor.execute(f"""
+            SELECT 'passenger' AS kind, passenger_id AS id, passenger_full_name AS name
+            FROM passenger WHERE passenger_id IN ({", ".join(["%s"] * len(passenger_ids))})
+            UNION ALL
+            SELECT 'fare_type' AS kind, fare_type_id AS id, type_name AS name
+            FROM fare_type WHERE fare_type_id IN ({", ".join(["%s"] * len(fare_type_ids))})
+        """, tuple(passenger_ids) + tuple(fare_type_ids))
+        names = {(row["kind"], row["id"]): row["name"] for row in cursor.fetchall()}
+
+        valid = []
+        for index, item in enumerate(items):
+            if ("passenger", item["passenger_id"]) not in names:
+                results[index] = {"index": index, "status": "error", "error": "Passenger not found"}
+            elif ("fare_type", item["fare_type_id"]) not in names:
+                results[index] = {"index": index, "status": "error", "error": "Fare type not found"}
+            else:
+                valid.append(index)
+
+        if not valid:
+            return results
+
+        # One INSERT per ticket: neither MySQL (innodb_autoinc_lock_mode=2
+        # interleaves concurrent inserts) nor SQLite (reports the last id)
+        # gives a usable id range for a multi-row INSERT
+        ticket_ids = []
+        for index in valid:
+            item = items[index]
+            cursor.execute(TICKET_INSERT, (purchase_date, item["final_fare"], item["passenger_id"], item["fare_type_id"]))
+            if not cursor.lastrowid:
+                raise TicketIssuanceError("Could not retrieve ticket IDs")
+            ticket_ids.append(cursor.lastrowid)
+
+        calculation_rows = []
+        payment_rows = []
+        for index, ticket_id in zip(valid, ticket_ids):
+            item = items[index]
+            transaction_ref = make_transaction_ref(purchase_date, ticket_id)
+            calculation_rows.append((ticket_id, item["base_fare"], item["discount"], item["final_fare"]))
+            payment_rows.append((ticket_id, "Confirmed", item["payment_method"], transaction_ref))
+            results[index] = {
+                "index": index,
+                "status": "issued",
+                "ticket": {
+                    "ticket_id": ticket_id,
+                    "purchase_date": purchase_date,
+                    "price": item["final_fare"],
+                    "passenger_id": item["passenger_id"],
+                    "fare_type_id": item["fare_type_id"],
+                    "passenger_full_name": names[("passenger", item["passenger_id"])],
+                    "type_name": names[("fare_type", item["fare_type_id"])],
+                    "base_fare": item["base_fare"],
+                    "discount": item["discount"],
+                    "final_fare": item["final_fare"],
+                    "payment_method": item["payment_method"],
+                    "transaction_ref": transaction_ref
+                }
+            }
+
+        cursor.executemany(FARE_CALCULATION_INSERT, calculation_rows)
+        cursor.executemany(PAYMENT_INSERT, payment_rows)
+        fare_usage_rollup.record_tickets(
+            cursor, [(purchase_date, items[index]["fare_type_id"], items[index]["final_fare"]) for index in valid]
+        )
+
+    for index in valid:
+        dashboard_metrics.ticket_issued(results[index]["ticket"])
+    return results
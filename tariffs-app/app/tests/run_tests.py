@@ -7,9 +7,27 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 
 # Import test modules
 from app.tests.test_passenger_router import TestPassengerRegistrationOperations, TestExemptionApplicationOperations
-from app.tests.test_admin_router import TestFareTypeOperations, TestExemptionOperations
-from app.tests.test_ticketing_router import TestFareCalculationOperations, TestTicketOperations
+from app.tests.test_admin_router import (
+    TestFareTypeOperations,
+    TestExemptionOperations,
+    TestTariffCacheOperations,
+    TestDashboardMetrics,
+    TestReportExport,
+    TestRevenueForecast,
+    TestFareUsageRollup,
+    TestPassengerActivity,
+    TestPassengerExemptionsReport,
+    TestExemptionApplicationProcessing,
+    TestApplicationQueue,
+)
+from app.tests.test_ticketing_router import TestFareCalculationOperations, TestTicketOperations, TestTicketIssuanceService, TestPassengerDirectory
 from app.tests.test_document_operations import TestDocumentStorageOperations
+from app.tests.test_connection_pool import TestConnectionPool, TestAsyncDatabase, TestDatabaseThreadPool, TestStatementCache
+from app.tests.test_migrations import TestMigrations
+from app.tests.test_fare_engine import TestFareEngine
+from app.tests.test_exemption_index import TestExemptionIndex
+from app.tests.test_monitoring import TestQueryLogging, TestQueryBudget, TestMetrics, TestSlowQueries
+from app.tests.test_sqlite_backend import TestSQLiteDialect, TestSQLiteIntegration
 
 def run_tests():
     """Run all tests for the tariffs and exemptions system."""
@@ -26,14 +44,44 @@ def run_tests():
     # Add admin router tests
     test_suite.addTest(loader.loadTestsFromTestCase(TestFareTypeOperations))
     test_suite.addTest(loader.loadTestsFromTestCase(TestExemptionOperations))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestTariffCacheOperations))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestDashboardMetrics))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestReportExport))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestRevenueForecast))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestFareUsageRollup))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestPassengerActivity))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestPassengerExemptionsReport))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestExemptionApplicationProcessing))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestApplicationQueue))
     
     # Add ticketing router tests
     test_suite.addTest(loader.loadTestsFromTestCase(TestFareCalculationOperations))
     test_suite.addTest(loader.loadTestsFromTestCase(TestTicketOperations))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestTicketIssuanceService))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestPassengerDirectory))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestFareEngine))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestExemptionIndex))
     
     # Add document operation tests
     test_suite.addTest(loader.loadTestsFromTestCase(TestDocumentStorageOperations))
     
+    # Add database layer tests
+    test_suite.addTest(loader.loadTestsFromTestCase(TestConnectionPool))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestAsyncDatabase))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestDatabaseThreadPool))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestStatementCache))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestMigrations))
+    
+    # Add monitoring tests
+    test_suite.addTest(loader.loadTestsFromTestCase(TestQueryLogging))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestQueryBudget))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestMetrics))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestSlowQueries))
+    
+    # Add SQLite backend tests
+    test_suite.addTest(loader.loadTestsFromTestCase(TestSQLiteDialect))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestSQLiteIntegration))
+    
     # Run the tests
     runner = unittest.TextTestRunner(verbosity=2)
     result = runner.run(test_suite)
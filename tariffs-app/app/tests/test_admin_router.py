@@ -1,6 +1,8 @@
 import unittest
 from unittest.mock import patch, MagicMock
+from contextlib import contextmanager
 from datetime import date, timedelta, datetime
+import asyncio
 import logging
 import re
 
@@ -664,6 +666,778 @@ class TestExemptionOperations(unittest.TestCase):
         
         self.validate_report()
 
+class TestTariffCacheOperations(unittest.TestCase):
+    def setUp(self):
+        self.mock_execute_query_patcher = patch('app.services.tariff_cache.execute_query')
+        self.mock_execute_query = self.mock_execute_query_patcher.start()
+        
+        from app.services import tariff_cache
+        self.tariff_cache = tariff_cache
+        self.tariff_cache._snapshot = None
+        self.tariff_cache._stale = True
+        
+        self.tariff_rows = [
+            {"fare_type_id": 1, "type_name": "Adult", "tariff_id": 1, "base_price": 3.00, "discount_rate": 0.00},
+            {"fare_type_id": 2, "type_name": "Student", "tariff_id": 2, "base_price": 3.00, "discount_rate": 50.00}
+        ]
+        self.mock_execute_query.return_value = self.tariff_rows
+
+    def tearDown(self):
+        self.tariff_cache.wait_for_refresh()
+        self.mock_execute_query_patcher.stop()
+        self.tariff_cache._snapshot = None
+        self.tariff_cache._stale = True
+
+    def test_quotes_are_served_from_snapshot(self):
+        self.tariff_cache.refresh()
+        self.mock_execute_query.reset_mock()
+        
+        fare = self.tariff_cache.get_fare_type(2)
+        fare_types = self.tariff_cache.list_fare_types()
+        
+        self.mock_execute_query.assert_not_called()
+        self.assertEqual(fare["type_name"], "Student")
+        self.assertEqual(fare["discount_rate"], 50.00)
+        self.assertEqual([row["fare_type_id"] for row in fare_types], [1, 2])
+        self.assertIsNone(self.tariff_cache.get_fare_type(99))
+
+    def test_refresh_publishes_new_version(self):
+        first = self.tariff_cache.refresh()
+        
+        self.mock_execute_query.return_value = self.tariff_rows + [
+            {"fare_type_id": 5, "type_name": "Night", "tariff_id": 5, "base_price": 4.00, "discount_rate": 0.00}
+        ]
+        second = self.tariff_cache.refresh()
+        
+        self.assertEqual(second.version, first.version + 1)
+        self.assertIsNotNone(self.tariff_cache.get_fare_type(5))
+        self.assertIsNone(first.get(5))
+
+    def test_invalidate_reloads_in_background(self):
+        first = self.tariff_cache.refresh()
+        self.tariff_cache.invalidate()
+        self.mock_execute_query.reset_mock()
+        self.mock_execute_query.return_value = [dict(self.tariff_rows[0], base_price=3.50)]
+        
+        # The read is answered from the current snapshot while the reload runs
+        self.assertEqual(self.tariff_cache.get_fare_type(1)["base_price"], 3.00)
+        self.tariff_cache.wait_for_refresh()
+        
+        self.mock_execute_query.assert_called_once()
+        self.assertEqual(self.tariff_cache.get_snapshot().version, first.version + 1)
+        self.assertEqual(self.tariff_cache.get_fare_type(1)["base_price"], 3.50)
+
+    def test_refresh_queries_outside_lock(self):
+        lock_held = []
+        
+        def load(query):
+            lock_held.append(self.tariff_cache._lock.locked())
+            return self.tariff_rows
+        
+        self.mock_execute_query.side_effect = load
+        self.tariff_cache.refresh()
+        
+        self.assertEqual(lock_held, [False])
+
+    def test_expired_snapshot_is_served_while_reloading(self):
+        snapshot = self.tariff_cache.refresh()
+        snapshot.loaded_at -= self.tariff_cache.TARIFF_CACHE_TTL + 1
+        
+        self.assertIs(self.tariff_cache.get_snapshot(), snapshot)
+        self.tariff_cache.wait_for_refresh()
+        
+        self.assertIsNot(self.tariff_cache.get_snapshot(), snapshot)
+
+    def test_failed_reload_keeps_previous_snapshot(self):
+        first = self.tariff_cache.refresh()
+        self.mock_execute_query.return_value = None
+        
+        snapshot = self.tariff_cache.refresh()
+        
+        self.assertIs(snapshot, first)
+        self.assertEqual(self.tariff_cache.get_fare_type(1)["type_name"], "Adult")
+
+class TestDashboardMetrics(unittest.TestCase):
+    def setUp(self):
+        self.mock_execute_query_patcher = patch('app.services.dashboard_metrics.execute_query')
+        self.mock_execute_query = self.mock_execute_query_patcher.start()
+        
+        from app.services import dashboard_metrics
+        self.dashboard_metrics = dashboard_metrics
+        self.dashboard_metrics._metrics = None
+        self.dashboard_metrics._stale = True
+        
+        self.recent_tickets = [
+            {"ticket_id": 10, "purchase_date": date.today(), "price": 3.00,
+             "passenger_full_name": "John Doe", "type_name": "Adult"}
+        ]
+        self.mock_execute_query.side_effect = [
+            [{"count": 4}],
+            [{"status": "Submitted", "count": 2}, {"status": "Approved", "count": 5}],
+            self.recent_tickets
+        ]
+
+    def tearDown(self):
+        self.mock_execute_query_patcher.stop()
+        self.dashboard_metrics._metrics = None
+        self.dashboard_metrics._stale = True
+
+    def test_snapshot_is_reused_between_reads(self):
+        first = self.dashboard_metrics.get_metrics()
+        second = self.dashboard_metrics.get_metrics()
+        
+        self.assertIs(first, second)
+        self.assertEqual(self.mock_execute_query.call_count, 3)
+        context = first.as_context()
+        self.assertEqual(context["fare_types_count"], 4)
+        self.assertIn({"status": "Approved", "count": 5}, context["exemption_stats"])
+        self.assertEqual(context["recent_tickets"][0]["ticket_id"], 10)
+
+    def test_write_paths_adjust_counters(self):
+        self.dashboard_metrics.get_metrics()
+        
+        self.dashboard_metrics.fare_type_created()
+        self.dashboard_metrics.application_submitted()
+        self.dashboard_metrics.application_status_changed("Submitted", "Rejected")
+        self.dashboard_metrics.ticket_issued({"ticket_id": 11, "type_name": "Student"})
+        
+        metrics = self.dashboard_metrics.get_metrics()
+        self.assertEqual(self.mock_execute_query.call_count, 3)
+        self.assertEqual(metrics.fare_types_count, 5)
+        self.assertEqual(metrics.status_counts, {"Submitted": 2, "Approved": 5, "Rejected": 1})
+        self.assertEqual([t["ticket_id"] for t in metrics.recent_tickets], [11, 10])
+
+    def test_recent_tickets_are_capped(self):
+        self.dashboard_metrics.get_metrics()
+        for ticket_id in range(20, 30):
+            self.dashboard_metrics.ticket_issued({"ticket_id": ticket_id})
+        
+        metrics = self.dashboard_metrics.get_metrics()
+        self.assertEqual(len(metrics.recent_tickets), self.dashboard_metrics.RECENT_TICKETS_LIMIT)
+        self.assertEqual(metrics.recent_tickets[0]["ticket_id"], 29)
+
+    def test_invalidate_reloads_on_next_read(self):
+        self.dashboard_metrics.get_metrics()
+        self.dashboard_metrics.invalidate()
+        self.mock_execute_query.side_effect = [[{"count": 3}], [], []]
+        
+        metrics = self.dashboard_metrics.get_metrics()
+        
+        self.assertEqual(metrics.fare_types_count, 3)
+        self.assertEqual(metrics.as_context()["exemption_stats"], [])
+        logger.info(f"Dashboard metrics reloaded: {self.dashboard_metrics.stats()}")
+
+    def test_reload_runs_outside_lock_and_keeps_racing_writes(self):
+        self.dashboard_metrics.get_metrics()
+        self.dashboard_metrics.invalidate()
+        lock_held = []
+        
+        def load(query):
+            lock_held.append(self.dashboard_metrics._lock.locked())
+            if "LIMIT" in query:
+                # A sale and an invalidation land while the reload is reading
+                self.dashboard_metrics.ticket_issued({"ticket_id": 12, "type_name": "Adult"})
+                self.dashboard_metrics.ticket_issued({"ticket_id": 10, "type_name": "Adult"})
+                self.dashboard_metrics.invalidate()
+                return self.recent_tickets
+            return [{"count": 4}] if "fare_type" in query else []
+        
+        self.mock_execute_query.side_effect = load
+        metrics = self.dashboard_metrics.get_metrics()
+        
+        self.assertEqual(lock_held, [False, False, False])
+        self.assertEqual([t["ticket_id"] for t in metrics.recent_tickets], [12, 10])
+        self.assertTrue(self.dashboard_metrics.stats()["stale"])
+        self.assertEqual(self.dashboard_metrics._replay, [])
+
+class TestReportExport(unittest.TestCase):
+    def setUp(self):
+        self.mock_get_db_connection_patcher = patch('app.database.config.get_db_connection')
+        self.mock_get_db_connection = self.mock_get_db_connection_patcher.start()
+        
+        self.mock_get_pool_patcher = patch('app.database.config.get_pool')
+        self.mock_get_pool = self.mock_get_pool_patcher.start()
+        
+        self.mock_conn = MagicMock()
+        self.mock_cursor = MagicMock()
+        self.mock_conn.cursor.return_value = self.mock_cursor
+        self.mock_get_db_connection.return_value = self.mock_conn
+        
+        self.rows = [
+            {"date": date(2024, 1, day), "fare_type": "Adult", "tickets_sold": day, "total_revenue": 3.00 * day}
+            for day in range(1, 8)
+        ]
+        self.mock_cursor.fetchmany.side_effect = [self.rows[:3], self.rows[3:6], self.rows[6:], []]
+
+    def tearDown(self):
+        self.mock_get_db_connection_patcher.stop()
+        self.mock_get_pool_patcher.stop()
+
+    def test_stream_query_fetches_in_batches(self):
+        from app.database.config import stream_query
+        
+        rows = list(stream_query("SELECT * FROM daily_fare_usage", batch_size=3))
+        
+        self.assertEqual(rows, self.rows)
+        self.mock_conn.cursor.assert_called_once_with(dictionary=True, buffered=False)
+        self.mock_cursor.fetchmany.assert_called_with(3)
+        self.mock_cursor.fetchall.assert_not_called()
+        self.mock_get_pool.return_value.release.assert_called_once_with(self.mock_conn, discard=False)
+
+    def test_abandoned_stream_discards_connection(self):
+        from app.database.config import stream_query
+        
+        stream = stream_query("SELECT * FROM ticket", batch_size=3)
+        next(stream)
+        stream.close()
+        
+        self.mock_get_pool.return_value.release.assert_called_once_with(self.mock_conn, discard=True)
+
+    def test_csv_export(self):
+        from app.services import report_export
+        
+        with patch.object(report_export, 'ROWS_PER_CHUNK', 2):
+            chunks = list(report_export.fare_usage_export("2024-01-01", "2024-01-07", "csv"))
+        
+        lines = "".join(chunks).splitlines()
+        self.assertEqual(lines[0], "date,fare_type,tickets_sold,total_revenue")
+        self.assertEqual(lines[1], "2024-01-01,Adult,1,3.0")
+        self.assertEqual(len(lines), 8)
+        self.assertGreater(len(chunks), 2)
+        params = self.mock_cursor.execute.call_args[0][1]
+        self.assertEqual(params, ("2024-01-01", "2024-01-07"))
+
+    def test_ndjson_export(self):
+        from app.services import report_export
+        import json
+        
+        body = "".join(report_export.fare_usage_export("2024-01-01", "2024-01-07", "ndjson"))
+        
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(records), 7)
+        self.assertEqual(records[0], {"date": "2024-01-01", "fare_type": "Adult", "tickets_sold": 1, "total_revenue": 3.0})
+        logger.info(f"Exported {len(records)} NDJSON records")
+
+    def collect(self, response):
+        async def read():
+            chunks = [chunk async for chunk in response.body_iterator]
+            await response.background()
+            return chunks
+        return asyncio.run(read())
+
+    def test_export_route_streams_through_worker_pool(self):
+        from app.routers import admin_router
+        from app.services import report_export
+        
+        with patch('app.services.report_export.run_sync', wraps=report_export.run_sync) as mock_run_sync:
+            response = asyncio.run(admin_router.export_fare_usage_report("2024-01-01", "2024-01-07", "csv"))
+            body = "".join(self.collect(response))
+        
+        self.assertEqual(len(body.splitlines()), 8)
+        self.assertGreater(mock_run_sync.call_count, 1)
+        self.assertEqual(report_export._slots._value, report_export.EXPORT_MAX_CONCURRENT)
+        self.mock_get_pool.return_value.release.assert_called_once_with(self.mock_conn, discard=False)
+
+    def test_exports_are_capped(self):
+        from app.routers import admin_router
+        from app.services import report_export
+        from fastapi import HTTPException
+        
+        slots = [report_export.acquire_slot() for _ in range(report_export.EXPORT_MAX_CONCURRENT)]
+        try:
+            with self.assertRaises(HTTPException) as ctx:
+                asyncio.run(admin_router.export_exemption_applications("week", "csv"))
+            self.assertEqual(ctx.exception.status_code, 503)
+        finally:
+            for slot in slots:
+                slot.release()
+                slot.release()
+        
+        self.assertEqual(report_export._slots._value, report_export.EXPORT_MAX_CONCURRENT)
+
+    def test_abandoned_export_frees_slot_and_connection(self):
+        from app.services import report_export
+        
+        async def read_one():
+            stream = report_export.iterate(
+                report_export.fare_usage_export("2024-01-01", "2024-01-07", "ndjson"), report_export.acquire_slot()
+            )
+            with patch.object(report_export, 'ROWS_PER_CHUNK', 1):
+                await stream.__anext__()
+            await stream.aclose()
+        
+        asyncio.run(read_one())
+        
+        self.assertEqual(report_export._slots._value, report_export.EXPORT_MAX_CONCURRENT)
+        self.mock_get_pool.return_value.release.assert_called_once_with(self.mock_conn, discard=True)
+
+class TestRevenueForecast(unittest.TestCase):
+    def setUp(self):
+        self.mock_execute_query_patcher = patch('app.services.revenue_forecast.execute_query')
+        self.mock_execute_query = self.mock_execute_query_patcher.start()
+        
+        from app.services import revenue_forecast
+        self.revenue_forecast = revenue_forecast
+        self.revenue_forecast.invalidate()
+        
+        # Two years of history growing 2% a month, with a December peak
+        self.rows = []
+        for offset in range(24):
+            year, month = 2022 + offset // 12, offset % 12 + 1
+            season = 1.5 if month == 12 else 1.0
+            for fare_type_id, type_name, base in [(1, "Adult", 1000.0), (2, "Student", 250.0)]:
+                revenue = base * 1.02 ** offset * season
+                self.rows.append({
+                    "year": year, "month": month, "fare_type_id": fare_type_id, "type_name": type_name,
+                    "tickets_sold": revenue / 2.5, "revenue": revenue
+                })
+        self.mock_execute_query.return_value = self.rows
+
+    def tearDown(self):
+        self.mock_execute_query_patcher.stop()
+        self.revenue_forecast.invalidate()
+
+    def test_fitted_growth_ignores_seasonality(self):
+        history = self.revenue_forecast.MonthlyHistory.from_rows(self.rows)
+        
+        growth, indices = self.revenue_forecast.fit_trend(history.revenue.sum(axis=0), history.first_month)
+        
+        self.assertAlmostEqual(growth, 0.02, places=6)
+        self.assertAlmostEqual(indices[11] / indices[0], 1.5, places=6)
+
+    def test_projection_shape_and_values(self):
+        history = self.revenue_forecast.MonthlyHistory.from_rows(self.rows)
+        
+        result = self.revenue_forecast.project(history, 3, growth_rate=0.0, seasonal_factor="none")
+        
+        self.assertEqual([row["month"] for row in result["forecast_data"]],
+                         ["January 2024", "February 2024", "March 2024"])
+        self.assertEqual(result["base_period"], "December 2023")
+        self.assertEqual(result["historical_start"], "January 2022")
+        self.assertEqual([fare["type_name"] for fare in result["fare_projections"]], ["Adult", "Student"])
+        self.assertAlmostEqual(result["total_revenue"], sum(row["revenue"] for row in result["forecast_data"]))
+        # Flat growth and no seasonality: every month sits at the base level
+        revenues = [row["revenue"] for row in result["forecast_data"]]
+        self.assertAlmostEqual(revenues[0], revenues[2])
+
+    def test_seasonality_scales_peak_month(self):
+        history = self.revenue_forecast.MonthlyHistory.from_rows(self.rows)
+        
+        strong = self.revenue_forecast.project(history, 12, growth_rate=0.0, seasonal_factor="strong")
+        
+        revenues = [row["revenue"] for row in strong["forecast_data"]]
+        self.assertAlmostEqual(revenues[11] / revenues[10], 1.5, places=6)
+
+    def test_forecasts_are_cached_per_parameters(self):
+        first = self.revenue_forecast.forecast(6, None, "moderate")
+        second = self.revenue_forecast.forecast(6, None, "moderate")
+        self.revenue_forecast.forecast(12, None, "moderate")
+        
+        self.assertIs(first, second)
+        self.assertEqual(self.mock_execute_query.call_count, 1)
+        self.assertEqual(self.revenue_forecast.stats()["cached_forecasts"], 2)
+        logger.info(f"Fitted growth rate: {first['growth_rate']}%")
+
+    def test_no_history(self):
+        self.mock_execute_query.return_value = []
+        
+        self.assertIsNone(self.revenue_forecast.forecast(6))
+        # The empty result is cached for the TTL like any other history
+        self.assertIsNone(self.revenue_forecast.forecast(3))
+        self.assertEqual(self.mock_execute_query.call_count, 1)
+
+    def test_database_error_is_not_cached(self):
+        self.mock_execute_query.return_value = None
+        self.assertIsNone(self.revenue_forecast.forecast(6))
+        
+        self.mock_execute_query.return_value = self.rows
+        self.assertIsNotNone(self.revenue_forecast.forecast(6))
+        self.assertEqual(self.mock_execute_query.call_count, 2)
+
+    def test_blank_growth_rate_fits_from_history(self):
+        from app.routers import admin_router
+        
+        with patch('app.routers.admin_router.templates') as mock_templates:
+            asyncio.run(admin_router.revenue_forecast_report(MagicMock(), months=6, growth_rate="",
+                                                             seasonal_factor="none"))
+            asyncio.run(admin_router.revenue_forecast_report(MagicMock(), months=6, growth_rate="1.5",
+                                                             seasonal_factor="none"))
+        
+        fitted = mock_templates.TemplateResponse.call_args_list[0][0][1]
+        given = mock_templates.TemplateResponse.call_args_list[1][0][1]
+        self.assertAlmostEqual(fitted["growth_rate"], 2.0, places=2)
+        self.assertEqual(given["growth_rate"], 1.5)
+
+class TestFareUsageRollup(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        
+        @contextmanager
+        def fake_transaction():
+            yield self.mock_cursor
+        
+        self.mock_transaction_patcher = patch('app.services.fare_usage_rollup.transaction', fake_transaction)
+        self.mock_transaction_patcher.start()
+        
+        from app.services import fare_usage_rollup
+        self.fare_usage_rollup = fare_usage_rollup
+
+    def tearDown(self):
+        self.mock_transaction_patcher.stop()
+
+    def test_record_tickets_upserts_one_row_per_date_and_fare(self):
+        day = date(2024, 3, 1)
+        self.fare_usage_rollup.record_tickets(self.mock_cursor, [
+            (day, 2, 1.50), (day, 1, 3.00), (day, 2, 1.25), (day, 1, 3.00)
+        ])
+        
+        self.mock_cursor.execute.assert_called_once()
+        sql, params = self.mock_cursor.execute.call_args[0]
+        sql = normalize_sql(sql)
+        self.assertTrue(sql.startswith("INSERT INTO daily_fare_usage"))
+        self.assertEqual(sql.count("(%s, %s, %s, %s)"), 2)
+        self.assertIn("ON DUPLICATE KEY UPDATE tickets_sold = tickets_sold + VALUES(tickets_sold)", sql)
+        # Sorted by (date, fare type), the same lock order for every transaction
+        self.assertEqual(params, (day, 1, 2, 6.00, day, 2, 2, 2.75))
+
+    def test_record_tickets_without_tickets_does_nothing(self):
+        self.fare_usage_rollup.record_tickets(self.mock_cursor, [])
+        
+        self.mock_cursor.execute.assert_not_called()
+
+    def test_rebuild_replaces_range_from_ticket(self):
+        self.mock_cursor.rowcount = 6
+        
+        rows = self.fare_usage_rollup.rebuild(date(2024, 3, 1), date(2024, 3, 3))
+        
+        self.assertEqual(rows, 6)
+        delete_call, insert_call = self.mock_cursor.execute.call_args_list
+        self.assertTrue(normalize_sql(delete_call[0][0]).startswith("DELETE FROM daily_fare_usage"))
+        self.assertIn("FROM ticket", normalize_sql(insert_call[0][0]))
+        self.assertEqual(insert_call[0][1], (date(2024, 3, 1), date(2024, 3, 3)))
+
+    def test_catch_up_leaves_today_to_issuance(self):
+        today = date.today()
+        with patch.object(self.fare_usage_rollup, 'rebuild', return_value=3) as mock_rebuild:
+            self.assertEqual(self.fare_usage_rollup.catch_up(2), 3)
+        
+        mock_rebuild.assert_called_once_with(today - timedelta(days=2), today - timedelta(days=1))
+
+    def test_cli_commands(self):
+        with patch.object(self.fare_usage_rollup, 'rebuild') as mock_rebuild, \
+                patch.object(self.fare_usage_rollup, 'catch_up') as mock_catch_up, \
+                patch.object(self.fare_usage_rollup, 'rebuild_all') as mock_rebuild_all, \
+                patch('app.monitoring.logs.configure'):
+            self.fare_usage_rollup.main(["catch-up", "--days", "5"])
+            self.fare_usage_rollup.main(["rebuild", "--start", "2024-01-01", "--end", "2024-01-31"])
+            self.fare_usage_rollup.main(["rebuild"])
+        
+        mock_catch_up.assert_called_once_with(5)
+        mock_rebuild.assert_called_once_with(date(2024, 1, 1), date(2024, 1, 31))
+        mock_rebuild_all.assert_called_once_with()
+
+class TestPassengerActivity(unittest.TestCase):
+    def setUp(self):
+        self.mock_execute_query_patcher = patch('app.services.passenger_activity.execute_query')
+        self.mock_execute_query = self.mock_execute_query_patcher.start()
+        
+        from app.services import passenger_activity
+        from app.services.hyperloglog import HyperLogLog
+        self.passenger_activity = passenger_activity
+        self.HyperLogLog = HyperLogLog
+
+    def tearDown(self):
+        self.mock_execute_query_patcher.stop()
+
+    def sketch(self, passenger_ids):
+        sketch = self.HyperLogLog()
+        sketch.update(passenger_ids)
+        return sketch.to_bytes()
+
+    def test_hyperloglog_estimates_and_merges(self):
+        first = self.HyperLogLog()
+        first.update(range(5000))
+        second = self.HyperLogLog.from_bytes(self.sketch(range(2500, 7500)))
+        
+        self.assertEqual(self.HyperLogLog().count(), 0)
+        self.assertAlmostEqual(first.count(), 5000, delta=250)
+        self.assertAlmostEqual(self.HyperLogLog.union([first, second]).count(), 7500, delta=375)
+
+    def test_activity_report_from_rollups(self):
+        day1, day2 = date(2024, 3, 1), date(2024, 3, 2)
+        self.mock_execute_query.side_effect = [
+            [
+                {"date": day1, "type_name": "Adult", "tickets_sold": 4, "revenue": 12.00},
+                {"date": day2, "type_name": "Adult", "tickets_sold": 2, "revenue": 6.00},
+                {"date": day2, "type_name": "Student", "tickets_sold": 3, "revenue": 4.50}
+            ],
+            [
+                {"date": day1, "type_name": "Adult", "first_time_passengers": 2, "passenger_sketch": self.sketch([1, 2, 3])},
+                {"date": day2, "type_name": "Adult", "first_time_passengers": 0, "passenger_sketch": self.sketch([1, 2])},
+                {"date": day2, "type_name": "Student", "first_time_passengers": 1, "passenger_sketch": self.sketch([4, 5])}
+            ],
+            [{"date": day1, "registrations": 2}]
+        ]
+        
+        report = self.passenger_activity.activity_report(day1, day2)
+        
+        self.assertEqual([entry["date"] for entry in report["activity_data"]], [day2, day1])
+        self.assertEqual(report["activity_data"][0]["unique_passengers"], 4)
+        self.assertEqual(report["activity_data"][1]["new_registrations"], 2)
+        self.assertEqual(report["total_tickets"], 9)
+        self.assertEqual(report["total_unique_passengers"], 5)
+        self.assertEqual(report["most_active_day"], day2)
+        adult = report["trend_data"][0]
+        self.assertEqual((adult["passenger_type"], adult["first_time"], adult["returning"]), ("Adult", 2, 1))
+        self.assertAlmostEqual(adult["avg_fare"], 3.00)
+        self.assertEqual(sum(t["count"] for t in report["passenger_types"]), 5)
+
+    def test_passenger_type_filter(self):
+        self.mock_execute_query.side_effect = [[], [], []]
+        
+        report = self.passenger_activity.activity_report("2024-03-01", "2024-03-31", "Student")
+        
+        usage_sql, usage_params = self.mock_execute_query.call_args_list[0][0]
+        self.assertIn("LOWER(ft.type_name) = %s", usage_sql)
+        self.assertEqual(usage_params, ("2024-03-01", "2024-03-31", "student"))
+        self.assertEqual(report["most_active_day"], "N/A")
+        logger.info(f"Empty activity report: {report}")
+
+    def test_rebuild_sets_first_rides_and_sketches(self):
+        day1, day2 = date(2024, 3, 1), date(2024, 3, 2)
+        cursor = MagicMock()
+        
+        @contextmanager
+        def fake_transaction():
+            yield cursor
+        
+        rows = [
+            # Passenger 1 rode before the range; 2 is new on day 1; 3 has no first_ticket_date yet
+            {"purchase_date": day1, "fare_type_id": 1, "passenger_id": 1, "first_ticket_date": date(2024, 1, 5)},
+            {"purchase_date": day1, "fare_type_id": 1, "passenger_id": 2, "first_ticket_date": day1},
+            {"purchase_date": day1, "fare_type_id": 2, "passenger_id": 2, "first_ticket_date": day1},
+            {"purchase_date": day2, "fare_type_id": 2, "passenger_id": 3, "first_ticket_date": None},
+            {"purchase_date": day2, "fare_type_id": 2, "passenger_id": 1, "first_ticket_date": date(2024, 1, 5)}
+        ]
+        with patch('app.services.passenger_activity.stream_query', return_value=iter(rows)), \
+                patch('app.services.passenger_activity.transaction', fake_transaction):
+            self.assertEqual(self.passenger_activity.rebuild(day1, day2), 3)
+        
+        calls = [(normalize_sql(args[0]), args[1]) for args, kwargs in cursor.execute.call_args_list]
+        self.assertTrue(calls[0][0].startswith("UPDATE passenger SET first_ticket_date"))
+        self.assertEqual(calls[0][1], (day2, 3, day2))
+        self.assertTrue(calls[1][0].startswith("DELETE FROM daily_passenger_activity"))
+        insert_sql, insert_params = calls[2]
+        self.assertTrue(insert_sql.startswith("INSERT INTO daily_passenger_activity"))
+        self.assertEqual(insert_params[0:3], (day1, 1, 1))
+        self.assertEqual(insert_params[4:7], (day1, 2, 0))
+        self.assertEqual(insert_params[8:11], (day2, 2, 1))
+        self.assertEqual(self.HyperLogLog.from_bytes(insert_params[11]).count(), 2)
+
+    def test_catch_up_covers_closed_days_only(self):
+        with patch('app.services.passenger_activity.rebuild', return_value=4) as mock_rebuild, \
+                patch('app.monitoring.logs.configure'):
+            self.assertEqual(self.passenger_activity.catch_up(3), 4)
+            self.passenger_activity.main(["catch-up", "--days", "1"])
+        
+        today = date.today()
+        self.assertEqual(mock_rebuild.call_args_list[0][0], (today - timedelta(days=3), today - timedelta(days=1)))
+        self.assertEqual(mock_rebuild.call_args_list[1][0], (today - timedelta(days=1), today - timedelta(days=1)))
+
+class TestPassengerExemptionsReport(unittest.TestCase):
+    def setUp(self):
+        self.mock_execute_query_patcher = patch('app.services.passenger_report.execute_query')
+        self.mock_execute_query = self.mock_execute_query_patcher.start()
+        
+        from app.services import passenger_report
+        self.passenger_report = passenger_report
+
+    def tearDown(self):
+        self.mock_execute_query_patcher.stop()
+
+    def row(self, section, passenger_id, **values):
+        row = {"section": section, "passenger_id": passenger_id, "item_id": None,
+               "text_a": None, "text_b": None, "date_a": None, "date_b": None,
+               "num_a": None, "num_b": None, "num_c": None, "num_d": None, "num_e": None}
+        row.update(values)
+        return row
+
+    def passenger_rows(self, passenger_id):
+        return [
+            self.row("passenger", passenger_id, text_a=f"Passenger {passenger_id}", text_b=f"p{passenger_id}@example.com"),
+            self.row("exemption", passenger_id, item_id=10 + passenger_id, text_a="Student", text_b="Student",
+                     date_a=date(2024, 1, 1), date_b=date(2024, 12, 31)),
+            self.row("application", passenger_id, item_id=20 + passenger_id, text_a="Approved",
+                     text_b="StudentID", date_a=date(2023, 12, 20)),
+            self.row("ticket_stats", passenger_id, num_a=5, num_b=10.5, num_c=3, num_d=1.5, num_e=3.0)
+        ]
+
+    def test_single_passenger_in_one_round_trip(self):
+        self.mock_execute_query.return_value = self.passenger_rows(7)
+        
+        report = self.passenger_report.passenger_report(7)
+        
+        self.mock_execute_query.assert_called_once()
+        query, params = self.mock_execute_query.call_args[0]
+        self.assertEqual(normalize_sql(query).count("UNION ALL"), 3)
+        self.assertEqual(params, (7, 7, 7, 7))
+        self.assertEqual(report["passenger"]["email"], "p7@example.com")
+        self.assertEqual(report["exemptions"][0]["type_name"], "Student")
+        self.assertEqual(report["exemptions"][0]["valid_to"], date(2024, 12, 31))
+        self.assertEqual(report["applications"][0]["document_type"], "StudentID")
+        self.assertEqual(report["ticket_stats"]["exemption_tickets"], 3)
+        self.assertEqual(report["ticket_stats"]["avg_regular_price"], 3.0)
+
+    def test_unknown_passenger(self):
+        self.mock_execute_query.return_value = []
+        
+        self.assertIsNone(self.passenger_report.passenger_report(404))
+
+    def test_bulk_reports_chunk_passenger_ids(self):
+        self.mock_execute_query.side_effect = [
+            self.passenger_rows(1) + self.passenger_rows(2)[:1],
+            self.passenger_rows(3)
+        ]
+        
+        with patch.object(self.passenger_report, 'BULK_CHUNK_SIZE', 2):
+            reports = list(self.passenger_report.bulk_reports([3, 1, 2, 2]))
+        
+        self.assertEqual(self.mock_execute_query.call_count, 2)
+        self.assertEqual(self.mock_execute_query.call_args_list[0][0][1], (1, 2) * 4)
+        self.assertEqual([r["passenger"]["passenger_id"] for r in reports], [1, 2, 3])
+        self.assertIsNone(reports[1]["ticket_stats"])
+        self.assertEqual(reports[1]["exemptions"], [])
+        logger.info(f"Bulk report for {len(reports)} passengers")
+
+class TestExemptionApplicationProcessing(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        self.mock_cursor.lastrowid = 77
+        
+        @contextmanager
+        def fake_transaction():
+            yield self.mock_cursor
+        
+        self.mock_transaction_patcher = patch('app.services.exemption_applications.transaction', fake_transaction)
+        self.mock_transaction_patcher.start()
+        
+        from app.services import exemption_applications
+        self.exemption_applications = exemption_applications
+        self.submitted = date(2025, 4, 1)
+
+    def tearDown(self):
+        self.mock_transaction_patcher.stop()
+
+    def counter_params(self):
+        for args, kwargs in self.mock_cursor.execute.call_args_list:
+            if "exemption_category_stats" in args[0]:
+                return args[1]
+        return None
+
+    def test_approval_moves_counters_and_links_exemption(self):
+        self.mock_cursor.fetchone.return_value = {
+            "passenger_id": 456, "status": "Submitted",
+            "submitted_date": self.submitted, "exemption_category": "Student"
+        }
+        
+        result = self.exemption_applications.process_application(123, "Approved", 2, "Student")
+        
+        # Same bucket: total unchanged, one more approval
+        self.assertEqual(self.counter_params(), (self.submitted, "Student", 0, 1))
+        insert_sql, insert_params = self.mock_cursor.execute.call_args_list[-1][0]
+        self.assertTrue(normalize_sql(insert_sql).startswith("INSERT INTO exemption"))
+        self.assertEqual(insert_params[-1], 123)
+        self.assertEqual(result["old_status"], "Submitted")
+        self.assertEqual(result["exemption"]["exemption_id"], 77)
+        self.assertEqual(result["exemption"]["passenger_id"], 456)
+
+    def test_legacy_application_takes_approval_category(self):
+        self.mock_cursor.fetchone.return_value = {
+            "passenger_id": 456, "status": "Pending",
+            "submitted_date": self.submitted, "exemption_category": None
+        }
+        
+        self.exemption_applications.process_application(123, "Approved", 3, "Senior")
+        
+        self.assertEqual(self.counter_params(), (
+            self.submitted, "Senior", 1, 1,
+            self.submitted, "Uncategorized", -1, 0
+        ))
+
+    def test_rejecting_approved_application(self):
+        self.mock_cursor.fetchone.return_value = {
+            "passenger_id": 456, "status": "Approved",
+            "submitted_date": self.submitted, "exemption_category": "Student"
+        }
+        
+        result = self.exemption_applications.process_application(123, "Rejected")
+        
+        self.assertEqual(self.counter_params(), (self.submitted, "Student", 0, -1))
+        self.assertIsNone(result["exemption"])
+
+    def test_unknown_application(self):
+        self.mock_cursor.fetchone.return_value = None
+        
+        self.assertIsNone(self.exemption_applications.process_application(999, "Approved", 2, "Student"))
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+
+    def test_statistics_read_counters(self):
+        with patch('app.services.exemption_applications.execute_query') as mock_execute_query:
+            mock_execute_query.return_value = [
+                {"exemption_category": "Student", "total_applications": 10, "approved": 6, "approval_rate": 60.0}
+            ]
+            
+            stats = self.exemption_applications.category_statistics("2025-01-01")
+            
+            query, params = mock_execute_query.call_args[0]
+            self.assertIn("FROM exemption_category_stats", query)
+            self.assertNotIn("JOIN", query)
+            self.assertEqual(params, ("2025-01-01",))
+            self.assertEqual(stats[0]["approval_rate"], 60.0)
+            logger.info(f"Exemption statistics: {stats}")
+
+class TestApplicationQueue(unittest.TestCase):
+    def setUp(self):
+        self.mock_execute_query_patcher = patch('app.services.exemption_applications.execute_query')
+        self.mock_execute_query = self.mock_execute_query_patcher.start()
+        
+        from app.services import exemption_applications
+        self.exemption_applications = exemption_applications
+        self.rows = [
+            {"application_id": 30, "submitted_date": date(2025, 4, 3), "status": "Submitted", "passenger_full_name": "A"},
+            {"application_id": 29, "submitted_date": date(2025, 4, 2), "status": "Submitted", "passenger_full_name": "B"},
+            {"application_id": 25, "submitted_date": date(2025, 4, 2), "status": "Submitted", "passenger_full_name": "C"}
+        ]
+
+    def tearDown(self):
+        self.mock_execute_query_patcher.stop()
+
+    def test_first_page_with_status_filter(self):
+        self.mock_execute_query.return_value = self.rows
+        
+        applications, next_cursor = self.exemption_applications.list_applications("Submitted", limit=2)
+        
+        query, params = self.mock_execute_query.call_args[0]
+        self.assertIn("WHERE ea.status = %s", normalize_sql(query))
+        self.assertTrue(normalize_sql(query).endswith("ORDER BY ea.submitted_date DESC, ea.application_id DESC LIMIT %s"))
+        self.assertEqual(params, ("Submitted", 3))
+        self.assertEqual([a["application_id"] for a in applications], [30, 29])
+        self.assertIsNotNone(next_cursor)
+
+    def test_next_page_continues_after_cursor(self):
+        self.mock_execute_query.return_value = self.rows
+        applications, next_cursor = self.exemption_applications.list_applications("Submitted", limit=2)
+        
+        self.mock_execute_query.return_value = self.rows[2:]
+        applications, last_cursor = self.exemption_applications.list_applications("Submitted", next_cursor, limit=2)
+        
+        query, params = self.mock_execute_query.call_args[0]
+        self.assertNotIn("OFFSET", query)
+        self.assertEqual(params, ("Submitted", "2025-04-02", "2025-04-02", 29, 3))
+        self.assertEqual([a["application_id"] for a in applications], [25])
+        self.assertIsNone(last_cursor)
+        logger.info(f"Second queue page: {applications}")
+
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,360 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock, patch
+import asyncio
+import contextvars
+import logging
+import threading
+
+import aiomysql
+
+from mysql.connector import Error
+
+from app.database import async_db, config, statement_cache, threadpool
+from app.database.async_db import get_pool as create_async_pool
+from app.database.pool import ConnectionPool, PoolTimeoutError
+
+logger = logging.getLogger('tariffs_test')
+
+def make_connection():
+    connection = MagicMock()
+    connection.is_connected.return_value = True
+    connection.in_transaction = False
+    return connection
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.connect = MagicMock(side_effect=lambda: make_connection())
+
+    def test_connection_is_reused_after_release(self):
+        pool = ConnectionPool(self.connect, pool_size=2, max_overflow=0)
+
+        first = pool.acquire()
+        pool.release(first)
+        second = pool.acquire()
+
+        self.assertIs(first, second)
+        self.assertEqual(self.connect.call_count, 1)
+        first.ping.assert_called_once_with(reconnect=False)
+
+        stats = pool.stats()
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["connections_created"], 1)
+        self.assertEqual(stats["checked_out"], 1)
+
+    def test_overflow_connections_are_closed_on_release(self):
+        pool = ConnectionPool(self.connect, pool_size=1, max_overflow=1)
+
+        first = pool.acquire()
+        second = pool.acquire()
+        self.assertEqual(pool.stats()["overflow_in_use"], 1)
+
+        pool.release(first)
+        pool.release(second)
+
+        second.close.assert_called_once()
+        first.close.assert_not_called()
+        stats = pool.stats()
+        self.assertEqual(stats["open_connections"], 1)
+        self.assertEqual(stats["idle_connections"], 1)
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool = ConnectionPool(self.connect, pool_size=1, max_overflow=0, timeout=0.05)
+
+        pool.acquire()
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire()
+
+        self.assertEqual(pool.stats()["checkout_timeouts"], 1)
+
+    def test_waiting_checkout_gets_released_connection(self):
+        pool = ConnectionPool(self.connect, pool_size=1, max_overflow=0, timeout=2)
+        first = pool.acquire()
+
+        timer = threading.Timer(0.05, pool.release, args=(first,))
+        timer.start()
+        second = pool.acquire()
+        timer.join()
+
+        self.assertIs(first, second)
+        self.assertEqual(pool.stats()["checkout_waits"], 1)
+
+    def test_failed_health_check_replaces_connection(self):
+        pool = ConnectionPool(self.connect, pool_size=1, max_overflow=0)
+
+        stale = pool.acquire()
+        pool.release(stale)
+        stale.ping.side_effect = Exception("MySQL server has gone away")
+
+        fresh = pool.acquire()
+
+        self.assertIsNot(stale, fresh)
+        stale.close.assert_called_once()
+        self.assertEqual(pool.stats()["health_check_failures"], 1)
+        self.assertEqual(pool.stats()["open_connections"], 1)
+
+    def test_idle_connections_expire(self):
+        pool = ConnectionPool(self.connect, pool_size=1, max_overflow=0, idle_timeout=0.01)
+
+        first = pool.acquire()
+        pool.release(first)
+        threading.Event().wait(0.02)
+        second = pool.acquire()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.stats()["idle_expired"], 1)
+
+    def test_open_transaction_is_rolled_back_on_release(self):
+        pool = ConnectionPool(self.connect, pool_size=1, max_overflow=0)
+
+        connection = pool.acquire()
+        connection.in_transaction = True
+        pool.release(connection)
+
+        connection.rollback.assert_called_once()
+        logger.info(f"Pool stats after release: {pool.stats()}")
+
+class TestAsyncDatabase(unittest.TestCase):
+    def setUp(self):
+        self.cursor = MagicMock()
+        self.cursor.execute = AsyncMock()
+        self.cursor.fetchall = AsyncMock()
+        self.cursor.__aenter__ = AsyncMock(return_value=self.cursor)
+        self.cursor.__aexit__ = AsyncMock(return_value=False)
+        self.connection = MagicMock()
+        self.connection.cursor.return_value = self.cursor
+        self.pool = MagicMock()
+        self.pool.acquire = AsyncMock(return_value=self.connection)
+        pool_patch = patch('app.database.async_db.get_pool', AsyncMock(return_value=self.pool))
+        pool_patch.start()
+        self.addCleanup(pool_patch.stop)
+        log_patch = patch('app.database.config.QUERY_LOGGING', False)
+        log_patch.start()
+        self.addCleanup(log_patch.stop)
+
+    def test_async_pool_has_its_own_budget(self):
+        create_pool = AsyncMock(return_value=self.pool)
+        with patch('app.database.async_db.aiomysql.create_pool', create_pool), \
+             patch('app.database.async_db._pool', None), \
+             patch('app.database.async_db._pool_lock', None), \
+             patch('app.database.config.DB_POOL_MAX_OVERFLOW', 10), \
+             patch('app.database.config.DB_ASYNC_POOL_MIN_SIZE', 2), \
+             patch('app.database.config.DB_ASYNC_POOL_MAX_SIZE', 4):
+            asyncio.run(create_async_pool())
+
+        kwargs = create_pool.call_args.kwargs
+        self.assertEqual((kwargs["minsize"], kwargs["maxsize"]), (2, 4))
+
+    def test_patched_execute_query_is_used(self):
+        with patch('app.database.config.execute_query') as mock_execute_query:
+            mock_execute_query.return_value = [{"fare_type_id": 1}]
+            result = asyncio.run(async_db.execute_query("SELECT * FROM fare_type WHERE fare_type_id = %s", (1,)))
+
+        self.assertEqual(result, [{"fare_type_id": 1}])
+        mock_execute_query.assert_called_once_with(
+            "SELECT * FROM fare_type WHERE fare_type_id = %s", (1,), fetch=True
+        )
+        self.pool.acquire.assert_not_called()
+
+    def test_fetch_returns_rows_and_releases_connection(self):
+        self.cursor.fetchall.return_value = ({"passenger_id": 7},)
+
+        result = asyncio.run(async_db.execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (7,)))
+
+        self.assertEqual(result, [{"passenger_id": 7}])
+        self.cursor.execute.assert_awaited_once_with("SELECT * FROM passenger WHERE passenger_id = %s", (7,))
+        self.pool.release.assert_called_once_with(self.connection)
+
+    def test_insert_returns_affected_rows_and_last_id(self):
+        self.cursor.rowcount = 1
+        self.cursor.lastrowid = 42
+
+        result = asyncio.run(async_db.execute_query(
+            "INSERT INTO passenger (passenger_full_name, email) VALUES (%s, %s)",
+            ("Test", "test@example.com"), fetch=False
+        ))
+
+        self.assertEqual(result, {"affected_rows": 1, "last_insert_id": 42})
+        self.cursor.fetchall.assert_not_awaited()
+
+    def test_query_error_returns_none(self):
+        self.cursor.execute.side_effect = aiomysql.Error("Table doesn't exist")
+
+        result = asyncio.run(async_db.execute_query("SELECT * FROM missing"))
+
+        self.assertIsNone(result)
+        self.pool.release.assert_called_once_with(self.connection)
+
+class TestDatabaseThreadPool(unittest.TestCase):
+    def setUp(self):
+        size_patch = patch('app.database.config.DB_THREADPOOL_SIZE', 1)
+        size_patch.start()
+        self.addCleanup(size_patch.stop)
+        threadpool.shutdown()
+        self.addCleanup(threadpool.shutdown)
+
+    def test_run_sync_returns_result_off_the_event_loop(self):
+        async def call():
+            return await threadpool.run_sync(lambda a, b=0: (a + b, threading.current_thread().name), 2, b=3)
+
+        total, thread_name = asyncio.run(call())
+
+        self.assertEqual(total, 5)
+        self.assertTrue(thread_name.startswith("db-worker"))
+
+    def test_run_sync_propagates_errors(self):
+        failed_before = threadpool.stats()["failed"]
+
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(threadpool.run_sync(fail))
+
+        self.assertEqual(threadpool.stats()["failed"], failed_before + 1)
+
+    def test_context_variables_are_visible_in_worker(self):
+        request_id = contextvars.ContextVar("request_id", default=None)
+
+        async def call():
+            request_id.set("req-1")
+            return await threadpool.run_sync(request_id.get)
+
+        self.assertEqual(asyncio.run(call()), "req-1")
+
+    def test_calls_beyond_pool_size_are_queued(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+            return "done"
+
+        async def call():
+            first = asyncio.ensure_future(threadpool.run_sync(blocking))
+            second = asyncio.ensure_future(threadpool.run_sync(lambda: "queued"))
+            await asyncio.sleep(0)
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            depth = threadpool.stats()
+            release.set()
+            return depth, await first, await second
+
+        stats, first, second = asyncio.run(call())
+
+        self.assertEqual((first, second), ("done", "queued"))
+        self.assertEqual(stats["active"], 1)
+        self.assertEqual(stats["queue_depth"], 1)
+        self.assertGreaterEqual(stats["max_queue_depth"], 1)
+        self.assertEqual(threadpool.stats()["queue_depth"], 0)
+
+    def test_threadpool_mode_runs_blocking_execute_query(self):
+        with patch('app.database.config.DB_ASYNC_MODE', 'threadpool'), \
+             patch('app.database.async_db._sync_execute_query') as mock_execute_query, \
+             patch('app.database.config.execute_query', mock_execute_query):
+            mock_execute_query.return_value = [{"count": 3}]
+            # config.execute_query is the original as far as the shim can tell
+            result = asyncio.run(async_db.execute_query("SELECT COUNT(*) as count FROM fare_type"))
+
+        self.assertEqual(result, [{"count": 3}])
+        mock_execute_query.assert_called_once_with("SELECT COUNT(*) as count FROM fare_type", None, True)
+
+class TestStatementCache(unittest.TestCase):
+    def setUp(self):
+        self.connection = make_connection()
+        self.connection.unread_result = False
+        self.connection.cursor.side_effect = lambda **kwargs: MagicMock(name=str(kwargs))
+        statement_cache._unpreparable.clear()
+        for key in statement_cache._stats:
+            statement_cache._stats[key] = 0
+
+    def test_repeated_query_reuses_prepared_cursor(self):
+        query = "SELECT * FROM passenger WHERE passenger_id = %s"
+        first = statement_cache.StatementCursor(self.connection, 4)
+        first.execute(query, (1,))
+        prepared = first._current
+        first.close()
+
+        second = statement_cache.StatementCursor(self.connection, 4)
+        second.execute("".join(["SELECT * FROM passenger ", "WHERE passenger_id = %s"]), (2,))
+
+        self.assertIs(second._current, prepared)
+        self.connection.cursor.assert_called_once_with(prepared=True, dictionary=True)
+        # The connector only skips re-preparing for the identical string object
+        self.assertIs(prepared.execute.call_args[0][0], query)
+        stats = statement_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_least_recently_used_statement_is_closed(self):
+        cursor = statement_cache.StatementCursor(self.connection, 2)
+        cursor.execute("SELECT 1 FROM ticket WHERE ticket_id = %s", (1,))
+        evicted = cursor._current
+        cursor.execute("SELECT 2 FROM ticket WHERE ticket_id = %s", (1,))
+        cursor.execute("SELECT 3 FROM ticket WHERE ticket_id = %s", (1,))
+
+        evicted.close.assert_called_once()
+        self.assertEqual(len(statement_cache.cache_for(self.connection, 2)), 2)
+        self.assertEqual(statement_cache.stats()["evictions"], 1)
+
+    def test_statements_without_params_use_plain_cursor(self):
+        cursor = statement_cache.StatementCursor(self.connection, 4)
+        cursor.execute("SELECT COUNT(*) AS n FROM fare_type")
+
+        self.connection.cursor.assert_called_once_with(dictionary=True)
+        cursor._current.execute.assert_called_once_with("SELECT COUNT(*) AS n FROM fare_type")
+
+    def test_unsupported_statement_falls_back_to_plain_cursor(self):
+        query = "SHOW COLUMNS FROM ticket LIKE %s"
+        self.connection.cursor.side_effect = [
+            MagicMock(**{"execute.side_effect": Error(errno=statement_cache.ER_UNSUPPORTED_PS)}),
+            MagicMock()
+        ]
+
+        cursor = statement_cache.StatementCursor(self.connection, 4)
+        cursor.execute(query, ("price",))
+
+        cursor._current.execute.assert_called_once_with(query, ("price",))
+        self.assertIn(query, statement_cache._unpreparable)
+        self.assertEqual(len(statement_cache.cache_for(self.connection, 4)), 0)
+        self.assertEqual(statement_cache.stats()["unpreparable"], 1)
+
+    def test_failed_statement_is_not_reused(self):
+        self.connection.cursor.side_effect = lambda **kwargs: MagicMock(**{"execute.side_effect": Error(errno=1146)})
+
+        cursor = statement_cache.StatementCursor(self.connection, 4)
+        with self.assertRaises(Error):
+            cursor.execute("SELECT * FROM missing WHERE id = %s", (1,))
+
+        self.assertEqual(len(statement_cache.cache_for(self.connection, 4)), 0)
+        self.assertEqual(statement_cache.stats()["errors"], 1)
+
+    def test_ticketing_lookup_reuses_prepared_statement(self):
+        from app.routers import ticketing_router
+
+        self.connection.cursor.side_effect = lambda **kwargs: MagicMock(**{
+            "fetchall.return_value": [{"passenger_id": 1, "passenger_full_name": "Alice Johnson"}]
+        })
+        with patch('app.database.config.DB_BACKEND', "mysql"), \
+             patch('app.database.config.DB_PREPARED_STATEMENTS', True), \
+             patch('app.database.config.DB_ASYNC_MODE', "aiomysql"), \
+             patch('app.database.config.get_db_connection', return_value=self.connection), \
+             patch('app.database.config.close_connection'), \
+             patch('app.routers.ticketing_router.exemption_index.active_exemptions', return_value=[]), \
+             patch('app.routers.ticketing_router.templates'):
+            asyncio.run(ticketing_router.passenger_profile(MagicMock(), 1))
+            asyncio.run(ticketing_router.passenger_profile(MagicMock(), 1))
+
+        stats = statement_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.connection.cursor.assert_called_once_with(prepared=True, dictionary=True)
+
+    def test_statement_cursor_only_on_mysql(self):
+        with patch('app.database.config.DB_BACKEND', "sqlite"):
+            cursor = config.statement_cursor(self.connection)
+        self.assertNotIsInstance(cursor, statement_cache.StatementCursor)
+
+        with patch('app.database.config.DB_PREPARED_STATEMENTS', True):
+            self.assertIsInstance(config.statement_cursor(self.connection), statement_cache.StatementCursor)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+from datetime import date
+import logging
+import threading
+
+from app.services.exemption_index import ExemptionIndex
+
+logger = logging.getLogger('tariffs_test')
+
+def exemption(exemption_id, passenger_id, valid_from, valid_to, fare_type_id=2):
+    return {
+        "exemption_id": exemption_id,
+        "exemption_category": "Student",
+        "passenger_id": passenger_id,
+        "fare_type_id": fare_type_id,
+        "valid_from": valid_from,
+        "valid_to": valid_to
+    }
+
+class TestExemptionIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = ExemptionIndex([
+            exemption(1, 2, date(2024, 1, 1), date(2024, 12, 31)),
+            exemption(2, 2, date(2024, 6, 1), date(2026, 6, 1)),
+            exemption(3, 2, date(2025, 3, 1), date(2025, 3, 31)),
+            exemption(4, 3, date(2025, 1, 1), date(2025, 12, 31))
+        ])
+
+    def ids(self, rows):
+        return [row["exemption_id"] for row in rows]
+
+    def test_active_lookup_by_passenger_and_date(self):
+        self.assertEqual(self.ids(self.index.active_for(2, date(2024, 7, 1))), [1, 2])
+        self.assertEqual(self.ids(self.index.active_for(2, date(2025, 3, 15))), [2, 3])
+        self.assertEqual(self.ids(self.index.active_for(2, date(2025, 4, 1))), [2])
+        self.assertEqual(self.ids(self.index.active_for(2, date(2023, 12, 31))), [])
+        self.assertEqual(self.ids(self.index.active_for(3, date(2025, 12, 31))), [4])
+        self.assertEqual(self.index.active_for(99, date(2025, 1, 1)), [])
+
+    def test_long_interval_covers_later_short_ones(self):
+        # The long exemption 2 starts before 3 but must still be found past 3's end
+        self.assertEqual(self.ids(self.index.active_for(2, date(2026, 1, 1))), [2])
+
+    def test_added_exemption_is_visible_and_not_duplicated(self):
+        new_row = exemption(5, 3, date(2025, 6, 1), date(2026, 6, 1))
+        self.index.add(new_row)
+        self.index.add(new_row)
+
+        self.assertEqual(self.ids(self.index.active_for(3, date(2025, 7, 1))), [4, 5])
+        self.assertEqual(self.index.size, 5)
+
+    def test_module_lookup_adds_type_name(self):
+        from app.services import exemption_index
+
+        with patch.object(exemption_index, 'get_index', return_value=self.index), \
+             patch('app.services.exemption_index.tariff_cache.get_fare_type',
+                   return_value={"fare_type_id": 2, "type_name": "Student"}):
+            rows = exemption_index.active_exemptions(3, date(2025, 5, 5))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["type_name"], "Student")
+        logger.info(f"Active exemptions: {rows}")
+
+    def test_rebuild_runs_in_background_and_keeps_added_rows(self):
+        from app.services import exemption_index
+
+        reading = threading.Event()
+        release = threading.Event()
+
+        def slow_load(query):
+            reading.set()
+            release.wait(5)
+            return [exemption(1, 2, date(2024, 1, 1), date(2024, 12, 31))]
+
+        with patch.object(exemption_index, '_index', self.index), \
+             patch.object(exemption_index, '_stale', True), \
+             patch('app.services.exemption_index.execute_query', side_effect=slow_load):
+            # The stale index answers while the rebuild reads the table
+            self.assertIs(exemption_index.get_index(), self.index)
+            self.assertTrue(reading.wait(5))
+            self.assertFalse(exemption_index._lock.locked())
+            exemption_index.add_exemption(exemption(9, 5, date(2025, 1, 1), date(2025, 12, 31)))
+            self.assertEqual(self.ids(self.index.active_for(5, date(2025, 6, 1))), [9])
+
+            release.set()
+            exemption_index.wait_for_refresh()
+            rebuilt = exemption_index._index
+
+        self.assertIsNot(rebuilt, self.index)
+        self.assertEqual(self.ids(rebuilt.active_for(2, date(2024, 7, 1))), [1])
+        self.assertEqual(self.ids(rebuilt.active_for(5, date(2025, 6, 1))), [9])
+        self.assertEqual(exemption_index._added, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from datetime import date
+import logging
+
+import numpy as np
+
+from app.services.fare_engine import TariffTable, ExemptionTable, quote_fares
+
+logger = logging.getLogger('tariffs_test')
+
+class TestFareEngine(unittest.TestCase):
+    def setUp(self):
+        self.tariffs = TariffTable.from_rows([
+            {"fare_type_id": 1, "type_name": "Adult", "base_price": 3.00, "discount_rate": 0.00},
+            {"fare_type_id": 2, "type_name": "Student", "base_price": 3.00, "discount_rate": 50.00},
+            {"fare_type_id": 3, "type_name": "Senior", "base_price": 3.00, "discount_rate": 60.00},
+            {"fare_type_id": 9, "type_name": "Unpriced", "base_price": None, "discount_rate": None}
+        ])
+        self.exemptions = ExemptionTable.from_rows([
+            {"exemption_id": 1, "passenger_id": 2, "fare_type_id": 2,
+             "valid_from": date(2025, 4, 18), "valid_to": date(2026, 4, 18)},
+            {"exemption_id": 2, "passenger_id": 3, "fare_type_id": 3,
+             "valid_from": date(2025, 4, 19), "valid_to": date(2026, 4, 19)}
+        ])
+
+    def test_bulk_quote_applies_only_valid_exemptions(self):
+        quotes = quote_fares(
+            passenger_ids=[1, 2, 2, 3, 3, 4],
+            fare_type_ids=[1, 1, 2, 3, 3, 9],
+            exemption_ids=[None, 1, 1, 2, 1, 0],
+            dates=[date(2025, 5, 1)] * 4 + [date(2025, 5, 1), date(2025, 5, 1)],
+            tariffs=self.tariffs,
+            exemptions=self.exemptions
+        )
+
+        np.testing.assert_allclose(quotes.base_fare, [3.0, 3.0, 3.0, 3.0, 3.0, 0.0])
+        np.testing.assert_allclose(quotes.discount_rate, [0.0, 50.0, 50.0, 60.0, 0.0, 0.0])
+        np.testing.assert_allclose(quotes.final_fare, [3.0, 1.5, 1.5, 1.2, 3.0, 0.0])
+        self.assertEqual(quotes.priced.tolist(), [True, True, True, True, True, False])
+        # Exemption 1 belongs to passenger 2, not passenger 3
+        self.assertFalse(quotes.exemption_applied[4])
+
+    def test_expired_exemption_is_ignored(self):
+        quotes = quote_fares(
+            [2, 2], [2, 2], [1, 1],
+            dates=[date(2025, 4, 17), date(2026, 4, 18)],
+            tariffs=self.tariffs,
+            exemptions=self.exemptions
+        )
+
+        self.assertEqual(quotes.exemption_applied.tolist(), [False, True])
+        np.testing.assert_allclose(quotes.final_fare, [3.0, 1.5])
+
+    def test_what_if_overrides(self):
+        what_if = self.tariffs.with_overrides({1: {"base_price": 3.50}, 2: {"discount_rate": 40.0}})
+        quotes = quote_fares([1, 2], [1, 2], [0, 1], date(2025, 5, 1),
+                             tariffs=what_if, exemptions=self.exemptions)
+
+        np.testing.assert_allclose(quotes.final_fare, [3.50, 1.80])
+        self.assertEqual(quotes.row(1)["discount_rate"], 40.0)
+
+    def test_large_batch(self):
+        count = 200000
+        rng = np.random.default_rng(7)
+        fare_type_ids = rng.integers(1, 4, size=count)
+        quotes = quote_fares(
+            np.full(count, 2), fare_type_ids, np.ones(count, dtype=np.int64), date(2025, 5, 1),
+            tariffs=self.tariffs, exemptions=self.exemptions
+        )
+
+        self.assertEqual(len(quotes), count)
+        np.testing.assert_allclose(quotes.final_fare, np.full(count, 1.5))
+        logger.info(f"Quoted {count} fares in one call")
+
+if __name__ == "__main__":
+    unittest.main()
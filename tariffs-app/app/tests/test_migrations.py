@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import MagicMock
+import logging
+import tempfile
+from pathlib import Path
+
+from app.database import migrations
+
+logger = logging.getLogger('tariffs_test')
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        (self.path / "001_first.sql").write_text(
+            "-- comment; with a semicolon\nCREATE INDEX a ON t (x);\nCREATE INDEX b ON t (y);\n"
+        )
+        (self.path / "002_second.sql").write_text("INSERT INTO t (s) VALUES ('a;b');")
+        (self.path / "notes.txt").write_text("ignored")
+
+        self.mock_conn = MagicMock()
+        self.mock_cursor = MagicMock()
+        self.mock_conn.cursor.return_value = self.mock_cursor
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def executed(self):
+        return [args[0].strip() for args, kwargs in self.mock_cursor.execute.call_args_list]
+
+    def test_split_sql_statements(self):
+        statements = migrations.split_sql_statements(
+            "-- header; comment\nCREATE TABLE x (a INT);\n\nINSERT INTO x VALUES ('it''s; fine');"
+        )
+        self.assertEqual(statements, ["CREATE TABLE x (a INT)", "INSERT INTO x VALUES ('it''s; fine')"])
+
+    def test_discover_orders_by_version(self):
+        found = migrations.discover_migrations(self.path)
+        self.assertEqual([(m.version, m.name) for m in found], [(1, "first"), (2, "second")])
+
+    def test_applies_only_pending_migrations(self):
+        first = migrations.discover_migrations(self.path)[0]
+        self.mock_cursor.fetchall.return_value = [
+            {"version": 1, "name": "first", "checksum": first.checksum, "applied_at": None}
+        ]
+
+        applied = migrations.apply_migrations(connection=self.mock_conn, directory=self.path)
+
+        self.assertEqual(applied, [2])
+        executed = self.executed()
+        self.assertIn("INSERT INTO t (s) VALUES ('a;b')", executed)
+        self.assertNotIn("CREATE INDEX a ON t (x)", executed)
+        self.mock_conn.commit.assert_called_once()
+
+    def test_target_version_stops_early(self):
+        self.mock_cursor.fetchall.return_value = []
+
+        applied = migrations.apply_migrations(connection=self.mock_conn, target=1, directory=self.path)
+
+        self.assertEqual(applied, [1])
+        self.assertIn("CREATE INDEX b ON t (y)", self.executed())
+        logger.info(f"Applied migrations: {applied}")
+
+if __name__ == "__main__":
+    unittest.main()
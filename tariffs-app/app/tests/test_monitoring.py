@@ -0,0 +1,341 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import asyncio
+import json
+import logging
+import queue
+
+from fastapi import FastAPI, HTTPException
+
+from app.database import config
+from app.database.pool import ConnectionPool
+from app.monitoring import logs, query_budget, metrics, slow_queries
+from app.monitoring.query_budget import track_queries, QueryBudgetExceeded, QueryBudgetMiddleware
+from app.routers import passenger_router
+
+logger = logging.getLogger('tariffs_test')
+
+class CollectingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+class TestQueryLogging(unittest.TestCase):
+    def setUp(self):
+        self.handler = CollectingHandler()
+        self.sql_logger = logging.getLogger("tariffs.sql")
+        self.sql_logger.addHandler(self.handler)
+        self.addCleanup(self.sql_logger.removeHandler, self.handler)
+        self.addCleanup(self.sql_logger.setLevel, self.sql_logger.level)
+
+    def test_info_level_keeps_timings_without_sql(self):
+        self.sql_logger.setLevel(logging.INFO)
+
+        config.log_query("SELECT * FROM passenger WHERE email = %s", ("a@example.com",), 0.0125, [{}, {}])
+
+        self.assertEqual(len(self.handler.records), 1)
+        record = self.handler.records[0]
+        self.assertEqual(record.levelno, logging.INFO)
+        self.assertEqual(record.duration_ms, 12.5)
+        self.assertEqual(record.rows, 2)
+        self.assertNotIn("passenger", record.getMessage())
+        self.assertNotIn("a@example.com", record.getMessage())
+
+    def test_debug_level_adds_sql_and_params(self):
+        self.sql_logger.setLevel(logging.DEBUG)
+
+        config.log_query("SELECT *\n    FROM passenger WHERE email = %s", ("a@example.com",), 0.002, 1)
+
+        message = self.handler.records[0].getMessage()
+        self.assertIn("SELECT * FROM passenger WHERE email = %s", message)
+        self.assertIn("a@example.com", message)
+
+    def test_nothing_is_logged_above_info(self):
+        self.sql_logger.setLevel(logging.WARNING)
+
+        config.log_query("SELECT 1", None, 0.001, [])
+
+        self.assertEqual(self.handler.records, [])
+
+    def test_sampler_keeps_slow_queries(self):
+        sampler = logs.QuerySampler(0.0)
+
+        fast = logging.makeLogRecord({"duration_ms": 3.0})
+        slow = logging.makeLogRecord({"duration_ms": logs.LOG_SLOW_QUERY_MS + 1})
+
+        self.assertFalse(sampler.filter(fast))
+        self.assertTrue(sampler.filter(slow))
+        self.assertEqual(sampler.sampled_out, 1)
+
+    def test_full_queue_drops_records_instead_of_blocking(self):
+        handler = logs.DroppingQueueHandler(queue.Queue(1))
+
+        handler.handle(logging.makeLogRecord({"msg": "first"}))
+        handler.handle(logging.makeLogRecord({"msg": "second"}))
+
+        self.assertEqual(handler.queue.qsize(), 1)
+        self.assertEqual(handler.dropped, 1)
+
+    def test_json_formatter_includes_extra_fields(self):
+        record = logging.makeLogRecord({
+            "name": "tariffs.sql", "levelname": "INFO", "msg": "%s ms", "args": (4.2,), "duration_ms": 4.2, "rows": 3
+        })
+
+        entry = json.loads(logs.JsonFormatter().format(record))
+
+        self.assertEqual(entry["message"], "4.2 ms")
+        self.assertEqual(entry["duration_ms"], 4.2)
+        self.assertEqual(entry["rows"], 3)
+        self.assertEqual(entry["logger"], "tariffs.sql")
+
+class TestQueryBudget(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        self.mock_cursor.fetchall.return_value = [{"passenger_id": 1}]
+        self.mock_connection = MagicMock()
+        self.mock_connection.cursor.return_value = self.mock_cursor
+        self.mock_pool = MagicMock()
+        for target, value in (
+            ('app.database.config.get_db_connection', MagicMock(return_value=self.mock_connection)),
+            ('app.database.config.get_pool', MagicMock(return_value=self.mock_pool)),
+            ('app.database.config.QUERY_LOGGING', False)
+        ):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_repeated_statements_are_counted_as_duplicates(self):
+        with track_queries() as stats:
+            for passenger_id in (1, 2, 3):
+                config.execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (passenger_id,))
+            config.execute_query("SELECT * FROM fare_type")
+
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(stats.duplicates, 2)
+        self.assertEqual(stats.repeated(), [("SELECT * FROM passenger WHERE passenger_id = %s", 3)])
+
+    def test_transaction_statements_are_counted(self):
+        with track_queries() as stats:
+            with config.transaction() as cursor:
+                cursor.execute("UPDATE passenger SET email = %s WHERE passenger_id = %s", ("a@example.com", 1))
+                cursor.execute("SELECT LAST_INSERT_ID()")
+
+        self.assertEqual(stats.count, 2)
+        self.mock_cursor.execute.assert_called_with("SELECT LAST_INSERT_ID()")
+
+    def test_queries_outside_tracking_are_ignored(self):
+        config.execute_query("SELECT 1")
+
+        with track_queries() as stats:
+            pass
+
+        self.assertEqual(stats.count, 0)
+
+    def test_route_query_budget(self):
+        request = MagicMock()
+        with patch('app.database.config.execute_query') as mock_execute_query, \
+             patch('app.routers.passenger_router.templates') as mock_templates:
+            mock_execute_query.side_effect = [
+                [{"passenger_id": 1, "passenger_full_name": "Test"}], [], [], []
+            ]
+            with track_queries(max_queries=4) as stats:
+                asyncio.run(passenger_router.exemption_status_report(request, 1))
+
+            mock_execute_query.side_effect = [
+                [{"passenger_id": 1, "passenger_full_name": "Test"}], [], [], []
+            ]
+            with self.assertRaises(QueryBudgetExceeded):
+                with track_queries(max_queries=3):
+                    asyncio.run(passenger_router.exemption_status_report(request, 1))
+
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(mock_templates.TemplateResponse.call_args[0][0], "passenger/application_status.html")
+
+    def test_middleware_adds_query_headers(self):
+        async def app(scope, receive, send):
+            config.execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (1,))
+            config.execute_query("SELECT * FROM passenger WHERE passenger_id = %s", (2,))
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/html")]})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/ticketing/passengers"}
+        asyncio.run(QueryBudgetMiddleware(app)(scope, None, send))
+
+        headers = dict(messages[0]["headers"])
+        self.assertEqual(headers[b"x-db-query-count"], b"2")
+        self.assertEqual(headers[b"x-db-duplicate-queries"], b"1")
+        self.assertIn(b"x-db-time-ms", headers)
+        self.assertEqual(query_budget.recent()[-1]["path"], "/ticketing/passengers")
+        self.assertEqual(query_budget.recent()[-1]["queries"], 2)
+
+def run_asgi(app, method, path):
+    """Call an ASGI app directly and return the response start message"""
+    scope = {
+        "type": "http", "http_version": "1.1", "method": method, "path": path, "raw_path": path.encode(),
+        "root_path": "", "scheme": "http", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80)
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages[0]
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = metrics.Histogram("test_latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, route="/a")
+        histogram.observe(0.5, route="/a")
+        histogram.observe(3.0, route="/a")
+
+        lines = histogram.render()
+
+        self.assertIn('test_latency_seconds_bucket{route="/a",le="0.1"} 1', lines)
+        self.assertIn('test_latency_seconds_bucket{route="/a",le="1"} 2', lines)
+        self.assertIn('test_latency_seconds_bucket{route="/a",le="+Inf"} 3', lines)
+        self.assertIn('test_latency_seconds_count{route="/a"} 3', lines)
+        self.assertIn('test_latency_seconds_sum{route="/a"} 3.55', lines)
+        self.assertEqual(lines[1], "# TYPE test_latency_seconds histogram")
+
+    def test_counter_escapes_label_values(self):
+        counter = metrics.Counter("test_total", "Test counter", ("statement",))
+        counter.inc(2, statement='SELECT "a"\nFROM b')
+
+        self.assertIn('test_total{statement="SELECT \\"a\\"\\nFROM b"} 2', counter.render())
+
+    def test_statements_are_normalized(self):
+        self.assertEqual(
+            metrics.normalize_statement("SELECT *\n  FROM passenger WHERE passenger_id IN (%s, %s, %s) AND status = 'Approved'"),
+            "SELECT * FROM passenger WHERE passenger_id IN (...) AND status = ?"
+        )
+        self.assertEqual(
+            metrics.normalize_statement("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)"),
+            "INSERT INTO t (a, b) VALUES (...), ..."
+        )
+
+    def test_queries_are_timed_per_statement(self):
+        statement = "SELECT * FROM tariff WHERE fare_type_id = %s"
+        before = metrics.db_query_duration.count(statement=statement)
+        errors_before = metrics.db_query_errors.value(statement=statement)
+
+        config.notify_query("SELECT *\n FROM tariff WHERE fare_type_id = %s", (1,), 0.004)
+        config.notify_query("SELECT * FROM tariff WHERE fare_type_id = %s", (2,), 0.1, Exception("lost connection"))
+
+        self.assertEqual(metrics.db_query_duration.count(statement=statement), before + 1)
+        self.assertEqual(metrics.db_query_errors.value(statement=statement), errors_before + 1)
+
+    def test_pool_reports_checkout_wait(self):
+        on_checkout = MagicMock()
+        pool = ConnectionPool(lambda: MagicMock(), pool_size=1, max_overflow=0, on_checkout=on_checkout)
+
+        pool.acquire()
+
+        on_checkout.assert_called_once()
+        self.assertGreaterEqual(on_checkout.call_args[0][0], 0)
+
+    def test_middleware_labels_requests_by_route_template(self):
+        app = FastAPI()
+
+        @app.get("/passenger/{passenger_id}/ping")
+        async def ping(passenger_id: int):
+            return {"ok": passenger_id}
+
+        @app.get("/admin/broken")
+        async def broken():
+            raise HTTPException(status_code=503, detail="Unavailable")
+
+        wrapped = metrics.MetricsMiddleware(app)
+        route = "/passenger/{passenger_id}/ping"
+        before = metrics.http_requests.value(area="passenger", method="GET", route=route, status=200)
+        errors_before = metrics.http_request_errors.value(area="admin", route="/admin/broken")
+
+        self.assertEqual(run_asgi(wrapped, "GET", "/passenger/7/ping")["status"], 200)
+        self.assertEqual(run_asgi(wrapped, "GET", "/admin/broken")["status"], 503)
+
+        self.assertEqual(metrics.http_requests.value(area="passenger", method="GET", route=route, status=200), before + 1)
+        self.assertEqual(metrics.http_request_errors.value(area="admin", route="/admin/broken"), errors_before + 1)
+        self.assertIn('http_request_duration_seconds_count{area="passenger",method="GET",route="/passenger/{passenger_id}/ping"}',
+                      metrics.REGISTRY.render())
+
+    def test_ticket_counters_are_exposed(self):
+        metrics.tickets_issued.inc(channel="single")
+
+        output = metrics.REGISTRY.render()
+
+        self.assertIn("# TYPE tickets_issued_total counter", output)
+        self.assertIn('tickets_issued_total{channel="single"}', output)
+        self.assertIn("db_threadpool_queue_depth", output)
+
+class TestSlowQueries(unittest.TestCase):
+    def setUp(self):
+        slow_queries.clear()
+        self.addCleanup(slow_queries.clear)
+        self.mock_cursor = MagicMock()
+        self.mock_cursor.fetchone.return_value = ('{"query_block": {"select_id": 1}}',)
+        self.mock_connection = MagicMock()
+        self.mock_connection.cursor.return_value = self.mock_cursor
+        for target, value in (
+            ('app.database.config.get_db_connection', MagicMock(return_value=self.mock_connection)),
+            ('app.database.config.close_connection', MagicMock()),
+            ('app.monitoring.slow_queries.SLOW_QUERY_MS', 100.0)
+        ):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_fast_and_failed_queries_are_not_captured(self):
+        config.notify_query("SELECT * FROM passenger", None, 0.01, rows=3)
+        config.notify_query("SELECT * FROM passenger", None, 0.5, Exception("lost connection"))
+
+        self.assertEqual(slow_queries.recent(), [])
+
+    def test_slow_query_is_recorded_with_route_and_plan(self):
+        with track_queries() as stats:
+            stats.route = "GET /ticketing/passengers"
+            config.notify_query("SELECT * FROM passenger WHERE email = %s", ("a@example.com",), 0.25, rows=1)
+        slow_queries.wait_for_plans()
+
+        entry = slow_queries.recent()[0]
+        self.assertEqual(entry["statement"], "SELECT * FROM passenger WHERE email = %s")
+        self.assertEqual(entry["duration_ms"], 250.0)
+        self.assertEqual(entry["rows"], 1)
+        self.assertEqual(entry["route"], "GET /ticketing/passengers")
+        self.assertEqual(entry["params_fingerprint"], slow_queries.fingerprint(("a@example.com",)))
+        self.assertNotIn("a@example.com", json.dumps(entry))
+
+        top = slow_queries.top_statements()[0]
+        self.assertEqual(top["plan"], {"query_block": {"select_id": 1}})
+        self.assertEqual(top["routes"], ["GET /ticketing/passengers"])
+        self.mock_cursor.execute.assert_called_once_with(
+            "EXPLAIN FORMAT=JSON SELECT * FROM passenger WHERE email = %s", ("a@example.com",)
+        )
+
+    def test_statements_are_aggregated_and_explained_once(self):
+        for duration in (0.2, 0.4, 0.3):
+            config.notify_query("SELECT * FROM tariff WHERE fare_type_id = %s", (1,), duration)
+        config.notify_query("UPDATE passenger SET email = %s WHERE passenger_id = %s", ("b@example.com", 1), 0.15)
+        slow_queries.wait_for_plans()
+
+        top = slow_queries.top_statements(order_by="max_ms")
+        self.assertEqual(top[0]["count"], 3)
+        self.assertEqual(top[0]["max_ms"], 400.0)
+        self.assertEqual(top[0]["avg_ms"], 300.0)
+        self.assertEqual(top[1]["plan"], None)
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        self.assertEqual(slow_queries.stats()["statements"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import asyncio
+import logging
+from datetime import date, timedelta
+
+from mysql.connector import Error, IntegrityError
+
+from app.database import config, sqlite_backend
+from app.database.sqlite_backend import translate
+from app.routers import passenger_router
+
+logger = logging.getLogger('tariffs_test')
+
+class TestSQLiteDialect(unittest.TestCase):
+    def test_placeholders_outside_literals(self):
+        self.assertEqual(
+            translate("SELECT * FROM passenger WHERE email LIKE %s AND note = '%s' AND rate > 5%%"),
+            "SELECT * FROM passenger WHERE email LIKE ? AND note = '%s' AND rate > 5%"
+        )
+        self.assertEqual(translate("SELECT '100%%'", has_params=False), "SELECT '100%%'")
+
+    def test_upsert_and_locking_clauses(self):
+        self.assertEqual(
+            translate("INSERT INTO daily_fare_usage (usage_date, tickets_sold) VALUES (%s, %s) "
+                      "ON DUPLICATE KEY UPDATE tickets_sold = tickets_sold + VALUES(tickets_sold)"),
+            "INSERT INTO daily_fare_usage (usage_date, tickets_sold) VALUES (?, ?) "
+            "ON CONFLICT DO UPDATE SET tickets_sold = tickets_sold + excluded.tickets_sold"
+        )
+        self.assertEqual(
+            translate("SELECT * FROM ticket WHERE ticket_id = %s FOR UPDATE"),
+            "SELECT * FROM ticket WHERE ticket_id = ?"
+        )
+
+    def test_ddl_is_rewritten(self):
+        sql = translate("""
+            CREATE TABLE IF NOT EXISTS activity_log (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                activity_type VARCHAR(50) NOT NULL COMMENT 'What happened'
+            ) ENGINE=InnoDB COMMENT='Audit trail.'
+        """, has_params=False)
+
+        self.assertIn("id INTEGER PRIMARY KEY AUTOINCREMENT", sql)
+        self.assertNotIn("COMMENT", sql)
+        self.assertNotIn("ENGINE", sql)
+
+class TestSQLiteIntegration(unittest.TestCase):
+    """Real SQL through the pool, execute_query and transaction() on an in-memory database"""
+
+    def setUp(self):
+        name = f"tariffs_test_{id(self)}"
+        for target, value in (
+            ('app.database.config.DB_BACKEND', "sqlite"),
+            ('app.database.config.DB_SQLITE_PATH', sqlite_backend.MEMORY),
+            ('app.database.config.DB_NAME', name),
+            ('app.database.config.QUERY_LOGGING', False)
+        ):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        config.dispose_pool()
+        self.addCleanup(sqlite_backend.drop_memory_database, name)
+        self.addCleanup(config.dispose_pool)
+
+        connection = config.get_db_connection()
+        sqlite_backend.load_schema(connection)
+        config.close_connection(connection)
+
+    def test_queries_return_mysql_types(self):
+        rows = config.execute_query("SELECT * FROM ticket WHERE passenger_id = %s", (1,))
+
+        self.assertEqual(len(rows), 1)
+        self.assertIsInstance(rows[0]["purchase_date"], date)
+        self.assertEqual(rows[0]["price"], 3)
+
+    def test_insert_record_returns_new_id(self):
+        passenger_id = config.insert_record("passenger", {"passenger_full_name": "Test", "email": "test@example.com"})
+
+        self.assertEqual(passenger_id, 6)
+        self.assertEqual(
+            config.execute_query("SELECT email FROM passenger WHERE passenger_id = %s", (passenger_id,)),
+            [{"email": "test@example.com"}]
+        )
+
+    def test_duplicate_email_is_an_integrity_error(self):
+        with self.assertRaises(IntegrityError):
+            with config.transaction() as cursor:
+                cursor.execute(
+                    "INSERT INTO passenger (passenger_full_name, email) VALUES (%s, %s)", ("Alice", "alice@example.com")
+                )
+
+        self.assertIsNone(config.execute_query(
+            "INSERT INTO passenger (passenger_full_name, email) VALUES (%s, %s)", ("Alice", "alice@example.com"), fetch=False
+        ))
+
+    def test_transaction_rolls_back_and_reports_last_insert_id(self):
+        with self.assertRaises(Error):
+            with config.transaction() as cursor:
+                cursor.execute("INSERT INTO fare_type (type_name, description, validity) VALUES (%s, %s, %s)",
+                               ("Night", "Night fare", "2025"))
+                cursor.execute("SELECT LAST_INSERT_ID() AS id")
+                self.assertEqual(cursor.fetchone()["id"], 5)
+                cursor.execute("INSERT INTO tariff (base_price, fare_type_id) VALUES (%s, %s)", (2.5, 999))
+
+        self.assertEqual(config.execute_query("SELECT COUNT(*) AS n FROM fare_type"), [{"n": 4}])
+
+    def test_datediff_and_curdate(self):
+        valid_to = date.today() + timedelta(days=30)
+        config.execute_query("UPDATE exemption SET valid_to = %s WHERE passenger_id = %s", (valid_to, 2), fetch=False)
+
+        rows = config.execute_query(
+            "SELECT DATEDIFF(valid_to, CURDATE()) AS days_remaining FROM exemption WHERE passenger_id = %s", (2,)
+        )
+
+        self.assertEqual(rows, [{"days_remaining": 30}])
+
+    def test_stream_query_reads_in_batches(self):
+        rows = list(config.stream_query("SELECT passenger_id FROM passenger ORDER BY passenger_id", batch_size=2))
+
+        self.assertEqual([row["passenger_id"] for row in rows], [1, 2, 3, 4, 5])
+        self.assertEqual(config.get_pool_stats()["checked_out"], 0)
+
+    def test_batch_links_calculations_and_payments_to_their_tickets(self):
+        from app.database.migrations import MIGRATIONS_DIR
+        from app.services import ticket_issuance
+
+        # Issuance also upserts the fare usage rollup
+        connection = config.get_db_connection()
+        sqlite_backend.load_schema(connection, MIGRATIONS_DIR / "003_daily_fare_usage.sql")
+        config.close_connection(connection)
+
+        results = ticket_issuance.issue_ticket_batch([
+            {"passenger_id": passenger_id, "fare_type_id": 1, "base_fare": 3.0, "discount": 0.0,
+             "final_fare": 3.0 - passenger_id * 0.25, "payment_method": "Card"}
+            for passenger_id in (1, 2, 3)
+        ])
+
+        issued = [result["ticket"]["ticket_id"] for result in results]
+        rows = config.execute_query(f"""
+            SELECT t.ticket_id, t.passenger_id, t.price, fc.final_fare, pc.transaction_ref
+            FROM ticket t
+            JOIN fare_calculation fc ON fc.ticket_id = t.ticket_id
+            JOIN payment_confirmation pc ON pc.ticket_id = t.ticket_id
+            WHERE t.ticket_id IN ({", ".join(["%s"] * len(issued))})
+            ORDER BY t.ticket_id
+        """, tuple(issued))
+
+        self.assertEqual([row["ticket_id"] for row in rows], issued)
+        self.assertEqual([row["passenger_id"] for row in rows], [1, 2, 3])
+        for row, result in zip(rows, results):
+            self.assertEqual(float(row["final_fare"]), float(row["price"]))
+            self.assertEqual(row["transaction_ref"], result["ticket"]["transaction_ref"])
+
+    def test_exemption_status_route(self):
+        request = MagicMock()
+        with patch('app.routers.passenger_router.templates') as mock_templates:
+            asyncio.run(passenger_router.exemption_status_report(request, 2))
+
+        template, context = mock_templates.TemplateResponse.call_args[0]
+        self.assertEqual(template, "passenger/application_status.html")
+        self.assertEqual(context["passenger"]["passenger_full_name"], "Bob Smith")
+        self.assertEqual(len(context["applications"]), 1)
+        self.assertIsInstance(context["exemptions"][0]["days_remaining"], int)
+
+if __name__ == "__main__":
+    unittest.main()
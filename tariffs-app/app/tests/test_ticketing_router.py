@@ -1,5 +1,6 @@
 import unittest
 from unittest.mock import patch, MagicMock
+from contextlib import contextmanager
 from datetime import date, datetime
 import re
 import logging
@@ -402,5 +403,212 @@ class TestTicketOperations(unittest.TestCase):
         logger.info(f"Price: ${ticket[0]['price']}")
         logger.info(f"Valid from: {ticket[0]['valid_from']} to {ticket[0]['valid_to']}")
 
+class TestTicketIssuanceService(unittest.TestCase):
+    def setUp(self):
+        self.mock_cursor = MagicMock()
+        self.mock_cursor.lastrowid = 456
+        
+        @contextmanager
+        def fake_transaction():
+            yield self.mock_cursor
+        
+        self.mock_transaction_patcher = patch('app.services.ticket_issuance.transaction', fake_transaction)
+        self.mock_transaction_patcher.start()
+
+    def tearDown(self):
+        self.mock_transaction_patcher.stop()
+
+    def test_issue_ticket_uses_one_transaction(self):
+        from app.services import ticket_issuance
+        
+        self.mock_cursor.fetchone.return_value = {
+            "passenger_full_name": "John Smith",
+            "type_name": "Student"
+        }
+        
+        ticket = ticket_issuance.issue_ticket(123, 2, 2.00, 0.67, 1.33, "Card")
+        
+        executed = [normalize_sql(args[0]) for args, kwargs in self.mock_cursor.execute.call_args_list]
+        self.assertEqual(len(executed), 5)
+        self.assertTrue(executed[1].startswith("INSERT INTO ticket"))
+        self.assertTrue(executed[2].startswith("INSERT INTO fare_calculation"))
+        self.assertTrue(executed[3].startswith("INSERT INTO payment_confirmation"))
+        # The passenger activity rollup is left to its catch-up job
+        self.assertFalse(any("daily_passenger_activity" in sql or "first_ticket_date" in sql for sql in executed))
+        self.assertTrue(executed[4].startswith("INSERT INTO daily_fare_usage"))
+        self.assertEqual(self.mock_cursor.execute.call_args_list[4][0][1], (date.today(), 2, 1, 1.33))
+        
+        self.assertEqual(ticket["ticket_id"], 456)
+        self.assertEqual(ticket["passenger_full_name"], "John Smith")
+        self.assertEqual(ticket["type_name"], "Student")
+        self.assertEqual(ticket["price"], 1.33)
+        self.assertEqual(ticket["transaction_ref"], f"TXN{date.today().strftime('%Y%m%d')}-456")
+
+    def test_issue_ticket_unknown_passenger(self):
+        from app.services import ticket_issuance
+        
+        self.mock_cursor.fetchone.return_value = {
+            "passenger_full_name": None,
+            "type_name": "Student"
+        }
+        
+        with self.assertRaises(ticket_issuance.TicketIssuanceError) as ctx:
+            ticket_issuance.issue_ticket(999, 2, 2.00, 0.0, 2.00, "Card")
+        
+        self.assertEqual(ctx.exception.status_code, 404)
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+
+    def test_issue_ticket_batch_reports_per_item_results(self):
+        from app.services import ticket_issuance
+        
+        self.mock_cursor.fetchall.side_effect = [
+            [
+                {"kind": "passenger", "id": 1, "name": "Alice Johnson"},
+                {"kind": "passenger", "id": 2, "name": "Bob Smith"},
+                {"kind": "fare_type", "id": 1, "name": "Adult"}
+            ]
+        ]
+        ticket_ids = iter([100, 105])
+        
+        def execute(sql, params=None):
+            if normalize_sql(sql).startswith("INSERT INTO ticket"):
+                self.mock_cursor.lastrowid = next(ticket_ids)
+        
+        self.mock_cursor.execute.side_effect = execute
+        
+        items = [
+            {"passenger_id": 1, "fare_type_id": 1, "base_fare": 3.0, "discount": 0.0, "final_fare": 3.0, "payment_method": "Card"},
+            {"passenger_id": 99, "fare_type_id": 1, "base_fare": 3.0, "discount": 0.0, "final_fare": 3.0, "payment_method": "Card"},
+            {"passenger_id": 2, "fare_type_id": 7, "base_fare": 3.0, "discount": 0.0, "final_fare": 3.0, "payment_method": "Cash"},
+            {"passenger_id": 2, "fare_type_id": 1, "base_fare": 3.0, "discount": 1.5, "final_fare": 1.5, "payment_method": "Cash"}
+        ]
+        results = ticket_issuance.issue_ticket_batch(items)
+        
+        self.assertEqual([r["status"] for r in results], ["issued", "error", "error", "issued"])
+        self.assertEqual(results[1]["error"], "Passenger not found")
+        self.assertEqual(results[2]["error"], "Fare type not found")
+        # Ids come from each ticket's own INSERT, gaps and all
+        self.assertEqual(results[0]["ticket"]["ticket_id"], 100)
+        self.assertEqual(results[3]["ticket"]["ticket_id"], 105)
+        self.assertEqual(results[3]["ticket"]["passenger_full_name"], "Bob Smith")
+        
+        ticket_inserts = [
+            args[1] for args, kwargs in self.mock_cursor.execute.call_args_list
+            if normalize_sql(args[0]).startswith("INSERT INTO ticket")
+        ]
+        self.assertEqual([params[2] for params in ticket_inserts], [1, 2])
+        
+        self.assertEqual(self.mock_cursor.executemany.call_count, 2)
+        calculation_rows = self.mock_cursor.executemany.call_args_list[0][0][1]
+        payment_rows = self.mock_cursor.executemany.call_args_list[1][0][1]
+        self.assertEqual([row[0] for row in calculation_rows], [100, 105])
+        self.assertEqual([row[0] for row in payment_rows], [100, 105])
+        
+        # Both issued tickets share one (date, fare type) rollup row
+        rollup_sql, rollup_params = self.mock_cursor.execute.call_args_list[-1][0]
+        self.assertTrue(normalize_sql(rollup_sql).startswith("INSERT INTO daily_fare_usage"))
+        self.assertEqual(rollup_params, (date.today(), 1, 2, 4.5))
+
+class TestPassengerDirectory(unittest.TestCase):
+    def setUp(self):
+        self.mock_execute_query_patcher = patch('app.services.passenger_directory.execute_query')
+        self.mock_execute_query = self.mock_execute_query_patcher.start()
+        
+        from app.services import passenger_directory
+        self.passenger_directory = passenger_directory
+        self.rows = [
+            {"passenger_id": i, "passenger_full_name": f"Anna {i:03d}", "email": f"anna{i}@example.com"}
+            for i in range(1, 5)
+        ]
+
+    def tearDown(self):
+        self.mock_execute_query_patcher.stop()
+
+    def test_listing_pages_by_primary_key(self):
+        self.mock_execute_query.return_value = self.rows[:3]
+        
+        passengers, next_cursor = self.passenger_directory.search_passengers(limit=2)
+        
+        query, params = self.mock_execute_query.call_args[0]
+        self.assertEqual(normalize_sql(query), "SELECT passenger_id, passenger_full_name, email FROM passenger ORDER BY passenger_id LIMIT %s")
+        self.assertEqual(params, (3,))
+        self.assertEqual(len(passengers), 2)
+        
+        self.mock_execute_query.return_value = self.rows[2:]
+        passengers, last_cursor = self.passenger_directory.search_passengers(cursor=next_cursor, limit=2)
+        
+        query, params = self.mock_execute_query.call_args[0]
+        self.assertIn("WHERE passenger_id > %s", query)
+        self.assertNotIn("OFFSET", query)
+        self.assertEqual(params, (2, 3))
+        self.assertIsNone(last_cursor)
+
+    def test_name_prefix_search_uses_name_keyset(self):
+        self.mock_execute_query.return_value = self.rows[:3]
+        
+        passengers, next_cursor = self.passenger_directory.search_passengers("Anna", limit=2)
+        query, params = self.mock_execute_query.call_args[0]
+        self.assertIn("WHERE passenger_full_name LIKE %s", query)
+        self.assertEqual(params, ("Anna%", 3))
+        
+        self.passenger_directory.search_passengers("Anna", cursor=next_cursor, limit=2)
+        query, params = self.mock_execute_query.call_args[0]
+        self.assertIn("ORDER BY passenger_full_name, passenger_id", query)
+        self.assertEqual(params, ("Anna%", "Anna 002", "Anna 002", 2, 3))
+
+    def test_email_prefix_search_escapes_wildcards(self):
+        self.mock_execute_query.return_value = []
+        
+        passengers, next_cursor = self.passenger_directory.search_passengers("a_b%@ex")
+        
+        # A term with "@" cannot be a name, so only the email pass runs
+        self.mock_execute_query.assert_called_once()
+        query, params = self.mock_execute_query.call_args[0]
+        self.assertIn("WHERE email LIKE %s", query)
+        self.assertEqual(params[0], "a\\_b\\%@ex%")
+        self.assertEqual(passengers, [])
+        self.assertIsNone(next_cursor)
+
+    def test_plain_term_also_matches_email_prefixes(self):
+        jsmith = {"passenger_id": 9, "passenger_full_name": "John Smith", "email": "jsmith@example.com"}
+        jsmith2 = {"passenger_id": 12, "passenger_full_name": "Jane Smith", "email": "jsmith2@example.com"}
+        self.mock_execute_query.side_effect = [[], [jsmith, jsmith2]]
+        
+        passengers, next_cursor = self.passenger_directory.search_passengers("jsmith", limit=1)
+        
+        name_query, email_query = [call[0] for call in self.mock_execute_query.call_args_list]
+        self.assertIn("WHERE passenger_full_name LIKE %s", name_query[0])
+        self.assertIn("WHERE email LIKE %s AND passenger_full_name NOT LIKE %s", email_query[0])
+        self.assertEqual(email_query[1], ("jsmith%", "jsmith%", 2))
+        self.assertEqual(passengers, [jsmith])
+        
+        # The next page resumes in the email pass after the last email shown
+        self.mock_execute_query.side_effect = [[jsmith2]]
+        passengers, last_cursor = self.passenger_directory.search_passengers("jsmith", cursor=next_cursor, limit=1)
+        
+        query, params = self.mock_execute_query.call_args[0]
+        self.assertIn("AND email > %s", query)
+        self.assertEqual(params, ("jsmith%", "jsmith%", "jsmith@example.com", 2))
+        self.assertEqual(passengers, [jsmith2])
+        self.assertIsNone(last_cursor)
+
+    def test_page_finishing_name_matches_is_filled_from_emails(self):
+        self.mock_execute_query.side_effect = [self.rows[:1], self.rows[1:3]]
+        
+        passengers, next_cursor = self.passenger_directory.search_passengers("Anna", limit=2)
+        
+        self.assertEqual([row["passenger_id"] for row in passengers], [1, 2])
+        self.assertEqual(self.mock_execute_query.call_args_list[1][0][1][-1], 2)
+        self.assertEqual(self.passenger_directory.decode_cursor(next_cursor), ["email", "anna2@example.com"])
+
+    def test_malformed_cursor_starts_from_first_page(self):
+        self.mock_execute_query.return_value = []
+        
+        self.passenger_directory.search_passengers(cursor="not-a-cursor")
+        
+        query, params = self.mock_execute_query.call_args[0]
+        self.assertNotIn("WHERE", query)
+        logger.info("Malformed cursor ignored")
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
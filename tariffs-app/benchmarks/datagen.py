@@ -0,0 +1,268 @@
+"""Synthetic data for the schema.sql tables, sized by ticket count.
+
+Scales from 1e3 to 1e8 tickets. Rows are drawn per chunk and written with
+executemany, so memory stays flat whatever the size. The distributions are
+meant to look like a real network rather than uniform noise:
+
+- fare types follow fixed shares (mostly Adult), and prices follow the tariffs;
+- ridership is skewed, so a minority of frequent riders buys most tickets;
+- weekends carry about half the volume of a weekday;
+- exemption applications split across Student, Senior and Child with the
+  matching document, and most of them are approved;
+- every ticket gets a fare calculation and a payment confirmation.
+
+Build a scratch database and fill it (never the application database):
+
+    python -m benchmarks.datagen --tickets 1000000
+
+With ``DB_BACKEND=sqlite`` the scratch database is a local file,
+``<name>.sqlite3``, and no MySQL server is needed.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import mysql.connector
+
+from app.database import config, sqlite_backend
+from app.database.migrations import split_sql_statements
+
+SCHEMA_PATH = Path(__file__).resolve().parents[1] / "schema.sql"
+
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "tariffs_bench")
+
+MIN_TICKETS = 1000
+MAX_TICKETS = 100000000
+
+FARE_TYPES = [
+    # (type_name, description, base_price, discount_rate, share of tickets)
+    ("Adult", "Standard adult fare", 3.00, 0.00, 0.55),
+    ("Student", "Discounted rate for students", 3.00, 50.00, 0.20),
+    ("Senior", "Discounted rate for seniors", 3.00, 60.00, 0.15),
+    ("Child", "Discounted rate for children under 12", 3.00, 75.00, 0.10),
+]
+
+EXEMPTION_CATEGORIES = [
+    # (category = fare type name, document type, share of applications)
+    ("Student", "StudentID", 0.50),
+    ("Senior", "SeniorID", 0.35),
+    ("Child", "BirthCertificate", 0.15),
+]
+
+APPLICATION_STATUSES = [("Approved", 0.6), ("Rejected", 0.15), ("Pending", 0.15), ("Submitted", 0.1)]
+
+PAYMENT_METHODS = [("Card", 0.65), ("Mobile", 0.2), ("Cash", 0.15)]
+
+# Relative ticket volume of a Saturday or Sunday against a weekday
+WEEKEND_FACTOR = 0.5
+
+# Larger values concentrate tickets on fewer passengers (1 is uniform)
+RIDERSHIP_SKEW = 2.0
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+def _insert_rows(cursor, table, columns, rows):
+    if not rows:
+        return
+    placeholders = ", ".join(["%s"] * len(columns))
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+        rows
+    )
+
+def _frequent_rider(rng, passengers):
+    """Passenger id, biased towards low ids so a few riders dominate"""
+    return int(passengers * rng.random() ** RIDERSHIP_SKEW) + 1
+
+def _purchase_days(first_day, days):
+    """Every day of the period with its cumulative weight (weekends count less)"""
+    calendar, cumulative, total = [], [], 0.0
+    for offset in range(days + 1):
+        day = first_day + timedelta(days=offset)
+        total += WEEKEND_FACTOR if day.weekday() >= 5 else 1.0
+        calendar.append(day)
+        cumulative.append(total)
+    return calendar, cumulative
+
+def generate(connection, tickets=100000, passengers=None, days=730, chunk_size=5000, seed=42,
+             payments=True, progress=None):
+    """Fill an empty schema with a realistic distribution of rows.
+
+    Defaults to one passenger per 20 tickets, one exemption application per
+    five passengers and tickets spread over ``days`` days ending today.
+    Rows are written with executemany in ``chunk_size`` batches; ``progress``
+    is called with (table, rows written) after each one.
+    """
+    if not MIN_TICKETS <= tickets <= MAX_TICKETS:
+        raise ValueError(f"tickets must be between {MIN_TICKETS} and {MAX_TICKETS}, got {tickets}")
+    rng = random.Random(seed)
+    passengers = passengers or max(10, tickets // 20)
+    applications = max(1, passengers // 5)
+    today = date.today()
+    first_day = today - timedelta(days=days)
+    calendar, cumulative = _purchase_days(first_day, days)
+    cursor = connection.cursor()
+    started = time.perf_counter()
+
+    _insert_rows(cursor, "fare_type", ["fare_type_id", "type_name", "description", "validity"], [
+        (i + 1, name, description, f"{first_day} to {today}")
+        for i, (name, description, _, _, _) in enumerate(FARE_TYPES)
+    ])
+    _insert_rows(cursor, "tariff", ["fare_type_id", "base_price", "discount_rate"], [
+        (i + 1, base_price, discount_rate)
+        for i, (_, _, base_price, discount_rate, _) in enumerate(FARE_TYPES)
+    ])
+    connection.commit()
+
+    for start in range(1, passengers + 1, chunk_size):
+        end = min(start + chunk_size, passengers + 1)
+        _insert_rows(cursor, "passenger", ["passenger_id", "passenger_full_name", "email"], [
+            (pid, f"Passenger {pid}", f"passenger{pid}@example.com")
+            for pid in range(start, end)
+        ])
+        connection.commit()
+        if progress:
+            progress("passenger", end - 1)
+
+    fare_shares = [share for _, _, _, _, share in FARE_TYPES]
+    fares = {
+        i + 1: (base, round(base * rate / 100, 2), round(base * (1 - rate / 100), 2))
+        for i, (_, _, base, rate, _) in enumerate(FARE_TYPES)
+    }
+    for start in range(1, tickets + 1, chunk_size):
+        end = min(start + chunk_size, tickets + 1)
+        count = end - start
+        fare_type_ids = rng.choices(range(1, len(FARE_TYPES) + 1), weights=fare_shares, k=count)
+        purchase_dates = rng.choices(calendar, cum_weights=cumulative, k=count)
+        ticket_rows, calculation_rows, payment_rows = [], [], []
+        for ticket_id, fare_type_id, purchase_date in zip(range(start, end), fare_type_ids, purchase_dates):
+            base_fare, discount, final_fare = fares[fare_type_id]
+            ticket_rows.append((
+                ticket_id, purchase_date, final_fare, _frequent_rider(rng, passengers), fare_type_id
+            ))
+            if payments:
+                method = _weighted(rng, PAYMENT_METHODS)
+                calculation_rows.append((ticket_id, base_fare, discount, final_fare))
+                payment_rows.append((
+                    ticket_id, "Confirmed", method, None if method == "Cash" else f"TXN{ticket_id:010d}"
+                ))
+        _insert_rows(cursor, "ticket", ["ticket_id", "purchase_date", "price", "passenger_id", "fare_type_id"],
+                     ticket_rows)
+        _insert_rows(cursor, "fare_calculation", ["ticket_id", "base_fare", "discount", "final_fare"],
+                     calculation_rows)
+        _insert_rows(cursor, "payment_confirmation", ["ticket_id", "status", "payment_method", "transaction_ref"],
+                     payment_rows)
+        connection.commit()
+        if progress:
+            progress("ticket", end - 1)
+
+    fare_type_ids = {name: i + 1 for i, (name, _, _, _, _) in enumerate(FARE_TYPES)}
+    category_weights = [((category, document), share) for category, document, share in EXEMPTION_CATEGORIES]
+    for start in range(1, applications + 1, chunk_size):
+        end = min(start + chunk_size, applications + 1)
+        app_rows, doc_rows, exemption_rows = [], [], []
+        for application_id in range(start, end):
+            passenger_id = rng.randint(1, passengers)
+            submitted = first_day + timedelta(days=rng.randrange(days + 1))
+            status = _weighted(rng, APPLICATION_STATUSES)
+            category, document_type = _weighted(rng, category_weights)
+            app_rows.append((application_id, submitted, passenger_id, status))
+            doc_rows.append((application_id, document_type, f"uploads/synthetic-{application_id}.pdf"))
+            if status == "Approved":
+                exemption_rows.append((
+                    category, passenger_id, fare_type_ids[category],
+                    submitted, submitted + timedelta(days=365)
+                ))
+        _insert_rows(cursor, "exemption_application",
+                     ["application_id", "submitted_date", "passenger_id", "status"], app_rows)
+        _insert_rows(cursor, "document_record", ["application_id", "document_type", "document_value"], doc_rows)
+        _insert_rows(cursor, "exemption",
+                     ["exemption_category", "passenger_id", "fare_type_id", "valid_from", "valid_to"], exemption_rows)
+        connection.commit()
+        if progress:
+            progress("exemption_application", end - 1)
+
+    cursor.close()
+    return {
+        "tickets": tickets,
+        "passengers": passengers,
+        "applications": applications,
+        "seconds": round(time.perf_counter() - started, 1)
+    }
+
+def sqlite_path(name=BENCH_DB_NAME):
+    """Database file used for ``name`` with ``DB_BACKEND=sqlite``"""
+    return f"{name}.sqlite3"
+
+def connect(name=BENCH_DB_NAME):
+    if config.DB_BACKEND == "sqlite":
+        return sqlite_backend.connect(sqlite_path(name))
+    return mysql.connector.connect(
+        host=config.DB_HOST, user=config.DB_USER, passwd=config.DB_PASSWORD, database=name
+    )
+
+def create_scratch_database(name=BENCH_DB_NAME):
+    """Empty copy of schema.sql under ``name``; returns a connection to it"""
+    if config.DB_BACKEND == "sqlite":
+        connection = connect(name)
+        sqlite_backend.load_schema(connection, sample_data=False)
+        return connection
+    server = mysql.connector.connect(host=config.DB_HOST, user=config.DB_USER, passwd=config.DB_PASSWORD)
+    cursor = server.cursor()
+    schema = SCHEMA_PATH.read_text(encoding="utf-8")
+    # Only the DDL; the sample rows would collide with the synthetic ids
+    schema = schema.split("-- Insert sample data")[0].replace("tariffs_exemptions", name)
+    for statement in split_sql_statements(schema):
+        cursor.execute(statement)
+    server.commit()
+    cursor.close()
+    server.close()
+    return connect(name)
+
+def drop_scratch_database(name=BENCH_DB_NAME):
+    if name == config.DB_NAME:
+        raise ValueError(f"Refusing to drop the application database {name}")
+    if config.DB_BACKEND == "sqlite":
+        for suffix in ("", "-wal", "-shm"):
+            Path(sqlite_path(name) + suffix).unlink(missing_ok=True)
+        return
+    server = mysql.connector.connect(host=config.DB_HOST, user=config.DB_USER, passwd=config.DB_PASSWORD)
+    cursor = server.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+    cursor.close()
+    server.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill a scratch database with synthetic tariff data")
+    parser.add_argument("--tickets", type=int, default=100000, help=f"{MIN_TICKETS} to {MAX_TICKETS}")
+    parser.add_argument("--passengers", type=int, default=None)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-payments", action="store_true", help="Skip fare_calculation and payment_confirmation")
+    parser.add_argument("--database", type=str, default=BENCH_DB_NAME)
+    args = parser.parse_args(argv)
+    if not MIN_TICKETS <= args.tickets <= MAX_TICKETS:
+        parser.error(f"--tickets must be between {MIN_TICKETS} and {MAX_TICKETS}")
+    if args.database == config.DB_NAME:
+        parser.error("--database must not be the application database")
+
+    drop_scratch_database(args.database)
+    connection = create_scratch_database(args.database)
+    print(f"Generating synthetic data in {args.database} ...")
+    sizes = generate(
+        connection, tickets=args.tickets, passengers=args.passengers, days=args.days,
+        chunk_size=args.chunk_size, seed=args.seed, payments=not args.no_payments,
+        progress=lambda table, rows: print(f"  {table}: {rows} rows", end="\r", flush=True)
+    )
+    connection.close()
+    print(f"\nDone: {sizes}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,148 @@
+"""Before/after comparison of the index migrations on a synthetic dataset.
+
+Builds a scratch database from schema.sql (never the application
+database), fills it with synthetic rows, then runs the routers' hot queries
+with EXPLAIN FORMAT=JSON and timing both before and after applying the
+migrations in ``migrations/``.
+
+    python -m benchmarks.index_benchmark --tickets 1000000 --output index_report.json
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from app.database import config
+from app.database.migrations import apply_migrations
+from benchmarks import datagen
+from benchmarks.datagen import BENCH_DB_NAME, create_scratch_database
+
+def hot_queries():
+    """The router queries the migrations are meant to serve, with sample parameters"""
+    today = date.today()
+    return {
+        "fare_usage_report": ("""
+            SELECT t.purchase_date as date, ft.type_name as fare_type,
+                   COUNT(t.ticket_id) as tickets_sold, SUM(t.price) as total_revenue
+            FROM ticket t
+            JOIN fare_type ft ON t.fare_type_id = ft.fare_type_id
+            WHERE t.purchase_date BETWEEN %s AND %s
+            GROUP BY t.purchase_date, ft.type_name
+            ORDER BY t.purchase_date DESC
+        """, (today - timedelta(days=30), today)),
+        "dashboard_recent_tickets": ("""
+            SELECT t.*, p.passenger_full_name, ft.type_name
+            FROM ticket t
+            JOIN passenger p ON t.passenger_id = p.passenger_id
+            JOIN fare_type ft ON t.fare_type_id = ft.fare_type_id
+            ORDER BY t.purchase_date DESC, t.ticket_id DESC
+            LIMIT 5
+        """, ()),
+        "pending_application_check": ("""
+            SELECT * FROM exemption_application
+            WHERE passenger_id = %s AND status IN ('Submitted', 'Pending')
+        """, (7,)),
+        "exemption_stats_period": ("""
+            SELECT COUNT(*) AS applications FROM exemption_application
+            WHERE submitted_date >= %s
+        """, (today - timedelta(days=7),)),
+        "fare_type_by_name": ("""
+            SELECT fare_type_id FROM fare_type WHERE type_name = %s
+        """, ("Student",)),
+        "application_documents": ("""
+            SELECT * FROM document_record WHERE application_id = %s
+        """, (42,)),
+        "active_exemptions": ("""
+            SELECT e.* FROM exemption e
+            WHERE e.passenger_id = %s AND CURDATE() BETWEEN e.valid_from AND e.valid_to
+        """, (7,)),
+    }
+
+def summarize_plan(plan):
+    """Flatten EXPLAIN FORMAT=JSON into (table, access_type, key, rows) entries"""
+    tables = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "table_name" in node:
+                tables.append({
+                    "table": node.get("table_name"),
+                    "access_type": node.get("access_type"),
+                    "key": node.get("key"),
+                    "rows_examined_per_scan": node.get("rows_examined_per_scan"),
+                    "using_filesort": node.get("using_filesort", False)
+                })
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(plan)
+    return tables
+
+def measure(connection, repetitions):
+    cursor = connection.cursor()
+    results = {}
+    for name, (query, params) in hot_queries().items():
+        cursor.execute("EXPLAIN FORMAT=JSON " + query, params)
+        plan = json.loads(cursor.fetchone()[0])
+
+        timings = []
+        for _ in range(repetitions):
+            start = time.perf_counter()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            timings.append(time.perf_counter() - start)
+
+        results[name] = {
+            "plan": summarize_plan(plan),
+            "median_ms": statistics.median(timings) * 1000,
+            "min_ms": min(timings) * 1000,
+            "max_ms": max(timings) * 1000
+        }
+    cursor.close()
+    return results
+
+def print_report(report):
+    print(f"\n{'query':<28} {'before ms':>10} {'after ms':>10}  plan (before -> after)")
+    print("-" * 100)
+    for name, before in report["before"].items():
+        after = report["after"][name]
+        before_keys = ",".join(f"{t['table']}:{t['access_type']}/{t['key']}" for t in before["plan"])
+        after_keys = ",".join(f"{t['table']}:{t['access_type']}/{t['key']}" for t in after["plan"])
+        print(f"{name:<28} {before['median_ms']:>10.2f} {after['median_ms']:>10.2f}  {before_keys} -> {after_keys}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure query plans and latency before/after index migrations")
+    parser.add_argument("--tickets", type=int, default=100000)
+    parser.add_argument("--repetitions", type=int, default=20)
+    parser.add_argument("--output", type=str, default=None, help="Write the full report as JSON")
+    args = parser.parse_args(argv)
+    if config.DB_BACKEND != "mysql":
+        parser.error("query plans are MySQL-specific; run with DB_BACKEND=mysql")
+
+    connection = create_scratch_database()
+    print(f"Generating synthetic data in {BENCH_DB_NAME} ...")
+    sizes = datagen.generate(connection, tickets=args.tickets)
+
+    cursor = connection.cursor()
+    cursor.execute("ANALYZE TABLE ticket, exemption_application, exemption, document_record, fare_type")
+    cursor.fetchall()
+    cursor.close()
+
+    report = {"dataset": sizes, "before": measure(connection, args.repetitions)}
+    report["migrations_applied"] = apply_migrations(connection=connection)
+    report["after"] = measure(connection, args.repetitions)
+    connection.close()
+
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+        print(f"\nReport written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,277 @@
+"""Load test of the real FastAPI routes against a synthetic dataset.
+
+Fills a scratch database with ``benchmarks.datagen`` (never the application
+database), applies the migrations, points the application at it and drives
+the read-only routes in process: requests go straight to the ASGI app, with
+no server or socket in between, from ``--concurrency`` concurrent clients.
+Each endpoint is measured on its own after a short warm-up, and the report
+gives p50/p95/p99 latency and throughput per endpoint as JSON, tagged with
+the current commit so runs can be compared.
+
+Run from the project root (the app serves ``app/static`` and
+``app/templates`` by relative path):
+
+    python -m benchmarks.load_test --tickets 1000000 --concurrency 32 --output load_report.json
+    python -m benchmarks.load_test --reuse --compare load_report.json
+
+``DB_BACKEND=sqlite`` runs the same load on a local SQLite file; the
+migrations are skipped there, so the rollup-backed reports show as errors.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.database import config, migrations
+from app.services import passenger_activity
+from benchmarks import datagen
+from benchmarks.datagen import BENCH_DB_NAME
+
+# (name, path template); {passenger_id} is drawn per request
+ENDPOINTS = [
+    ("passenger_dashboard", "/passenger/dashboard?passenger_id={passenger_id}"),
+    ("passenger_exemptions", "/passenger/exemptions?passenger_id={passenger_id}"),
+    ("exemption_status_report", "/passenger/exemption/status-report?passenger_id={passenger_id}"),
+    ("passenger_directory", "/ticketing/passengers"),
+    ("passenger_search", "/ticketing/passengers?q=Passenger+{passenger_id}"),
+    ("passenger_profile", "/ticketing/passenger/{passenger_id}"),
+    ("calculate_fare_form", "/ticketing/calculate-fare/{passenger_id}"),
+    ("admin_dashboard", "/admin/"),
+    ("fare_types", "/admin/fare-types"),
+    ("exemption_applications", "/admin/exemption-applications"),
+    ("fare_usage_report", "/admin/reports/fare-usage"),
+    ("exemption_stats", "/admin/reports/exemption-stats?period=month"),
+    ("revenue_forecast", "/admin/reports/revenue-forecast"),
+    ("passenger_activity", "/admin/reports/passenger-activity"),
+    ("passenger_exemptions_report", "/admin/reports/passenger-exemptions?passenger_id={passenger_id}"),
+]
+
+PERCENTILES = (50, 95, 99)
+
+async def request(app, path):
+    """Run one GET through the ASGI app; returns the response status"""
+    path, _, query_string = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query_string.encode(), "headers": [(b"host", b"loadtest")],
+        "client": ("127.0.0.1", 0), "server": ("loadtest", 80)
+    }
+    status = None
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Nothing more to send; park until the app finishes
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+class Lifespan:
+    """Run the app's startup and shutdown handlers around the load"""
+
+    def __init__(self, app):
+        self.app = app
+        self.messages = asyncio.Queue()
+        self.events = asyncio.Queue()
+        self.task = None
+
+    async def _expect(self, event):
+        message = await self.events.get()
+        if message["type"] != event:
+            raise RuntimeError(f"Lifespan failed: {message}")
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(
+            self.app({"type": "lifespan", "asgi": {"version": "3.0"}}, self.messages.get, self.events.put)
+        )
+        await self.messages.put({"type": "lifespan.startup"})
+        await self._expect("lifespan.startup.complete")
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.messages.put({"type": "lifespan.shutdown"})
+        await self._expect("lifespan.shutdown.complete")
+        await self.task
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+def summarize(latencies, statuses, elapsed):
+    ordered = sorted(latencies)
+    codes = {}
+    for status in statuses:
+        codes[str(status)] = codes.get(str(status), 0) + 1
+    summary = {
+        "requests": len(latencies),
+        "errors": sum(1 for status in statuses if status is None or status >= 500),
+        "status_codes": codes,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else None
+    }
+    for percent in PERCENTILES:
+        value = percentile(ordered, percent)
+        summary[f"p{percent}_ms"] = round(value * 1000, 3) if value is not None else None
+    return summary
+
+async def run_endpoint(app, template, total, concurrency, passengers, rng):
+    """Issue ``total`` requests from ``concurrency`` clients; returns its summary"""
+    latencies, statuses = [], []
+    remaining = total
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            path = template.format(passenger_id=rng.randint(1, passengers))
+            started = time.perf_counter()
+            try:
+                status = await request(app, path)
+            except Exception:
+                status = None
+            latencies.append(time.perf_counter() - started)
+            statuses.append(status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(min(concurrency, total))))
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+async def run_load(app, endpoints, requests, concurrency, warmup, passengers, seed):
+    rng = random.Random(seed)
+    results = {}
+    async with Lifespan(app):
+        for name, template in endpoints:
+            if warmup:
+                await run_endpoint(app, template, warmup, concurrency, passengers, rng)
+            results[name] = await run_endpoint(app, template, requests, concurrency, passengers, rng)
+            print(f"{name:<30} p50 {results[name]['p50_ms']:>9.2f} ms  p95 {results[name]['p95_ms']:>9.2f} ms  "
+                  f"p99 {results[name]['p99_ms']:>9.2f} ms  {results[name]['throughput_rps']:>8.1f} req/s  "
+                  f"{results[name]['errors']} errors")
+    return results
+
+def prepare_database(name, tickets, seed):
+    """Fresh synthetic dataset with the migrations and rollups applied"""
+    datagen.drop_scratch_database(name)
+    connection = datagen.create_scratch_database(name)
+    print(f"Generating synthetic data in {name} ...")
+    sizes = datagen.generate(connection, tickets=tickets, seed=seed)
+    if config.DB_BACKEND == "sqlite":
+        # The migrations are MySQL DDL; routes reading their tables will fail
+        print("SQLite backend: migrations and rollups skipped")
+        connection.close()
+        return sizes
+    migrations.apply_migrations(connection=connection)
+    connection.close()
+    use_database(name)
+    # The passenger sketches cannot be built in SQL
+    passenger_activity.rebuild_all()
+    return sizes
+
+def use_database(name):
+    """Point every pool opened from here on at the scratch database"""
+    config.DB_NAME = name
+    config.DB_SQLITE_PATH = datagen.sqlite_path(name)
+
+def dataset_size(name):
+    connection = datagen.connect(name)
+    cursor = connection.cursor()
+    sizes = {}
+    for table in ("ticket", "passenger", "exemption_application"):
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        sizes[table] = cursor.fetchone()[0]
+    cursor.close()
+    connection.close()
+    return {"tickets": sizes["ticket"], "passengers": sizes["passenger"], "applications": sizes["exemption_application"]}
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_comparison(report, baseline):
+    print(f"\nAgainst {baseline.get('commit')} ({baseline.get('started_at')}):")
+    print(f"{'endpoint':<30} {'p95 before':>11} {'p95 after':>11} {'change':>8}")
+    for name, result in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before or not before.get("p95_ms") or result["p95_ms"] is None:
+            continue
+        change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        print(f"{name:<30} {before['p95_ms']:>11.2f} {result['p95_ms']:>11.2f} {change:>+7.1f}%")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive the application routes in process and report latency")
+    parser.add_argument("--tickets", type=int, default=100000,
+                        help=f"Dataset size, {datagen.MIN_TICKETS} to {datagen.MAX_TICKETS}")
+    parser.add_argument("--reuse", action="store_true", help="Keep the dataset from the previous run")
+    parser.add_argument("--database", type=str, default=BENCH_DB_NAME)
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per endpoint")
+    parser.add_argument("--endpoint", action="append", dest="endpoints",
+                        choices=[name for name, _ in ENDPOINTS], help="Only these endpoints (repeatable)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+    if args.database == config.DB_NAME:
+        parser.error("--database must not be the application database")
+    if not args.reuse and not datagen.MIN_TICKETS <= args.tickets <= datagen.MAX_TICKETS:
+        parser.error(f"--tickets must be between {datagen.MIN_TICKETS} and {datagen.MAX_TICKETS}")
+
+    sizes = dataset_size(args.database) if args.reuse else prepare_database(args.database, args.tickets, args.seed)
+    use_database(args.database)
+
+    # Imported late: importing the app configures logging and mounts app/static
+    from app.main import app
+
+    endpoints = [(name, path) for name, path in ENDPOINTS if not args.endpoints or name in args.endpoints]
+    report = {
+        "commit": current_commit(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "dataset": sizes,
+        "settings": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "db_backend": config.DB_BACKEND,
+            "db_async_mode": config.DB_ASYNC_MODE,
+            "db_pool_size": config.DB_POOL_SIZE,
+            "db_pool_max_overflow": config.DB_POOL_MAX_OVERFLOW,
+            "db_async_pool_max_size": config.DB_ASYNC_POOL_MAX_SIZE
+        }
+    }
+    print(f"Running {len(endpoints)} endpoints, {args.requests} requests each at concurrency {args.concurrency}")
+    report["endpoints"] = asyncio.run(
+        run_load(app, endpoints, args.requests, args.concurrency, args.warmup, sizes["passengers"], args.seed)
+    )
+
+    if args.compare:
+        print_comparison(report, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
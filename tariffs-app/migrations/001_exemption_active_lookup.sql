@@ -0,0 +1,5 @@
+-- Active-exemption lookups: "exemptions for passenger P valid on date D".
+-- Backs the in-process exemption index rebuilds and any SQL fallback.
+-- Replaces the implicit index MySQL created for fk_exemption_passenger.
+CREATE INDEX idx_exemption_passenger_validity
+    ON exemption (passenger_id, valid_from, valid_to);
@@ -0,0 +1,24 @@
+-- Indexes for the filters and sorts the routers run on every request.
+
+-- Fare usage report (date range, grouped by fare type) and the admin
+-- dashboard's "recent tickets"; price makes the report index-only.
+CREATE INDEX idx_ticket_purchase_date
+    ON ticket (purchase_date, fare_type_id, price);
+
+-- Pending-application check on submit and the passenger status report.
+-- Replaces the implicit index MySQL created for fk_exapp_passenger.
+CREATE INDEX idx_exapp_passenger_status
+    ON exemption_application (passenger_id, status);
+
+-- Exemption statistics period filter and the review queue ordering.
+CREATE INDEX idx_exapp_submitted_date
+    ON exemption_application (submitted_date);
+
+-- Duplicate-name check when creating a fare type.
+CREATE INDEX idx_fare_type_type_name
+    ON fare_type (type_name);
+
+-- Documents of an application (view page and status report join).
+-- Replaces the implicit index MySQL created for fk_docrec_exapp.
+CREATE INDEX idx_docrec_application
+    ON document_record (application_id);
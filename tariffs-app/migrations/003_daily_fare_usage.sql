@@ -0,0 +1,19 @@
+-- Per-day, per-fare-type ticket totals so the fare usage report does not
+-- aggregate raw tickets on every view. Kept current by ticket issuance;
+-- rebuild with: python -m app.services.fare_usage_rollup rebuild
+CREATE TABLE IF NOT EXISTS daily_fare_usage (
+    usage_date   DATE           NOT NULL COMMENT 'Purchase date',
+    fare_type_id INT            NOT NULL COMMENT 'FK → fare_type',
+    tickets_sold INT            NOT NULL DEFAULT 0 COMMENT 'Tickets sold that day',
+    revenue      DECIMAL(14,2)  NOT NULL DEFAULT 0 COMMENT 'Sum of ticket prices',
+    PRIMARY KEY (usage_date, fare_type_id),
+    CONSTRAINT fk_dfu_fare_type
+        FOREIGN KEY(fare_type_id) REFERENCES fare_type(fare_type_id)
+        ON DELETE CASCADE
+) COMMENT='Daily fare usage rollup of the ticket table.';
+
+-- Backfill from the tickets issued so far
+INSERT INTO daily_fare_usage (usage_date, fare_type_id, tickets_sold, revenue)
+SELECT purchase_date, fare_type_id, COUNT(*), SUM(price)
+FROM ticket
+GROUP BY purchase_date, fare_type_id;
@@ -0,0 +1,32 @@
+-- Registration and first-ride dates on passenger, plus a per-day,
+-- per-fare-type activity rollup for the passenger activity report.
+-- The distinct-passenger sketches cannot be built in SQL; fill them with:
+-- python -m app.services.passenger_activity rebuild
+ALTER TABLE passenger
+    ADD COLUMN registered_at    DATE NULL COMMENT 'Registration date',
+    ADD COLUMN first_ticket_date DATE NULL COMMENT 'Date of first ticket purchase';
+
+-- Passengers registered before this column existed get their first
+-- recorded activity as an approximate registration date
+UPDATE passenger p
+LEFT JOIN (
+    SELECT passenger_id, MIN(purchase_date) AS first_day FROM ticket GROUP BY passenger_id
+) t ON t.passenger_id = p.passenger_id
+LEFT JOIN (
+    SELECT passenger_id, MIN(submitted_date) AS first_day FROM exemption_application GROUP BY passenger_id
+) a ON a.passenger_id = p.passenger_id
+SET p.first_ticket_date = t.first_day,
+    p.registered_at = COALESCE(LEAST(t.first_day, a.first_day), t.first_day, a.first_day);
+
+CREATE INDEX idx_passenger_registered_at ON passenger (registered_at);
+
+CREATE TABLE IF NOT EXISTS daily_passenger_activity (
+    activity_date         DATE       NOT NULL COMMENT 'Purchase date',
+    fare_type_id          INT        NOT NULL COMMENT 'FK → fare_type',
+    first_time_passengers INT        NOT NULL DEFAULT 0 COMMENT 'Passengers whose first ticket was this one',
+    passenger_sketch      BLOB       NOT NULL COMMENT 'HyperLogLog sketch of distinct passengers',
+    PRIMARY KEY (activity_date, fare_type_id),
+    CONSTRAINT fk_dpa_fare_type
+        FOREIGN KEY(fare_type_id) REFERENCES fare_type(fare_type_id)
+        ON DELETE CASCADE
+) COMMENT='Daily distinct-passenger rollup of the ticket table.';
@@ -0,0 +1,43 @@
+-- Link each exemption to the application that granted it and record the
+-- requested category on the application, so exemption statistics no longer
+-- join the two tables on passenger_id alone.
+ALTER TABLE exemption_application
+    ADD COLUMN exemption_category VARCHAR(50) NULL COMMENT 'Requested exemption category';
+
+ALTER TABLE exemption
+    ADD COLUMN application_id INT NULL COMMENT 'FK → exemption_application that granted it',
+    ADD CONSTRAINT fk_exemption_application
+        FOREIGN KEY(application_id) REFERENCES exemption_application(application_id)
+        ON DELETE SET NULL;
+
+-- Existing exemptions: the passenger's latest approved application
+-- submitted on or before the exemption started
+UPDATE exemption e
+SET e.application_id = (
+    SELECT a.application_id
+    FROM exemption_application a
+    WHERE a.passenger_id = e.passenger_id
+      AND a.status = 'Approved'
+      AND a.submitted_date <= e.valid_from
+    ORDER BY a.submitted_date DESC, a.application_id DESC
+    LIMIT 1
+);
+
+UPDATE exemption_application a
+JOIN exemption e ON e.application_id = a.application_id
+SET a.exemption_category = e.exemption_category;
+
+-- Per-category, per-submission-date counters behind the exemption
+-- statistics report; maintained on submit and on every decision
+CREATE TABLE IF NOT EXISTS exemption_category_stats (
+    submitted_date     DATE         NOT NULL COMMENT 'Application submission date',
+    exemption_category VARCHAR(50)  NOT NULL COMMENT 'Requested category (Uncategorized when unknown)',
+    total_applications INT          NOT NULL DEFAULT 0 COMMENT 'Applications submitted',
+    approved           INT          NOT NULL DEFAULT 0 COMMENT 'Of which currently approved',
+    PRIMARY KEY (submitted_date, exemption_category)
+) COMMENT='Exemption application counters per category and day.';
+
+INSERT INTO exemption_category_stats (submitted_date, exemption_category, total_applications, approved)
+SELECT submitted_date, COALESCE(exemption_category, 'Uncategorized'), COUNT(*), SUM(status = 'Approved')
+FROM exemption_application
+GROUP BY submitted_date, COALESCE(exemption_category, 'Uncategorized');
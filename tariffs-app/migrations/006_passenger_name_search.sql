@@ -0,0 +1,4 @@
+-- Prefix search on passenger names in the passenger directory. The index
+-- also carries the primary key, so (name, passenger_id) keyset pages are
+-- read straight from it. Email prefixes use the existing UNIQUE index.
+CREATE INDEX idx_passenger_name ON passenger (passenger_full_name);
@@ -0,0 +1,4 @@
+-- Review queue filtered by status and paged newest first on
+-- (submitted_date, application_id); the primary key rides along in the
+-- index, so each page is a single backwards range scan.
+CREATE INDEX idx_exapp_status_submitted ON exemption_application (status, submitted_date);
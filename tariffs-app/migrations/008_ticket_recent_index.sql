@@ -0,0 +1,6 @@
+-- Admin dashboard's "recent tickets": ORDER BY purchase_date DESC,
+-- ticket_id DESC LIMIT n. idx_ticket_purchase_date from 002 cannot serve
+-- that order (fare_type_id and price sit between the two columns), so the
+-- list was a filesort over the whole ticket table; this index makes it a
+-- backwards scan that stops after n rows.
+CREATE INDEX idx_ticket_recent ON ticket (purchase_date, ticket_id);